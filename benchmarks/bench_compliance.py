@@ -0,0 +1,466 @@
+"""Micro-benchmarks for the compliance hot paths over synthetic tenants.
+Compares against a stored baseline and exits non-zero on regressions."""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import platform
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Any, List, Tuple
+
+# the compliance modules import utils.auth, which insists on these at import time.
+# nothing here touches the network, so placeholders are enough
+for _var in ("LENS_EP", "AUTH_URL", "TENANT_ID", "CLIENT_ID", "CLIENT_SECRET"):
+    os.environ.setdefault(_var, f"bench-{_var.lower()}")
+
+from rich.table import Table
+from rich.markup import escape
+
+import utils.fast_json as fast_json
+from utils import compliance_history
+from utils.env_helper import console, console_log
+from utils.compliance_analysis import (
+    FACTS_KEY,
+    SHARD_MIN_DEVICES,
+    _group_devices_sharded,
+    _summarize_groups,
+    parse_policy_attribution,
+    extract_unique_policies,
+    analyze_and_group_devices,
+)
+from utils.compliance_ops import (
+    filter_devices_by_baseline,
+    _get_expected_versions_display,
+    export_compliance_csv_full_details,
+    export_compliance_csv_summary,
+    export_compliance_xlsx,
+)
+from benchmarks.synthetic_tenant import generate_tenant, fetched_devices
+
+# -- GLOBALS
+
+DEFAULT_SIZES = [10_000, 50_000]
+DEFAULT_BASELINE = os.path.join("benchmarks", "baseline.json")
+DEFAULT_TOLERANCE = 0.20  # 20% slower/larger than baseline counts as a regression
+# ignore deltas smaller than this » sub-millisecond paths are all noise
+MIN_DELTA = {"seconds": 0.005, "traced_peak_mb": 0.5}
+BATCH_SIZE = 25  # aliases per BatchDevicePolicies response, as in device_ops
+HISTORY_DAYS = 365  # daily runs seeded into the history store for trend queries
+SHARD_WORKERS = 4  # process pool size for the sharded analysis case + check
+
+
+# -- PRIVATE HELPERS » NO TOUCHY!
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports KiB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _time_best(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _traced_peak_mb(fn: Callable[[], Any]) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def _model_baseline(unique_policies: Dict[str, List[Dict]]) -> Dict[str, Any]:
+    policy = next(p for p in unique_policies["model"] if p["has_settings"])
+    return {
+        "layer": "model",
+        "policy": policy,
+        "all_policies": False,
+        "display": f"Account Model Policy: {policy['name']}",
+    }
+
+
+def _all_sites_baseline(unique_policies: Dict[str, List[Dict]]) -> Dict[str, Any]:
+    return {
+        "layer": "site",
+        "all_policies": True,
+        "policies": [p for p in unique_policies["site"] if p["has_settings"]],
+        "display": "All Sites",
+    }
+
+
+def _batch_bodies(
+    devices: List[Dict[str, Any]], stacks: Dict[str, Any]
+) -> List[Tuple[List[Dict[str, Any]], bytes]]:
+    """serialized BatchDevicePolicies responses, as they come off the wire"""
+    bodies = []
+    for i in range(0, len(devices), BATCH_SIZE):
+        batch = devices[i : i + BATCH_SIZE]
+        data = {f"dev{j}": stacks[device["id"]] for j, device in enumerate(batch)}
+        bodies.append((batch, json.dumps({"data": data}).encode("utf-8")))
+    return bodies
+
+
+def _decode_and_parse(
+    bodies: List[Tuple[List[Dict[str, Any]], bytes]], backend: str, layer_cache: bool
+) -> List[Dict[str, Any]]:
+    # the attribution path end to end » attributions stay alive like they do on devices
+    fast_json.use_backend(backend)
+    cache = {} if layer_cache else None
+    attributions = []
+    try:
+        for batch, body in bodies:
+            data = fast_json.loads(body)["data"]
+            for j, device in enumerate(batch):
+                attributions.append(
+                    parse_policy_attribution(
+                        data[f"dev{j}"],
+                        hardware_product=device.get("hardwareProduct"),
+                        layer_cache=cache,
+                    )
+                )
+    finally:
+        fast_json.use_backend(os.getenv("LENSCTL_JSON_BACKEND", ""))
+    return attributions
+
+
+def _comparable(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    # group device lists follow shard order when sharded » compare them as sets
+    def group_view(group):
+        view = {k: v for k, v in group.items() if k != "devices"}
+        view["devices"] = sorted(device["id"] for device in group["devices"])
+        return view
+
+    policies = {}
+    for grouping_id, policy in analysis["policies"].items():
+        policies[grouping_id] = dict(
+            policy, groups=[group_view(g) for g in policy["groups"]]
+        )
+    return dict(
+        analysis,
+        groups=[group_view(group) for group in analysis["groups"]],
+        policies=policies,
+    )
+
+
+def _check_sharded_matches_serial(
+    devices: List[Dict[str, Any]],
+    latest_versions: Dict[str, str | None],
+    baselines: List[Dict[str, Any]],
+) -> None:
+    """
+    equivalence check » the sharded pool must reproduce the serial analysis.
+    calls the pool directly so small sizes exercise it too
+    """
+    for baseline in baselines:
+        serial = analyze_and_group_devices(devices, latest_versions, baseline)
+        grouped = _group_devices_sharded(
+            devices, latest_versions, baseline, SHARD_WORKERS
+        )
+        if grouped is None:
+            raise RuntimeError("sharded analysis couldn't start a process pool")
+        sharded = _summarize_groups(*grouped, len(devices), latest_versions, baseline)
+        if _comparable(sharded) != _comparable(serial):
+            raise RuntimeError(
+                f"sharded analysis differs from serial for {baseline['display']}"
+            )
+
+
+def _build_cases(
+    size: int, seed: int, out_dir: str
+) -> Tuple[List[Tuple[str, Callable[[], Any]]], int]:
+    """set up one tenant and return (name, callable) pairs that exercise each hot path"""
+    tenant = generate_tenant(size, seed=seed)
+    latest_versions = tenant["latest_versions"]
+    stacks = tenant["policy_stacks"]
+
+    devices = fetched_devices(tenant)
+    for device in devices:
+        device["policy_attribution"] = parse_policy_attribution(stacks[device["id"]])
+
+    unique_policies = extract_unique_policies(devices)
+    model_baseline = _model_baseline(unique_policies)
+    site_baseline = _all_sites_baseline(unique_policies)
+    site_devices = filter_devices_by_baseline(devices, site_baseline, silent=True)
+    analysis = analyze_and_group_devices(devices, latest_versions, model_baseline)
+    _check_sharded_matches_serial(
+        devices, latest_versions, [model_baseline, site_baseline]
+    )
+
+    full_csv = os.path.join(out_dir, f"full-{size}.csv")
+    summary_csv = os.path.join(out_dir, f"summary-{size}.csv")
+    workbook = os.path.join(out_dir, f"compliance-{size}.xlsx")
+    history_db = os.path.join(out_dir, f"history-{size}.sqlite3")
+
+    # a year of daily runs » trend queries should only ever touch the rollups
+    first_day = datetime.now(timezone.utc) - timedelta(days=HISTORY_DAYS)
+    for day in range(HISTORY_DAYS):
+        history_key = compliance_history.record_run(
+            analysis,
+            model_baseline,
+            run_ts=first_day + timedelta(days=day),
+            path=history_db,
+        )
+
+    bodies = _batch_bodies(devices, stacks)
+    fast_backend = fast_json.use_backend("")  # whatever the transport would pick
+    fast_json.use_backend(os.getenv("LENSCTL_JSON_BACKEND", ""))
+
+    def _parse_all():
+        for device in devices:
+            parse_policy_attribution(stacks[device["id"]])
+
+    def _parse_all_cached():
+        layer_cache = {}
+        for device in devices:
+            parse_policy_attribution(stacks[device["id"]], layer_cache=layer_cache)
+
+    def _analyze_cold():
+        # first baseline of a run » no cached per-device facts yet
+        for device in devices:
+            device.pop(FACTS_KEY, None)
+        analyze_and_group_devices(devices, latest_versions, model_baseline)
+
+    sharded_cases = []
+    if len(devices) >= SHARD_WORKERS * SHARD_MIN_DEVICES:
+        sharded_cases.append(
+            (
+                f"analyze_and_group_devices[model, {SHARD_WORKERS} workers]",
+                lambda: analyze_and_group_devices(
+                    devices, latest_versions, model_baseline, workers=SHARD_WORKERS
+                ),
+            )
+        )
+
+    def _expected_versions_all():
+        for policy in analysis["policies"].values():
+            _get_expected_versions_display(policy)
+
+    cases = [
+        ("parse_policy_attribution", _parse_all),
+        ("parse_policy_attribution[layer cache]", _parse_all_cached),
+        (
+            "decode+parse[stdlib]",
+            lambda: _decode_and_parse(bodies, "stdlib", layer_cache=False),
+        ),
+        (
+            f"decode+parse[{fast_backend}+layer cache]",
+            lambda: _decode_and_parse(bodies, fast_backend, layer_cache=True),
+        ),
+        ("extract_unique_policies", lambda: extract_unique_policies(devices)),
+        (
+            "filter_devices_by_baseline",
+            lambda: filter_devices_by_baseline(devices, site_baseline, silent=True),
+        ),
+        (
+            "analyze_and_group_devices[model]",
+            lambda: analyze_and_group_devices(devices, latest_versions, model_baseline),
+        ),
+        ("analyze_and_group_devices[model, cold facts]", _analyze_cold),
+        # below SHARD_MIN_DEVICES per worker this would just time serial again
+        *sharded_cases,
+        (
+            "analyze_and_group_devices[all sites]",
+            lambda: analyze_and_group_devices(
+                site_devices, latest_versions, site_baseline
+            ),
+        ),
+        ("_get_expected_versions_display", _expected_versions_all),
+        (
+            "export_compliance_csv_full_details",
+            lambda: export_compliance_csv_full_details(
+                devices, latest_versions, model_baseline, filename=full_csv
+            ),
+        ),
+        (
+            "export_compliance_csv_summary",
+            lambda: export_compliance_csv_summary(
+                analysis, model_baseline, filename=summary_csv
+            ),
+        ),
+        (
+            "export_compliance_xlsx",
+            lambda: export_compliance_xlsx(
+                devices, analysis, latest_versions, model_baseline, filename=workbook
+            ),
+        ),
+        (
+            "compliance_history.record_run",
+            lambda: compliance_history.record_run(
+                analysis, model_baseline, path=history_db
+            ),
+        ),
+        (
+            f"compliance_history.trend[version, {HISTORY_DAYS} days]",
+            lambda: compliance_history.trend(
+                history_key, "version", days=HISTORY_DAYS, path=history_db
+            ),
+        ),
+    ]
+    return cases, len(devices)
+
+
+# -- PUBLIC FUNCTIONS
+
+
+def run_benchmarks(
+    sizes: List[int], *, seed: int = 1, repeat: int = 3
+) -> Dict[str, Any]:
+    results: Dict[str, Any] = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+            "run_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+
+    # exporters log a couple of lines each call » keep the report readable
+    was_quiet = console.quiet
+    console.quiet = True
+    try:
+        with tempfile.TemporaryDirectory() as out_dir:
+            for size in sizes:
+                cases, device_count = _build_cases(size, seed, out_dir)
+                for name, fn in cases:
+                    seconds = _time_best(fn, repeat)
+                    peak_mb = _traced_peak_mb(fn)
+                    results["results"][f"{name}@{size}"] = {
+                        "benchmark": name,
+                        "devices": device_count,
+                        "seconds": seconds,
+                        "devices_per_s": device_count / seconds if seconds else None,
+                        "traced_peak_mb": peak_mb,
+                    }
+    finally:
+        console.quiet = was_quiet
+
+    results["meta"]["peak_rss_mb"] = _peak_rss_mb()
+    return results
+
+
+def compare_to_baseline(
+    current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    regressions = []
+    for key, now in current["results"].items():
+        before = baseline.get("results", {}).get(key)
+        if not before:
+            continue
+        for metric in ("seconds", "traced_peak_mb"):
+            old, new = before.get(metric), now.get(metric)
+            if (
+                old
+                and new
+                and new > old * (1 + tolerance)
+                and new - old > MIN_DELTA[metric]
+            ):
+                regressions.append(
+                    f"{key} {metric}: {old:.4f} » {new:.4f} (+{(new / old - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def render_results(
+    current: Dict[str, Any], baseline: Dict[str, Any] | None = None
+) -> Table:
+    table = Table(title="Compliance hot paths", header_style="bold magenta")
+    table.add_column("Benchmark", style="cyan", no_wrap=True)
+    table.add_column("Devices", justify="right")
+    table.add_column("Time (s)", justify="right")
+    table.add_column("Devices/s", justify="right", style="green")
+    table.add_column("Peak alloc (MB)", justify="right")
+    if baseline:
+        table.add_column("vs baseline", justify="right")
+
+    for key, row in current["results"].items():
+        cells = [
+            escape(row["benchmark"]),  # names like "...[model]" aren't markup
+            f"{row['devices']:,}",
+            f"{row['seconds']:.4f}",
+            f"{row['devices_per_s']:,.0f}" if row["devices_per_s"] else "-",
+            f"{row['traced_peak_mb']:.2f}",
+        ]
+        if baseline:
+            before = baseline.get("results", {}).get(key)
+            if before and before.get("seconds"):
+                delta = (row["seconds"] / before["seconds"] - 1) * 100
+                style = "red" if delta > 0 else "green"
+                cells.append(f"[{style}]{delta:+.0f}%[/{style}]")
+            else:
+                cells.append("[dim]new[/dim]")
+        table.add_row(*cells)
+    return table
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the compliance pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--json", help="also write raw results to this path")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            console_log(
+                f"[yellow]No baseline at {args.baseline}. Run with --save-baseline first.[/yellow]"
+            )
+            return 2
+
+    current = run_benchmarks(args.sizes, seed=args.seed, repeat=args.repeat)
+    console.print(render_results(current, baseline))
+    rss = current["meta"]["peak_rss_mb"]
+    if rss is not None:
+        console_log(f"Peak RSS: [bold]{rss:,.0f} MB[/bold]")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        console_log(f"Baseline saved » [green]{args.baseline}[/green]")
+
+    if baseline:
+        regressions = compare_to_baseline(current, baseline, args.tolerance)
+        if regressions:
+            console_log(
+                f"[red]{len(regressions)} regression(s) beyond {args.tolerance:.0%}:[/red]"
+            )
+            for line in regressions:
+                console_log(f"  [red]✗[/red] {line}")
+            return 1
+        console_log(f"[green]No regressions beyond {args.tolerance:.0%}[/green]")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
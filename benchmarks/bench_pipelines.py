@@ -0,0 +1,510 @@
+"""End-to-end throughput harness for the network pipelines, run headlessly against
+benchmarks.mock_lens_server in a subprocess."""
+
+import io
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import itertools
+import threading
+import subprocess
+import contextlib
+import tempfile
+import urllib.request
+from typing import Dict, Any, List, Callable
+
+# -- GLOBALS
+
+SCENARIOS = (
+    "compliance",
+    "create_rooms",
+    "export_rooms",
+    "update_rooms",
+    "update_rooms_resume",
+    "update_rooms_race",
+)
+RESUME_ROWS = 20  # rooms in the resume check's csv, one of them failing
+RACE_ROWS = 24  # new rooms that all name the same new site
+RACE_WORKERS = 8
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# -- PRIVATE HELPERS » NO TOUCHY!
+
+
+class _Probe:
+    """counts client-side sleeps and the first GraphQL response of a scenario"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.started = time.perf_counter()
+        self.first_result: float | None = None
+        self.sleep_s = 0.0
+
+    def mark_result(self) -> None:
+        with self._lock:
+            if self.first_result is None:
+                self.first_result = time.perf_counter() - self.started
+
+    def add_sleep(self, seconds: float) -> None:
+        with self._lock:
+            self.sleep_s += seconds
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _http_json(url: str, method: str = "GET") -> Dict[str, Any]:
+    request = urllib.request.Request(
+        url, method=method, data=b"{}" if method == "POST" else None
+    )
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def _start_mock_server(args: argparse.Namespace) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    cmd = [
+        sys.executable,
+        "-m",
+        "benchmarks.mock_lens_server",
+        "--port", str(port),
+        "--devices", str(args.devices),
+        "--seed", str(args.seed),
+        "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--cost-limit", str(args.cost_limit),
+        "--reset-seconds", str(args.reset_seconds),
+        "--error-429-rate", str(args.error_429_rate),
+        "--error-5xx-rate", str(args.error_5xx_rate),
+    ] + (["--no-compression"] if args.no_compression else [])  # fmt: skip
+    proc = subprocess.Popen(
+        cmd, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+
+    # generating a big tenant takes a few seconds before the port opens
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("mock server exited during startup")
+        try:
+            _http_json(f"{base_url}/__stats")
+            return proc, base_url
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("mock server didn't come up within 120s")
+
+
+def _install_probe(probe: _Probe) -> None:
+    # wraps the client's GraphQL entry point and time.sleep in THIS process only;
+    # the mock server runs in its own process, so its latency sleeps aren't counted
+    import utils.auth as auth
+
+    original_execute = auth.execute_gql
+    original_sleep = time.sleep
+
+    def _execute(*a, **kw):
+        result = original_execute(*a, **kw)
+        probe.mark_result()
+        return result
+
+    def _sleep(seconds):
+        probe.add_sleep(seconds)
+        original_sleep(seconds)
+
+    auth.execute_gql = _execute
+    time.sleep = _sleep
+
+
+def _run_scenario(
+    name: str,
+    label: str,
+    base_url: str,
+    probe: _Probe,
+    fn: Callable[[], Dict[str, Any]],
+    *,
+    verbose: bool,
+) -> Dict[str, Any]:
+    import utils.gql_metrics as gql_metrics
+
+    _http_json(f"{base_url}/__reset", method="POST")  # fresh budget + counters
+    probe.reset()
+    gql_metrics.reset(name)
+
+    start = time.perf_counter()
+    if verbose:
+        outcome = fn()
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):
+            outcome = fn()
+    wall = time.perf_counter() - start
+    stats = _http_json(f"{base_url}/__stats")
+    operations = gql_metrics.snapshot().values()
+
+    items = outcome.get("items", 0)
+    return {
+        "scenario": name,
+        "config": label,
+        "wall_s": wall,
+        "requests": stats["requests"],
+        "requests_per_s": stats["requests"] / wall if wall else None,
+        "items": items,
+        "items_per_s": items / wall if wall else None,
+        "time_to_first_result_s": probe.first_result,
+        "cost_points": stats["cost_charged"],
+        "sleep_s": probe.sleep_s,
+        "http_429": stats["budget_429"] + stats["injected_429"],
+        "http_5xx": stats["injected_5xx"],
+        "errors": outcome.get("errors", 0),
+        "wire_mb": sum(op["wire_bytes"] for op in operations) / 1e6,
+        "raw_mb": sum(op["response_bytes"] for op in operations) / 1e6,
+    }
+
+
+# -- SCENARIOS » each mirrors its CLI task minus the prompts
+
+
+def _compliance(max_workers: int, batch_size: int, trimmed: bool) -> Dict[str, Any]:
+    import utils.auth as auth
+    from utils.compliance_analysis import (
+        PLATFORM_CATALOG_MAP,
+        extract_unique_policies,
+        analyze_and_group_devices,
+    )
+    from utils.compliance_ops import (
+        filter_devices_by_baseline,
+        export_compliance_csv_full_details,
+        export_compliance_csv_summary,
+    )
+    from utils.device_ops import (
+        fetch_devices_by_model,
+        fetch_multiple_latest_versions,
+        fetch_policy_attributions_concurrent,
+    )
+
+    catalog_ids = list(PLATFORM_CATALOG_MAP.values())
+    latest_versions = fetch_multiple_latest_versions(catalog_ids)
+    devices = fetch_devices_by_model(auth.TENANT_ID, "Desktop App")
+    _, failed = fetch_policy_attributions_concurrent(
+        devices, max_workers=max_workers, batch_size=batch_size, trimmed=trimmed
+    )
+
+    unique_policies = extract_unique_policies(devices)
+    model_policy = next(p for p in unique_policies["model"] if p["has_settings"])
+    baseline = {
+        "layer": "model",
+        "policy": model_policy,
+        "all_policies": False,
+        "display": model_policy["name"],
+    }
+    filtered = filter_devices_by_baseline(devices, baseline, silent=True)
+    analysis = analyze_and_group_devices(filtered, latest_versions, baseline)
+    export_compliance_csv_full_details(filtered, latest_versions, baseline)
+    export_compliance_csv_summary(analysis, baseline)
+    return {"items": len(devices), "errors": failed}
+
+
+def _create_rooms(count: int, max_workers: int) -> Dict[str, Any]:
+    from utils.bulk_create import create_rooms
+
+    base_name = f"Bench {int(time.time())}"
+    created, errors = create_rooms(count, base_name, 1, max_workers=max_workers)
+    return {"items": created, "errors": errors}
+
+
+def _export_rooms() -> Dict[str, Any]:
+    from utils.room_ops import export_rooms
+
+    exported, errors = export_rooms(interactive=False)
+    return {"items": exported, "errors": errors}
+
+
+def _update_rooms() -> Dict[str, Any]:
+    from utils.room_ops import update_rooms
+
+    imported, errors = update_rooms(interactive=False)
+    return {"items": imported, "errors": errors}
+
+
+def _update_rooms_resume(base_url: str) -> Dict[str, Any]:
+    """
+    resume check » an import with one bad row, that row fixed, then a rerun. the
+    rerun may only send the fixed row, every completed one is skipped
+    """
+    from utils.room_ops import update_rooms
+
+    stamp = int(time.time())
+    rows = [
+        f"Resume {stamp} {n},,4,SMALL,1,Resume Site {stamp},"
+        for n in range(RESUME_ROWS)
+    ]
+    bad = RESUME_ROWS // 2
+    fixed_row = rows[bad]
+    rows[bad] = f"Resume {stamp} {bad},,4,SMALL,1,,no-such-site"
+
+    os.makedirs("resume", exist_ok=True)
+    os.chdir("resume")
+    try:
+        header = "name,id,capacity,size,floor,siteName,siteId\n"
+        with open("room_data.csv", "w", encoding="utf-8") as f:
+            f.write(header + "\n".join(rows) + "\n")
+        first_imported, first_errors = update_rooms(interactive=False)
+
+        rows[bad] = fixed_row
+        with open("room_data.csv", "w", encoding="utf-8") as f:
+            f.write(header + "\n".join(rows) + "\n")
+        sent_before = _http_json(f"{base_url}/__stats")["by_operation"]
+        imported, errors = update_rooms(interactive=False)
+        sent_after = _http_json(f"{base_url}/__stats")["by_operation"]
+        journals_left = os.listdir(".journal") if os.path.isdir(".journal") else []
+    finally:
+        os.chdir("..")
+
+    resent = sent_after.get("upsertRoom", 0) - sent_before.get("upsertRoom", 0)
+    if (first_imported, first_errors) != (RESUME_ROWS - 1, 1):
+        raise RuntimeError(
+            f"resume check: first run imported {first_imported} with {first_errors} errors"
+        )
+    if (imported, errors, resent) != (1, 0, 1) or journals_left:
+        raise RuntimeError(
+            f"resume check: rerun imported {imported}, {errors} errors, sent {resent} "
+            f"upserts, journals left {journals_left} » completed rows were replayed"
+        )
+    return {"items": first_imported + imported, "errors": first_errors + errors}
+
+
+def _update_rooms_race(base_url: str) -> Dict[str, Any]:
+    """
+    single-flight check » rows naming one new site, imported concurrently, must
+    create that site exactly once
+    """
+    from utils.room_ops import update_rooms
+
+    stamp = int(time.time())
+    rows = [f"Race {stamp} {n},,4,SMALL,1,Race Site {stamp}," for n in range(RACE_ROWS)]
+    os.makedirs("race", exist_ok=True)
+    os.chdir("race")
+    try:
+        with open("room_data.csv", "w", encoding="utf-8") as f:
+            f.write("name,id,capacity,size,floor,siteName,siteId\n")
+            f.write("\n".join(rows) + "\n")
+        sent_before = _http_json(f"{base_url}/__stats")["by_operation"]
+        imported, errors = update_rooms(interactive=False, max_workers=RACE_WORKERS)
+        sent_after = _http_json(f"{base_url}/__stats")["by_operation"]
+    finally:
+        os.chdir("..")
+
+    site_creates = sent_after.get("upsertSite", 0) - sent_before.get("upsertSite", 0)
+    if (imported, errors, site_creates) != (RACE_ROWS, 0, 1):
+        raise RuntimeError(
+            f"race check: imported {imported}, {errors} errors, {site_creates} site "
+            f"creates » rows racing for one new site must share a single create"
+        )
+    return {"items": imported, "errors": errors}
+
+
+# -- PUBLIC FUNCTIONS
+
+
+def render_results(results: List[Dict[str, Any]]):
+    from rich.table import Table
+
+    table = Table(title="Pipeline throughput", header_style="bold magenta")
+    for column in (
+        "Scenario",
+        "Config",
+        "Wall (s)",
+        "Req/s",
+        "Items/s",
+        "TTFR (s)",
+        "Cost pts",
+        "Sleep (s)",
+        "Wire MB",
+        "Raw MB",
+        "429s",
+        "Errors",
+    ):
+        table.add_column(
+            column, justify="left" if column in ("Scenario", "Config") else "right"
+        )
+    for row in results:
+        ttfr = row["time_to_first_result_s"]
+        table.add_row(
+            row["scenario"],
+            row["config"],
+            f"{row['wall_s']:.2f}",
+            f"{row['requests_per_s']:.1f}",
+            f"{row['items_per_s']:,.0f}",
+            f"{ttfr:.3f}" if ttfr is not None else "-",
+            f"{row['cost_points']:,}",
+            f"{row['sleep_s']:.1f}",
+            f"{row['wire_mb']:.1f}",
+            f"{row['raw_mb']:.1f}",
+            str(row["http_429"]),
+            str(row["errors"]),
+        )
+    return table
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="End-to-end pipeline throughput")
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--devices", type=int, default=5000)
+    parser.add_argument("--rooms", type=int, default=200, help="rooms to bulk create")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--cost-limit", type=int, default=100_000)
+    parser.add_argument("--reset-seconds", type=float, default=60.0)
+    parser.add_argument("--error-429-rate", type=float, default=0.0)
+    parser.add_argument("--error-5xx-rate", type=float, default=0.0)
+    parser.add_argument("--max-workers", type=int, nargs="+", default=[2])
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[25])
+    parser.add_argument("--create-workers", type=int, nargs="+", default=[4])
+    parser.add_argument(
+        "--fragment",
+        nargs="+",
+        choices=("full", "trimmed"),
+        default=["full"],
+        help="policy fragment(s) for the compliance crawl",
+    )
+    parser.add_argument(
+        "--no-compression", action="store_true", help="mock never gzips responses"
+    )
+    parser.add_argument("--json", help="write raw results to this path")
+    parser.add_argument("--verbose", action="store_true", help="show task output")
+    return parser
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = _build_arg_parser().parse_args(argv)
+
+    proc, base_url = _start_mock_server(args)
+    try:
+        # utils.auth reads these at import time, so they must be set first
+        os.environ.update(
+            LENS_EP=f"{base_url}/graphql",
+            AUTH_URL=f"{base_url}/oauth/token",
+            TENANT_ID="mock-tenant",
+            CLIENT_ID="bench-client",
+            CLIENT_SECRET="bench-secret",
+            SITE_ID="",
+        )
+        from utils.env_helper import console, logger
+
+        if not args.verbose:
+            console.quiet = True
+            logger.setLevel(logging.WARNING)
+
+        probe = _Probe()
+        _install_probe(probe)
+
+        results = []
+        with tempfile.TemporaryDirectory() as work_dir:
+            # exports, room_data.csv and journals land here, not in the repo
+            os.chdir(work_dir)
+            for name in args.scenarios:
+                if name == "compliance":
+                    for workers, batch, fragment in itertools.product(
+                        args.max_workers, args.batch_size, args.fragment
+                    ):
+                        results.append(
+                            _run_scenario(
+                                name,
+                                f"workers={workers} batch={batch} {fragment}",
+                                base_url,
+                                probe,
+                                lambda: _compliance(
+                                    workers, batch, fragment == "trimmed"
+                                ),
+                                verbose=args.verbose,
+                            )
+                        )
+                elif name == "create_rooms":
+                    for workers in args.create_workers:
+                        results.append(
+                            _run_scenario(
+                                name,
+                                f"workers={workers} rooms={args.rooms}",
+                                base_url,
+                                probe,
+                                lambda: _create_rooms(args.rooms, workers),
+                                verbose=args.verbose,
+                            )
+                        )
+                elif name == "export_rooms":
+                    results.append(
+                        _run_scenario(
+                            name,
+                            "-",
+                            base_url,
+                            probe,
+                            _export_rooms,
+                            verbose=args.verbose,
+                        )
+                    )
+                elif name == "update_rooms":
+                    results.append(
+                        _run_scenario(
+                            name,
+                            "-",
+                            base_url,
+                            probe,
+                            _update_rooms,
+                            verbose=args.verbose,
+                        )
+                    )
+                elif name == "update_rooms_race":
+                    results.append(
+                        _run_scenario(
+                            name,
+                            f"rows={RACE_ROWS} workers={RACE_WORKERS}",
+                            base_url,
+                            probe,
+                            lambda: _update_rooms_race(base_url),
+                            verbose=args.verbose,
+                        )
+                    )
+                elif name == "update_rooms_resume":
+                    results.append(
+                        _run_scenario(
+                            name,
+                            f"rows={RESUME_ROWS}",
+                            base_url,
+                            probe,
+                            lambda: _update_rooms_resume(base_url),
+                            verbose=args.verbose,
+                        )
+                    )
+            os.chdir(REPO_ROOT)
+
+        console.quiet = False
+        console.print(render_results(results))
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"config": vars(args), "results": results}, f, indent=2, default=str
+                )
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,195 @@
+"""Startup guard for cli.py » exits non-zero when time-to-first-prompt exceeds
+--budget-ms or a deferred module is imported at startup."""
+
+import os
+import sys
+import time
+import argparse
+import threading
+import statistics
+import subprocess
+from typing import Dict, List
+
+# -- GLOBALS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET_MS = 200.0
+PROMPT_MARKER = b"Enter task selection"
+# must only load once a task needs them
+DEFERRED_MODULES = (
+    "pandas",
+    "numpy",
+    "pygments",
+    "rich.traceback",
+    "utils.room_ops",
+    "utils.bulk_create",
+    "utils.compliance_ops",
+    "utils.device_ops",
+)
+
+
+# -- PRIVATE HELPERS » NO TOUCHY!
+
+
+def _child_env(base_url: str | None = None) -> Dict[str, str]:
+    env = dict(os.environ)
+    # discard port » import-only runs never call it
+    url = base_url or "http://127.0.0.1:9"
+    env.update(
+        LENS_EP=f"{url}/graphql",
+        AUTH_URL=f"{url}/oauth/token",
+        TENANT_ID="mock-tenant",
+        CLIENT_ID="bench-client",
+        CLIENT_SECRET="bench-secret",
+        SITE_ID="",
+        LENSCTL_NO_ANIM="1",
+        PYTHONDONTWRITEBYTECODE="1",
+    )
+    return env
+
+
+def _time_import(runs: int) -> List[float]:
+    samples = []
+    code = "import time; t = time.perf_counter(); import cli; print(time.perf_counter() - t)"
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=REPO_ROOT,
+            env=_child_env(),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        samples.append(float(out.stdout.strip().splitlines()[-1]) * 1000)
+    return samples
+
+
+def _loaded_deferred_modules() -> List[str]:
+    code = (
+        "import sys, cli; "
+        f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=REPO_ROOT,
+        env=_child_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    line = out.stdout.strip().splitlines()[-1] if out.stdout.strip() else ""
+    return [m for m in line.split(",") if m]
+
+
+def _time_to_first_prompt(base_url: str, timeout_s: float = 10.0) -> float:
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "cli.py", "--no-anim"],
+        cwd=REPO_ROOT,
+        env=_child_env(base_url),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    seen = threading.Event()
+    elapsed: List[float] = []
+
+    def _reader():
+        buffer = b""
+        while True:
+            chunk = os.read(proc.stdout.fileno(), 4096)
+            if not chunk:
+                return
+            buffer += chunk
+            if PROMPT_MARKER in buffer and not seen.is_set():
+                elapsed.append(time.perf_counter() - start)
+                seen.set()
+
+    reader = threading.Thread(target=_reader, daemon=True)
+    reader.start()
+    try:
+        if not seen.wait(timeout_s):
+            raise RuntimeError(f"no menu prompt within {timeout_s:.0f}s")
+        proc.stdin.write(b"0\n")  # exit from the menu
+        proc.stdin.flush()
+        proc.wait(timeout=timeout_s)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+    return elapsed[0] * 1000
+
+
+def _print_importtime(top: int) -> None:
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import cli"],
+        cwd=REPO_ROOT,
+        env=_child_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_part, cumulative_us, name = line.split("|")
+        self_us = self_part.split(":")[1]
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    rows.sort(reverse=True)
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, name in rows[:top]:
+        print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}")
+
+
+# -- PUBLIC FUNCTIONS
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark cli.py startup")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument(
+        "--importtime", action="store_true", help="show the slowest imports"
+    )
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args(argv)
+
+    if args.importtime:
+        _print_importtime(args.top)
+        return 0
+
+    from benchmarks.mock_lens_server import MockTenant, serve_in_thread
+
+    server, base_url = serve_in_thread(MockTenant())
+    try:
+        _time_to_first_prompt(base_url)  # warm the OS file cache
+        ttfp = [_time_to_first_prompt(base_url) for _ in range(args.runs)]
+    finally:
+        server.shutdown()
+    imports = _time_import(args.runs)
+    leaked = _loaded_deferred_modules()
+
+    print(
+        f"import cli:           median {statistics.median(imports):7.1f} ms "
+        f"(min {min(imports):.1f}, max {max(imports):.1f})"
+    )
+    print(
+        f"time to first prompt: median {statistics.median(ttfp):7.1f} ms "
+        f"(min {min(ttfp):.1f}, max {max(ttfp):.1f}) » budget {args.budget_ms:.0f} ms"
+    )
+
+    failed = False
+    if leaked:
+        print(f"FAIL: loaded at startup but should be deferred: {', '.join(leaked)}")
+        failed = True
+    if statistics.median(ttfp) > args.budget_ms:
+        print("FAIL: time to first prompt is over budget")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
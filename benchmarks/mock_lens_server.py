@@ -0,0 +1,736 @@
+"""Local stand-in for the Lens GraphQL API and OAuth token endpoint, with configurable
+latency, query-cost accounting and 429/5xx injection. GET /__stats, POST /__reset."""
+
+import re
+import gzip
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+
+# -- GLOBALS
+
+DEFAULT_TENANT_ID = "mock-tenant"
+DEFAULT_TENANT_NAME = "Mock Lens Tenant"
+
+DEFAULT_LATEST_VERSIONS = {
+    "lens-desktop-mac": "2.3.1.100",
+    "lens-desktop-windows": "2.3.1.100",
+    "lens-desktop-windows-arm": "2.3.0.90",
+}
+
+BATCH_ALIAS = re.compile(
+    r'(\w+)\s*:\s*devicePolicyCapabilities\s*\(\s*deviceId\s*:\s*"((?:[^"\\]|\\.)*)"\s*\)'
+)
+# trimmed fragment » selection set opens with `sources`, no effective capabilities
+TRIMMED_SELECTION = re.compile(r"devicePolicyCapabilities\s*\([^)]*\)\s*\{\s*sources\b")
+COMPRESS_MIN_BYTES = 1024
+
+
+class MockConfig:
+    def __init__(
+        self,
+        *,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        cost_limit: int = 100_000,
+        reset_seconds: float = 60.0,
+        error_429_rate: float = 0.0,
+        error_5xx_rate: float = 0.0,
+        device_page_cost: int = 70,
+        policy_cost: int = 10,
+        mutation_cost: int = 5,
+        lookup_cost: int = 1,
+        seed: int | None = None,
+        compress: bool = True,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.cost_limit = cost_limit
+        self.reset_seconds = reset_seconds
+        self.error_429_rate = error_429_rate
+        self.error_5xx_rate = error_5xx_rate
+        # cost model » per 100 devices on a deviceSearch page, per aliased policy stack, per mutation
+        self.device_page_cost = device_page_cost
+        self.policy_cost = policy_cost
+        self.mutation_cost = mutation_cost
+        self.lookup_cost = lookup_cost
+        self.rng = random.Random(seed)
+        self.compress = compress
+
+
+class MockTenant:
+    """in-memory tenant data. devices/policy_stacks match the DEVICE_LIST and DEVICE_POLICY_CAPABILITIES shapes"""
+
+    def __init__(
+        self,
+        *,
+        tenant_id: str = DEFAULT_TENANT_ID,
+        name: str = DEFAULT_TENANT_NAME,
+        devices: List[Dict[str, Any]] | None = None,
+        policy_stacks: Dict[str, Dict[str, Any]] | None = None,
+        sites: List[Dict[str, Any]] | None = None,
+        rooms: List[Dict[str, Any]] | None = None,
+        latest_versions: Dict[str, str] | None = None,
+    ):
+        self.tenant_id = tenant_id
+        self.name = name
+        self.devices = devices or []
+        self.policy_stacks = policy_stacks or {}
+        self.sites: Dict[str, Dict[str, Any]] = {s["id"]: dict(s) for s in sites or []}
+        self.rooms: Dict[str, Dict[str, Any]] = {r["id"]: dict(r) for r in rooms or []}
+        self.latest_versions = latest_versions or dict(DEFAULT_LATEST_VERSIONS)
+        self._next_id = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MockTenant":
+        return cls(
+            tenant_id=data.get("tenant_id", DEFAULT_TENANT_ID),
+            name=data.get("name", DEFAULT_TENANT_NAME),
+            devices=data.get("devices"),
+            policy_stacks=data.get("policy_stacks"),
+            sites=data.get("sites"),
+            rooms=data.get("rooms"),
+            latest_versions=data.get("latest_versions"),
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "MockTenant":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def new_id(self, prefix: str) -> str:
+        # caller holds self.lock
+        self._next_id += 1
+        return f"{prefix}-{self._next_id:08d}"
+
+
+class CostLedger:
+    """fixed-window query cost budget, same fields as calculateQueryCost"""
+
+    def __init__(self, limit: int, reset_seconds: float):
+        self.limit = limit
+        self.reset_seconds = reset_seconds
+        self._used = 0
+        self._window_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _roll(self, now: float) -> None:
+        if now - self._window_start >= self.reset_seconds:
+            self._used = 0
+            self._window_start = now
+
+    def charge(self, cost: int) -> Tuple[bool, Dict[str, Any]]:
+        with self._lock:
+            now = time.monotonic()
+            self._roll(now)
+            allowed = self._used + cost <= self.limit
+            if allowed:
+                self._used += cost
+            seconds_to_reset = max(
+                int(self.reset_seconds - (now - self._window_start)), 0
+            )
+            return allowed, {
+                "queryCost": cost,
+                "costUsed": self._used,
+                "costRemaining": max(self.limit - self._used, 0),
+                "secondsToReset": seconds_to_reset,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._used = 0
+            self._window_start = time.monotonic()
+
+
+class MockStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.requests = 0
+        self.by_operation: Dict[str, int] = {}
+        self.token_requests = 0
+        self.injected_429 = 0
+        self.injected_5xx = 0
+        self.budget_429 = 0
+        self.cost_charged = 0
+        self.started = time.monotonic()
+
+    def record(self, operation: str, cost: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.by_operation[operation] = self.by_operation.get(operation, 0) + 1
+            self.cost_charged += cost
+
+    def bump(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "by_operation": dict(self.by_operation),
+                "token_requests": self.token_requests,
+                "injected_429": self.injected_429,
+                "injected_5xx": self.injected_5xx,
+                "budget_429": self.budget_429,
+                "cost_charged": self.cost_charged,
+                "uptime_s": round(time.monotonic() - self.started, 3),
+            }
+
+
+# -- PRIVATE HELPERS » NO TOUCHY!
+
+
+def _gql_error(message: str) -> Dict[str, Any]:
+    return {"errors": [{"message": message}], "data": None}
+
+
+def _site_ref(tenant: MockTenant, site_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    site = tenant.sites.get(site_id) if site_id else None
+    return {"id": site["id"], "name": site["name"]} if site else None
+
+
+def _room_node(tenant: MockTenant, room: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": room.get("name"),
+        "id": room["id"],
+        "capacity": room.get("capacity"),
+        "size": room.get("size") or "NONE",
+        "floor": room.get("floor"),
+        "updatedAt": room.get("updatedAt"),
+        "site": _site_ref(tenant, room.get("siteId")),
+    }
+
+
+def _filter_value(params: Dict[str, Any] | None, field: str) -> Optional[str]:
+    for item in (params or {}).get("filter") or []:
+        if item.get("field") == field and item.get("comparisonOperator") == "EQUALS":
+            return item.get("value")
+    return None
+
+
+def _classify(query: str) -> str:
+    # order matters » the batch query also mentions devicePolicyCapabilities
+    if "mutation" in query and "upsertRoom" in query:
+        return "upsertRoom"
+    if "mutation" in query and "upsertSite" in query:
+        return "upsertSite"
+    if "BatchDevicePolicies" in query or BATCH_ALIAS.search(query):
+        return "batchDevicePolicies"
+    if "devicePolicyCapabilities" in query:
+        return "devicePolicyCapabilities"
+    if "deviceSearch" in query:
+        return "deviceSearch"
+    if "softwareReleases" in query:
+        return "hardwareProduct"
+    if "siteData" in query:
+        return "siteData"
+    if "roomData" in query:
+        return "roomData"
+    if re.search(r"\bsite\s*\(\s*id", query):
+        return "site"
+    if "clientCredential" in query:
+        return "clientCredential"
+    if re.search(r"\btenant\s*\(\s*id", query):
+        return "tenant"
+    if "calculateQueryCost" in query:
+        return "calculateQueryCost"
+    return "unknown"
+
+
+# -- RESOLVERS » each returns (cost, payload)
+
+
+def _resolve_device_search(
+    tenant: MockTenant, config: MockConfig, variables: Dict[str, Any]
+) -> Tuple[int, Dict[str, Any]]:
+    params = variables.get("params") or {}
+    page_size = int(params.get("pageSize") or 50)
+    offset = int(params.get("nextToken") or 0)
+    contains = (params.get("filter") or {}).get("contains") or ""
+
+    matching = [d for d in tenant.devices if contains in (d.get("hardwareModel") or "")]
+    page = matching[offset : offset + page_size]
+    next_offset = offset + len(page)
+    has_next = next_offset < len(matching)
+
+    cost = max(config.device_page_cost * page_size // 100, 1)
+    payload = {
+        "tenant": {
+            "inventory": {
+                "deviceSearch": {
+                    "edges": [{"node": node} for node in page],
+                    "pageInfo": {
+                        "hasNextPage": has_next,
+                        "nextToken": str(next_offset) if has_next else None,
+                        "totalCount": len(matching),
+                    },
+                }
+            }
+        }
+    }
+    return cost, payload
+
+
+def _resolve_batch_policies(
+    tenant: MockTenant, config: MockConfig, query: str
+) -> Tuple[int, Dict[str, Any]]:
+    payload = {}
+    aliases = BATCH_ALIAS.findall(query)
+    trimmed = TRIMMED_SELECTION.search(query) is not None
+    for alias, device_id in aliases:
+        stack = tenant.policy_stacks.get(device_id.replace('\\"', '"'))
+        if trimmed and stack:
+            stack = {"sources": stack["sources"]}
+        payload[alias] = stack
+    return max(config.policy_cost * len(aliases), 1), payload
+
+
+def _resolve_hardware_product(
+    tenant: MockTenant, config: MockConfig, variables: Dict[str, Any]
+) -> Tuple[int, Dict[str, Any]]:
+    catalog_id = variables.get("hardwareProductId")
+    latest = tenant.latest_versions.get(catalog_id)
+    if not latest:
+        return config.lookup_cost, {"hardwareProduct": None}
+    edges = [
+        {
+            "node": {
+                "version": latest,
+                "publishDate": "2025-01-01T00:00:00Z",
+                "releaseChannel": "production",
+            }
+        }
+    ]
+    return config.lookup_cost, {
+        "hardwareProduct": {"name": catalog_id, "softwareReleases": {"edges": edges}}
+    }
+
+
+def _resolve_site_data(
+    tenant: MockTenant, config: MockConfig, variables: Dict[str, Any]
+) -> Tuple[int, Dict[str, Any]]:
+    params = variables.get("params") or {}
+    name = _filter_value(params, "NAME")
+    with tenant.lock:
+        sites = [s for s in tenant.sites.values() if name is None or s["name"] == name]
+    limit = params.get("limit")
+    if limit:
+        sites = sites[: int(limit)]
+    edges = [{"node": {"id": s["id"], "name": s["name"]}} for s in sites]
+    return config.lookup_cost, {"siteData": {"edges": edges}}
+
+
+def _resolve_site(
+    tenant: MockTenant, config: MockConfig, variables: Dict[str, Any]
+) -> Tuple[int, Dict[str, Any] | None]:
+    with tenant.lock:
+        site = tenant.sites.get(variables.get("id"))
+    if not site:
+        # the real API answers a bad siteId this way, and site_ops keys off the message
+        return config.lookup_cost, None
+    return config.lookup_cost, {"site": {"id": site["id"], "name": site["name"]}}
+
+
+def _resolve_room_data(
+    tenant: MockTenant, config: MockConfig, variables: Dict[str, Any]
+) -> Tuple[int, Dict[str, Any]]:
+    params = variables.get("params") or {}
+    name = _filter_value(params, "ROOM_NAME")
+    limit = int(params.get("limit") or 50)
+    offset = int(params.get("cursor") or 0)
+
+    with tenant.lock:
+        rooms = sorted(tenant.rooms.values(), key=lambda r: r.get("name") or "")
+        if name is not None:
+            rooms = [r for r in rooms if r.get("name") == name]
+        page = rooms[offset : offset + limit]
+        nodes = [_room_node(tenant, r) for r in page]
+    next_offset = offset + len(page)
+    has_next = next_offset < len(rooms)
+    payload = {
+        "tenants": [
+            {
+                "roomData": {
+                    "pageInfo": {
+                        "hasNextPage": has_next,
+                        "endCursor": str(next_offset) if has_next else None,
+                    },
+                    "edges": [{"node": n} for n in nodes],
+                }
+            }
+        ]
+    }
+    return config.lookup_cost, payload
+
+
+def _resolve_upsert_room(
+    tenant: MockTenant, config: MockConfig, variables: Dict[str, Any]
+) -> Tuple[int, Dict[str, Any] | str]:
+    fields = dict(variables.get("fields") or {})
+    with tenant.lock:
+        room_id = fields.get("id")
+        name = fields.get("name")
+        if name is not None:
+            clash = next(
+                (
+                    r
+                    for r in tenant.rooms.values()
+                    if r.get("name") == name and r["id"] != room_id
+                ),
+                None,
+            )
+            if clash:
+                return config.mutation_cost, f"Room name '{name}' already exists"
+        if fields.get("siteId") and fields["siteId"] not in tenant.sites:
+            return config.mutation_cost, "resource mapping failed"
+
+        if room_id:
+            room = tenant.rooms.get(room_id)
+            if room is None:
+                return config.mutation_cost, "resource mapping failed"
+        else:
+            if not name:
+                return config.mutation_cost, "name is required to create a room"
+            room = {"id": tenant.new_id("room")}
+            tenant.rooms[room["id"]] = room
+
+        for key in ("name", "capacity", "size", "floor", "siteId"):
+            if key in fields:
+                room[key] = fields[key]
+        room["updatedAt"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        node = _room_node(tenant, room)
+    return config.mutation_cost, {"upsertRoom": node}
+
+
+def _resolve_upsert_site(
+    tenant: MockTenant, config: MockConfig, variables: Dict[str, Any]
+) -> Tuple[int, Dict[str, Any] | str]:
+    fields = variables.get("fields") or {}
+    with tenant.lock:
+        site_id = fields.get("id")
+        if site_id:
+            site = tenant.sites.get(site_id)
+            if site is None:
+                return config.mutation_cost, "resource mapping failed"
+        else:
+            site = {"id": tenant.new_id("site")}
+            tenant.sites[site["id"]] = site
+        if fields.get("name"):
+            site["name"] = fields["name"]
+        result = {"id": site["id"], "name": site.get("name")}
+    return config.mutation_cost, {"upsertSite": result}
+
+
+# -- SERVER
+
+
+class LensMockHandler(BaseHTTPRequestHandler):
+    server_version = "LensMock/1.0"
+    protocol_version = "HTTP/1.1"  # keep-alive so the pooled session is exercised
+
+    # set on the server instance by make_server
+    @property
+    def tenant(self) -> MockTenant:
+        return self.server.tenant
+
+    @property
+    def config(self) -> MockConfig:
+        return self.server.config
+
+    @property
+    def ledger(self) -> CostLedger:
+        return self.server.ledger
+
+    @property
+    def stats(self) -> MockStats:
+        return self.server.stats
+
+    def log_message(self, format, *args):  # noqa: A002 » quiet by default
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: Any) -> None:
+        raw = json.dumps(body).encode("utf-8")
+        accepts = self.headers.get("accept-encoding") or ""
+        gzipped = (
+            self.config.compress
+            and len(raw) >= COMPRESS_MIN_BYTES
+            and "gzip" in accepts.lower()
+        )
+        if gzipped:
+            raw = gzip.compress(raw, compresslevel=5)
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        if gzipped:
+            self.send_header("content-encoding", "gzip")
+        self.send_header("content-length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("content-length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        return json.loads(raw or b"{}")
+
+    def _simulate_latency(self) -> None:
+        delay_ms = self.config.latency_ms
+        if self.config.jitter_ms:
+            delay_ms += self.config.rng.uniform(0, self.config.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def do_GET(self):
+        if self.path == "/__stats":
+            self._send_json(200, self.stats.snapshot())
+            return
+        self._send_json(404, {"error": "not found"})
+
+    def do_HEAD(self):
+        # connection warm-up probe (auth.warm_up) » answer without closing the socket
+        self.send_response(204)
+        self.end_headers()
+
+    def do_POST(self):
+        try:
+            body = self._read_json()
+        except ValueError:
+            self._send_json(400, {"error": "invalid json"})
+            return
+
+        if self.path == "/__reset":
+            self.stats.reset()
+            self.ledger.reset()
+            self._send_json(200, {"ok": True})
+            return
+
+        if self.path.rstrip("/").endswith("/oauth/token"):
+            self.stats.bump("token_requests")
+            self._simulate_latency()
+            if not body.get("client_id") or not body.get("client_secret"):
+                self._send_json(401, {"error": "invalid_client"})
+                return
+            self._send_json(
+                200,
+                {
+                    "access_token": f"mock-token-{body['client_id']}",
+                    "token_type": "Bearer",
+                    "expires_in": 3600,
+                },
+            )
+            return
+
+        if not self.path.rstrip("/").endswith("/graphql"):
+            self._send_json(404, {"error": "not found"})
+            return
+
+        if not (self.headers.get("authorization") or "").startswith("Bearer "):
+            self._send_json(401, _gql_error("missing bearer token"))
+            return
+
+        self._simulate_latency()
+        self._handle_graphql(body)
+
+    def _handle_graphql(self, body: Dict[str, Any]) -> None:
+        query = body.get("query") or ""
+        variables = body.get("variables") or {}
+        operation = _classify(query)
+
+        # fault injection happens before any cost is charged
+        roll = self.config.rng.random()
+        if roll < self.config.error_429_rate:
+            self.stats.bump("injected_429")
+            self._send_json(429, _gql_error("Too Many Requests"))
+            return
+        if roll < self.config.error_429_rate + self.config.error_5xx_rate:
+            self.stats.bump("injected_5xx")
+            self._send_json(
+                self.config.rng.choice((502, 503, 504)),
+                _gql_error("upstream unavailable"),
+            )
+            return
+
+        tenant = self.tenant
+        cost = self.config.lookup_cost
+        data: Dict[str, Any] = {}
+        error: Optional[str] = None
+
+        if operation == "deviceSearch":
+            cost, data = _resolve_device_search(tenant, self.config, variables)
+        elif operation == "batchDevicePolicies":
+            cost, data = _resolve_batch_policies(tenant, self.config, query)
+        elif operation == "devicePolicyCapabilities":
+            cost = self.config.policy_cost
+            data = {
+                "devicePolicyCapabilities": tenant.policy_stacks.get(
+                    variables.get("deviceId")
+                )
+            }
+        elif operation == "hardwareProduct":
+            cost, data = _resolve_hardware_product(tenant, self.config, variables)
+        elif operation == "siteData":
+            cost, data = _resolve_site_data(tenant, self.config, variables)
+        elif operation == "site":
+            cost, result = _resolve_site(tenant, self.config, variables)
+            if result is None:
+                error = "resource mapping failed"
+            else:
+                data = result
+        elif operation == "roomData":
+            cost, data = _resolve_room_data(tenant, self.config, variables)
+        elif operation == "upsertRoom":
+            cost, result = _resolve_upsert_room(tenant, self.config, variables)
+            if isinstance(result, str):
+                error = result
+            else:
+                data = result
+        elif operation == "upsertSite":
+            cost, result = _resolve_upsert_site(tenant, self.config, variables)
+            if isinstance(result, str):
+                error = result
+            else:
+                data = result
+        elif operation == "clientCredential":
+            data = {
+                "clientCredential": {
+                    "name": "Mock API Connection",
+                    "accessor": {"grants": [{"roles": [{"name": "Admin"}]}]},
+                }
+            }
+        elif operation == "tenant":
+            data = {"tenant": {"name": tenant.name}}
+        elif operation == "calculateQueryCost":
+            pass
+        else:
+            self._send_json(400, _gql_error("mock server doesn't implement this query"))
+            return
+
+        allowed, cost_info = self.ledger.charge(cost)
+        if not allowed:
+            self.stats.bump("budget_429")
+            self._send_json(429, _gql_error("Too Many Requests: query cost exceeded"))
+            return
+        self.stats.record(operation, cost)
+
+        if "calculateQueryCost" in query and operation not in (
+            "upsertRoom",
+            "upsertSite",
+        ):
+            data["calculateQueryCost"] = cost_info
+
+        if error:
+            self._send_json(200, {"errors": [{"message": error}], "data": data or None})
+        else:
+            self._send_json(200, {"data": data})
+
+
+# -- PUBLIC FUNCTIONS
+
+
+def make_server(
+    tenant: MockTenant,
+    config: MockConfig | None = None,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    *,
+    verbose: bool = False,
+) -> ThreadingHTTPServer:
+    config = config or MockConfig()
+    server = ThreadingHTTPServer((host, port), LensMockHandler)
+    server.daemon_threads = True
+    server.tenant = tenant
+    server.config = config
+    server.ledger = CostLedger(config.cost_limit, config.reset_seconds)
+    server.stats = MockStats()
+    server.verbose = verbose
+    return server
+
+
+def serve_in_thread(
+    tenant: MockTenant, config: MockConfig | None = None, **kwargs
+) -> Tuple[ThreadingHTTPServer, str]:
+    """start on a free port in a daemon thread. returns (server, base_url)"""
+    server = make_server(tenant, config, **kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Local mock of the Lens GraphQL API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--tenant-file", help="JSON tenant to serve")
+    source.add_argument(
+        "--devices", type=int, help="serve a synthetic tenant of this many devices"
+    )
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--cost-limit", type=int, default=100_000)
+    parser.add_argument("--reset-seconds", type=float, default=60.0)
+    parser.add_argument("--error-429-rate", type=float, default=0.0)
+    parser.add_argument("--error-5xx-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--no-compression",
+        action="store_true",
+        help="never gzip responses, even when the client accepts it",
+    )
+    parser.add_argument("--verbose", action="store_true")
+    return parser
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        cost_limit=args.cost_limit,
+        reset_seconds=args.reset_seconds,
+        error_429_rate=args.error_429_rate,
+        error_5xx_rate=args.error_5xx_rate,
+        seed=args.seed,
+        compress=not args.no_compression,
+    )
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = _build_arg_parser().parse_args(argv)
+    if args.tenant_file:
+        tenant = MockTenant.from_file(args.tenant_file)
+    elif args.devices:
+        from benchmarks.synthetic_tenant import generate_tenant
+
+        seed = args.seed if args.seed is not None else 0
+        tenant = MockTenant.from_dict(generate_tenant(args.devices, seed=seed))
+    else:
+        tenant = MockTenant()
+    server = make_server(
+        tenant, config_from_args(args), args.host, args.port, verbose=args.verbose
+    )
+    print(
+        f"Mock Lens API on http://{args.host}:{server.server_address[1]} "
+        f"({len(tenant.devices):,} devices, {len(tenant.rooms):,} rooms, {len(tenant.sites):,} sites)"
+    )
+    print(f"  LENS_EP=http://{args.host}:{server.server_address[1]}/graphql")
+    print(f"  AUTH_URL=http://{args.host}:{server.server_address[1]}/oauth/token")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,370 @@
+"""Seeded synthetic Lens tenant generator for scale tests, in the DEVICE_LIST and
+DEVICE_POLICY_CAPABILITIES shapes served by benchmarks.mock_lens_server."""
+
+import json
+import uuid
+import random
+import argparse
+from typing import Dict, Any, List, Tuple
+
+# -- GLOBALS
+
+PRESETS = {"10k": 10_000, "50k": 50_000, "100k": 100_000}
+
+HARDWARE_MODEL = "Desktop App"
+
+# (hardwareProduct, catalog id, weight)
+PLATFORMS = [
+    ("Desktop App MacOS", "lens-desktop-mac", 0.45),
+    ("Desktop App Windows x64", "lens-desktop-windows", 0.48),
+    ("Desktop App Windows ARM", "lens-desktop-windows-arm", 0.07),
+]
+
+LATEST_VERSIONS = {
+    "lens-desktop-mac": "2.3.1.412",
+    "lens-desktop-windows": "2.3.1.412",
+    "lens-desktop-windows-arm": "2.3.0.388",
+}
+
+# skewed like a real fleet » most on current/previous, a long tail of stragglers
+VERSION_WEIGHTS = [
+    ("2.3.1", 0.46),
+    ("2.3.0", 0.22),
+    ("2.2.4", 0.12),
+    ("2.2.1", 0.07),
+    ("2.1.0", 0.05),
+    ("2.0.3", 0.03),
+    ("1.9.8", 0.02),
+    ("1.8.2", 0.02),
+    ("1.6.0", 0.01),
+]
+
+SITE_NAMES = [
+    "HQ", "Austin", "Denver", "Boston", "London", "Dublin", "Berlin", "Sydney",
+    "Tokyo", "Toronto", "Seattle", "Chicago", "Madrid", "Paris", "Singapore",
+    "Bangalore", "Sao Paulo", "Mexico City", "Amsterdam", "Stockholm",
+]  # fmt: skip
+
+GROUP_NAMES = [
+    "Engineering", "Sales", "Support", "Finance", "Marketing", "Legal",
+    "Executives", "IT Pilot", "Contractors", "Design", "Operations", "HR",
+]  # fmt: skip
+
+PRIORITY = {"device": 1.0, "user_group": 10.0, "site": 100.0, "model": 1000.0}
+
+
+# -- PRIVATE HELPERS » NO TOUCHY!
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _pick(rng: random.Random, weighted: List[Tuple[Any, float]]) -> Any:
+    values, weights = zip(*weighted)
+    return rng.choices(values, weights=weights, k=1)[0]
+
+
+def _zipf_cum_weights(n: int, skew: float = 1.1) -> List[float]:
+    # a few big sites/groups and a long tail of small ones
+    total = 0.0
+    cum = []
+    for i in range(n):
+        total += 1 / (i + 1) ** skew
+        cum.append(total)
+    return cum
+
+
+def _zipf_index(rng: random.Random, cum_weights: List[float]) -> int:
+    return rng.choices(range(len(cum_weights)), cum_weights=cum_weights, k=1)[0]
+
+
+def _value(v: Any) -> Dict[str, Any]:
+    return {"value": v}
+
+
+def _software_update(
+    policy: Dict[str, Any] | None, variations: List[Dict[str, Any]] | None
+) -> Dict[str, Any]:
+    return {
+        "com": {
+            "poly": {
+                "software_update": {
+                    "policy": policy,
+                    "policy_variations": variations,
+                }
+            }
+        }
+    }
+
+
+def _random_setting(
+    rng: random.Random, catalog_id: str | None = None
+) -> Dict[str, Any]:
+    """one version/use_latest pair, optionally as a platform variation"""
+    use_latest = rng.random() < 0.25
+    version = None if use_latest else _pick(rng, VERSION_WEIGHTS[:4])
+    setting = {"version": _value(version), "use_latest": _value(use_latest)}
+    if catalog_id is not None:
+        setting["property_value"] = _value(catalog_id)
+    return setting
+
+
+def _make_policy(
+    rng: random.Random,
+    policy_type: str,
+    name: str,
+    priority: float,
+    *,
+    configured: bool,
+    variation_rate: float = 0.5,
+) -> Dict[str, Any]:
+    """a `sources[]` entry. unconfigured policies exist in the stack but carry no values"""
+    if not configured:
+        caps = _software_update(
+            {"version": _value(None), "use_latest": _value(None)}, None
+        )
+    elif policy_type != "device" and rng.random() < variation_rate:
+        # platform-specific variations; occasionally skip ARM to exercise "Not Configured"
+        catalogs = [c for _, c, _ in PLATFORMS]
+        if rng.random() < 0.2:
+            catalogs = catalogs[:2]
+        caps = _software_update(None, [_random_setting(rng, c) for c in catalogs])
+    else:
+        caps = _software_update(_random_setting(rng), None)
+
+    return {
+        "id": _uuid(rng),
+        "name": name,
+        "priority": priority,
+        "type": policy_type,
+        "capabilities": caps,
+    }
+
+
+def _effective_for(sources: List[Dict[str, Any]], catalog_id: str) -> Dict[str, Any]:
+    """what the API reports as the applied policy: first configured source by priority"""
+    for source in sorted(sources, key=lambda s: s["priority"]):
+        sw = source["capabilities"]["com"]["poly"]["software_update"]
+        variations = sw.get("policy_variations") or []
+        if variations:
+            for variation in variations:
+                if variation["property_value"]["value"] == catalog_id:
+                    return {
+                        "version": variation["version"],
+                        "use_latest": variation["use_latest"],
+                    }
+            # configured for other platforms only » falls through to lower layers
+            continue
+        policy = sw.get("policy") or {}
+        if (policy.get("version") or {}).get("value") is not None or (
+            policy.get("use_latest") or {}
+        ).get("value") is not None:
+            return {"version": policy["version"], "use_latest": policy["use_latest"]}
+    return {"version": _value(None), "use_latest": _value(None)}
+
+
+# -- PUBLIC FUNCTIONS
+
+
+def generate_tenant(
+    device_count: int,
+    *,
+    seed: int = 0,
+    site_count: int | None = None,
+    group_count: int | None = None,
+    site_membership: float = 0.8,
+    group_membership: float = 0.3,
+    device_policy_rate: float = 0.02,
+    room_count: int | None = None,
+) -> Dict[str, Any]:
+    """
+    build a tenant dict consumable by MockTenant.from_dict.
+    same seed + args » byte-identical output.
+    """
+    rng = random.Random(seed)
+
+    site_count = site_count or min(max(device_count // 500, 5), 200)
+    group_count = group_count or min(max(device_count // 2000, 4), 60)
+    room_count = room_count if room_count is not None else min(device_count // 10, 5000)
+
+    model_policy = _make_policy(
+        rng, "model", "Desktop App Update Policy", PRIORITY["model"], configured=True
+    )
+
+    sites = []
+    site_policies = []
+    for i in range(site_count):
+        base = SITE_NAMES[i % len(SITE_NAMES)]
+        site_name = (
+            base if i < len(SITE_NAMES) else f"{base} {i // len(SITE_NAMES) + 1}"
+        )
+        sites.append({"id": _uuid(rng), "name": site_name})
+        site_policies.append(
+            _make_policy(
+                rng,
+                "site",
+                f"Desktop App Site({site_name})",
+                PRIORITY["site"] + i,
+                configured=rng.random() < 0.6,
+            )
+        )
+
+    group_policies = []
+    for i in range(group_count):
+        base = GROUP_NAMES[i % len(GROUP_NAMES)]
+        group_name = (
+            base if i < len(GROUP_NAMES) else f"{base} {i // len(GROUP_NAMES) + 1}"
+        )
+        group_policies.append(
+            _make_policy(
+                rng,
+                "user_group",
+                f"Desktop App User Group({group_name})",
+                PRIORITY["user_group"] + i,
+                configured=rng.random() < 0.5,
+            )
+        )
+
+    platform_choices = [(p, p[2]) for p in PLATFORMS]
+    site_weights = _zipf_cum_weights(site_count)
+    group_weights = _zipf_cum_weights(group_count)
+
+    devices = []
+    policy_stacks = {}
+    for i in range(device_count):
+        product, catalog_id, _ = _pick(rng, platform_choices)
+        major = _pick(rng, VERSION_WEIGHTS)
+        software_version = f"{major}.{rng.randint(1, 450)}"
+        device_id = _uuid(rng)
+
+        devices.append(
+            {
+                "id": device_id,
+                "name": f"DESKTOP-{i:06d}",
+                "hardwareModel": HARDWARE_MODEL,
+                "hardwareProduct": product,
+                "softwareVersion": software_version,
+                "user": (
+                    {"email": f"user{i:06d}@example.com"}
+                    if rng.random() < 0.9
+                    else None
+                ),
+            }
+        )
+
+        # layered stack » model always, then site/group/device by membership
+        sources = [model_policy]
+        if rng.random() < site_membership:
+            sources.append(site_policies[_zipf_index(rng, site_weights)])
+        if rng.random() < group_membership:
+            sources.append(group_policies[_zipf_index(rng, group_weights)])
+        if rng.random() < device_policy_rate:
+            sources.append(
+                _make_policy(
+                    rng,
+                    "device",
+                    f"Desktop App Device Policy ({device_id})",
+                    PRIORITY["device"],
+                    configured=True,
+                )
+            )
+        # the API returns sources in priority order
+        sources.sort(key=lambda s: s["priority"])
+
+        effective = _effective_for(sources, catalog_id)
+        policy_stacks[device_id] = {
+            "capabilities": _software_update(effective, None),
+            "sources": sources,
+        }
+
+    rooms = []
+    for i in range(room_count):
+        site = sites[_zipf_index(rng, site_weights)] if rng.random() < 0.85 else None
+        rooms.append(
+            {
+                "id": _uuid(rng),
+                "name": f"{(site or {}).get('name', 'Room')} {100 + i}",
+                "capacity": rng.choice([None, 2, 4, 6, 8, 12, 20]),
+                "size": rng.choice(
+                    ["NONE", "FOCUS", "HUDDLE", "SMALL", "MEDIUM", "LARGE"]
+                ),
+                "floor": str(rng.randint(1, 12)),
+                "siteId": site["id"] if site else None,
+            }
+        )
+
+    return {
+        "tenant_id": "mock-tenant",
+        "name": f"Synthetic Tenant ({device_count:,} devices, seed {seed})",
+        "devices": devices,
+        "policy_stacks": policy_stacks,
+        "sites": sites,
+        "rooms": rooms,
+        "latest_versions": dict(LATEST_VERSIONS),
+    }
+
+
+def fetched_devices(tenant: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """devices as fetch_devices_by_model returns them (user flattened to user_email)"""
+    return [
+        {
+            "id": node["id"],
+            "name": node["name"],
+            "hardwareModel": node["hardwareModel"],
+            "hardwareProduct": node["hardwareProduct"],
+            "softwareVersion": node["softwareVersion"],
+            "user_email": (node.get("user") or {}).get("email"),
+        }
+        for node in tenant["devices"]
+    ]
+
+
+def attributed_devices(tenant: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """fetched devices with policy_attribution attached, as after fetch_policy_attributions_concurrent"""
+    from utils.compliance_analysis import parse_policy_attribution
+
+    devices = fetched_devices(tenant)
+    stacks = tenant["policy_stacks"]
+    layer_cache = {}  # shared model/site/group layers, like the crawl
+    for device in devices:
+        device["policy_attribution"] = parse_policy_attribution(
+            stacks[device["id"]], layer_cache=layer_cache
+        )
+    return devices
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Generate a synthetic Lens tenant")
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument("--devices", type=int)
+    size.add_argument("--preset", choices=sorted(PRESETS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sites", type=int, default=None)
+    parser.add_argument("--groups", type=int, default=None)
+    parser.add_argument("--rooms", type=int, default=None)
+    parser.add_argument("-o", "--output", required=True)
+    return parser
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = _build_arg_parser().parse_args(argv)
+    device_count = args.devices if args.devices else PRESETS[args.preset]
+    tenant = generate_tenant(
+        device_count,
+        seed=args.seed,
+        site_count=args.sites,
+        group_count=args.groups,
+        room_count=args.rooms,
+    )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(tenant, f)
+    print(
+        f"Wrote {len(tenant['devices']):,} devices, {len(tenant['sites']):,} sites, "
+        f"{len(tenant['rooms']):,} rooms » {args.output}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
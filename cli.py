@@ -1,25 +1,39 @@
+import os
 import sys
 import time
+import argparse
+import threading
+from concurrent.futures import Future, wait
 
-import requests
 import utils.panel_renderer as panels
+import utils.gql_metrics as gql_metrics
 from rich.text import Text
 from rich.panel import Panel
 from rich.live import Live
 from rich.align import Align
 from utils.ascii import LATER_DUDE
-from utils.auth import get_client_details, CLIENT_ID, fetch_tenant_name
 from utils.env_helper import print_indented
-from utils.room_ops import export_rooms, update_rooms
-from utils.bulk_create import create_rooms
-from utils.site_ops import create_site_if_not_exists
-from utils.compliance_ops import check_compliance
+
+# task modules (pandas, pygments, ...) are imported when their task runs » keeps startup fast
 
 # -- GLOBALS
 
 INITIAL_LOOP = True
 IDENTITY = None
 FLASH = ""
+PENDING_IDENTITY = {
+    "name": "resolving...",
+    "role": "resolving...",
+    "tenant_name": "resolving...",
+}
+IDENTITY_WAIT_S = 10  # after the boot animation, before giving up on the lookups
+_identity_lookups: tuple[Future, Future] | None = None
+
+# headless exit codes » 2 matches argparse's own usage errors
+EXIT_OK = 0
+EXIT_FAILED = 1  # task ran but some rooms/devices failed, or nothing to report
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
 # -- CLI MENU
 
 console = panels._console()
@@ -70,10 +84,426 @@ def _ask_str(
     return raw
 
 
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="LENSCTL OPS DECK » run without a subcommand for the interactive menu"
+    )
+    profile_flags = argparse.ArgumentParser(add_help=False)
+    # SUPPRESS keeps a flag given before the subcommand from being reset after it
+    profile_flags.add_argument(
+        "--profile",
+        action="store_true",
+        default=argparse.SUPPRESS,
+        help="print a per-phase time/memory breakdown after the compliance check",
+    )
+    profile_flags.add_argument(
+        "--profile-out",
+        metavar="PATH",
+        default=argparse.SUPPRESS,
+        help="also dump cProfile stats for the compliance check to PATH (implies --profile)",
+    )
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--profile-out", metavar="PATH")
+    parser.add_argument(
+        "--no-anim",
+        action="store_true",
+        help="skip the boot animation (also LENSCTL_NO_ANIM=1, or when stdout isn't a terminal)",
+    )
+
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.add_parser("export-rooms", help="export all rooms to room_data.csv")
+    import_rooms = commands.add_parser(
+        "import-rooms", help="update rooms from room_data.csv"
+    )
+    import_rooms.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="import independent rows concurrently (default 1 = csv order)",
+    )
+
+    create = commands.add_parser("create-rooms", help="bulk create rooms")
+    create.add_argument("--count", type=int, required=True)
+    create.add_argument("--base-name", default="Room")
+    create.add_argument("--start", type=int, default=0)
+    create.add_argument("--site", help="site name » created if it doesn't exist")
+    create.add_argument("--workers", type=int, default=4)
+
+    compliance = commands.add_parser(
+        "compliance",
+        parents=[profile_flags],
+        help="Desktop App compliance check + CSV/XLSX exports",
+    )
+    compliance.add_argument(
+        "--baseline",
+        required=True,
+        choices=["model", "site", "user_group", "group"],
+        help="policy layer to measure against",
+    )
+    compliance.add_argument(
+        "--policy",
+        help="site/group policy name or id » omit (or 'all') to compare each device to its own",
+    )
+    compliance.add_argument(
+        "--columnar",
+        choices=["parquet", "arrow"],
+        help="also write typed per-device results as Parquet/Arrow IPC (needs pyarrow)",
+    )
+    compliance.add_argument(
+        "--freeze-gc",
+        action="store_true",
+        help="keep the GC off the crawled devices during analysis » faster on big tenants",
+    )
+    compliance.add_argument(
+        "--analysis-workers",
+        type=int,
+        metavar="N",
+        help="shard the analysis over N processes » pays off from ~10k devices per process",
+    )
+
+    drift = commands.add_parser(
+        "compliance-diff",
+        help="compliance drift between two saved runs (snapshots)",
+    )
+    drift.add_argument(
+        "old",
+        nargs="?",
+        help="older snapshot (.json.gz) » omit both to diff the two newest runs",
+    )
+    drift.add_argument("new", nargs="?", help="newer snapshot (.json.gz)")
+
+    watch = commands.add_parser(
+        "compliance-watch",
+        help="re-check one baseline on an interval, fetching only what changed",
+    )
+    watch.add_argument(
+        "--baseline",
+        required=True,
+        choices=["model", "site", "user_group", "group"],
+        help="policy layer to measure against",
+    )
+    watch.add_argument(
+        "--policy",
+        help="site/group policy name or id » omit (or 'all') to compare each device to its own",
+    )
+    watch.add_argument(
+        "--interval",
+        type=float,
+        default=60,
+        help="minutes between cycles (default 60)",
+    )
+    watch.add_argument(
+        "--cycles", type=int, help="stop after N cycles » default runs until Ctrl+C"
+    )
+    watch.add_argument(
+        "--refresh-cycles",
+        type=int,
+        default=24,
+        help="refetch every device's policy stack at least once per N cycles (default 24)",
+    )
+
+    trend = commands.add_parser(
+        "compliance-trend",
+        help="daily compliance trend from the history store",
+    )
+    trend.add_argument(
+        "--by",
+        choices=["overall", "layer", "platform", "version"],
+        default="overall",
+        help="one line per layer/platform/version instead of the overall %%",
+    )
+    trend.add_argument("--days", type=int, default=30, help="days back (default 30)")
+    trend.add_argument(
+        "--baseline-key",
+        help="history key, i.e. model or site-hq » omit for the most recent run's",
+    )
+
+    fleet = commands.add_parser(
+        "fleet",
+        help="run compliance or a room export for every tenant in a manifest, in parallel",
+    )
+    fleet.add_argument("task", choices=["compliance", "export-rooms"])
+    fleet.add_argument(
+        "--manifest",
+        help="tenant manifest JSON (default tenants.json or LENSCTL_TENANT_MANIFEST)",
+    )
+    fleet.add_argument(
+        "--out",
+        metavar="DIR",
+        help="per-tenant folders + rollup CSV (default fleet or LENSCTL_FLEET_DIR)",
+    )
+    fleet.add_argument(
+        "--parallel", type=int, default=4, help="tenants at a time (default 4)"
+    )
+    fleet.add_argument(
+        "--baseline",
+        choices=["model", "site", "user_group", "group"],
+        help="compliance only » policy layer to measure against",
+    )
+    fleet.add_argument(
+        "--policy",
+        help="compliance only » site/group policy name or id, looked up in each tenant",
+    )
+    fleet.add_argument(
+        "--columnar",
+        choices=["parquet", "arrow"],
+        help="compliance only » also write typed per-device results (needs pyarrow)",
+    )
+    return parser.parse_args(argv)
+
+
+def _in_background(fn, *args) -> Future:
+    # daemon thread » a hung lookup never holds up exit
+    future: Future = Future()
+
+    def _run():
+        try:
+            future.set_result(fn(*args))
+        except Exception as exc:
+            future.set_exception(exc)
+
+    threading.Thread(target=_run, daemon=True).start()
+    return future
+
+
+def _start_identity_lookup() -> None:
+    global _identity_lookups, IDENTITY
+    IDENTITY = dict(PENDING_IDENTITY)
+    # auth reads (and validates) the tenant's .env on import » only once a task needs it
+    from utils.auth import get_client_details, CLIENT_ID, fetch_tenant_name, warm_up
+
+    # token + TLS handshake first, in parallel » the lookups below (and the first
+    # task) reuse both. results are cached in auth for the rest of the session
+    warm_up()
+    # both lookups are independent round trips » run them side by side
+    _identity_lookups = (
+        _in_background(get_client_details, CLIENT_ID),
+        _in_background(fetch_tenant_name),
+    )
+
+
+def _refresh_identity(wait_s: float = 0) -> None:
+    """swap the placeholder for the real identity once both lookups have landed"""
+    global _identity_lookups, IDENTITY
+    if _identity_lookups is None:
+        return
+    client_future, tenant_future = _identity_lookups
+    if wait_s:
+        wait(_identity_lookups, timeout=wait_s)
+    if not (client_future.done() and tenant_future.done()):
+        return
+    _identity_lookups = None
+
+    try:
+        IDENTITY = client_future.result()
+    except Exception as exc:
+        IDENTITY = {
+            "name": "Unknown credential",
+            "role": "Unknown role",
+            "error": str(exc),
+        }
+
+    try:
+        IDENTITY["tenant_name"] = tenant_future.result() or "Unknown tenant"
+    except Exception:
+        IDENTITY["tenant_name"] = "Unknown tenant"
+
+
+def _install_tracebacks() -> None:
+    # rich.traceback pulls in pygments + rich.pretty » installed on first task, not at startup
+    from rich.traceback import install
+
+    install()  # colorize uncaught exceptions and tracebacks
+
+
+def _run_export_rooms(args: argparse.Namespace) -> int:
+    from utils.room_ops import export_rooms
+
+    exported, errors = export_rooms(interactive=False)
+    return EXIT_FAILED if errors else EXIT_OK
+
+
+def _run_import_rooms(args: argparse.Namespace) -> int:
+    from utils.room_ops import update_rooms
+
+    if args.workers < 1:
+        print_indented("--workers must be >= 1", style="red bold")
+        return EXIT_USAGE
+    imported, errors = update_rooms(interactive=False, max_workers=args.workers)
+    return EXIT_FAILED if errors else EXIT_OK
+
+
+def _run_create_rooms(args: argparse.Namespace) -> int:
+    from utils.bulk_create import create_rooms
+    from utils.site_ops import create_site_if_not_exists
+
+    if args.count < 1:
+        print_indented("--count must be >= 1", style="red bold")
+        return EXIT_USAGE
+    site_id = None
+    if args.site:
+        try:
+            site_id = create_site_if_not_exists(args.site.strip())
+        except Exception as exc:
+            print_indented(f"Site lookup/create failed: {exc}", style="red bold")
+            return EXIT_FAILED
+    created, errors = create_rooms(
+        args.count,
+        args.base_name,
+        args.start,
+        siteId=site_id,
+        max_workers=args.workers,
+    )
+    return EXIT_FAILED if errors else EXIT_OK
+
+
+def _run_compliance(args: argparse.Namespace) -> int:
+    from utils.compliance_ops import check_compliance, BaselineNotFoundError
+    from utils import columnar_export
+
+    # fail before the crawl, not after it
+    if args.columnar and not columnar_export.available():
+        print_indented(
+            f"--columnar {args.columnar} needs pyarrow » pip install pyarrow",
+            style="red bold",
+        )
+        return EXIT_USAGE
+    if args.analysis_workers is not None and args.analysis_workers < 1:
+        print_indented("--analysis-workers must be >= 1", style="red bold")
+        return EXIT_USAGE
+
+    try:
+        completed = check_compliance(
+            profile=args.profile,
+            pstats_path=args.profile_out,
+            baseline_layer=args.baseline,
+            baseline_policy=args.policy,
+            columnar=args.columnar,
+            freeze_gc=args.freeze_gc,
+            analysis_workers=args.analysis_workers,
+        )
+    except BaselineNotFoundError as exc:
+        print_indented(str(exc), style="red bold")
+        return EXIT_USAGE
+    return EXIT_OK if completed else EXIT_FAILED
+
+
+def _run_compliance_diff(args: argparse.Namespace) -> int:
+    from utils import compliance_snapshots
+
+    if bool(args.old) != bool(args.new):
+        print_indented("pass both snapshots, or neither", style="red bold")
+        return EXIT_USAGE
+    paths = (args.old, args.new) if args.old else compliance_snapshots.latest_pair()
+    if paths is None:
+        print_indented(
+            f"Need two saved runs of one baseline in {compliance_snapshots.SNAPSHOT_DIR}",
+            style="yellow",
+        )
+        return EXIT_FAILED
+
+    old = compliance_snapshots.load_snapshot(paths[0])
+    new = compliance_snapshots.load_snapshot(paths[1])
+    diff = compliance_snapshots.diff_snapshots(old, new)
+    compliance_snapshots.display_drift(diff)
+    compliance_snapshots.export_drift_csv(diff)
+    return EXIT_OK
+
+
+def _run_compliance_watch(args: argparse.Namespace) -> int:
+    from utils.compliance_ops import BaselineNotFoundError
+    from utils.compliance_watch import watch_compliance
+
+    if args.interval <= 0 or (args.cycles is not None and args.cycles < 1):
+        print_indented("--interval must be > 0 and --cycles >= 1", style="red bold")
+        return EXIT_USAGE
+    if args.refresh_cycles < 1:
+        print_indented("--refresh-cycles must be >= 1", style="red bold")
+        return EXIT_USAGE
+
+    try:
+        completed = watch_compliance(
+            args.baseline,
+            args.policy,
+            interval_s=args.interval * 60,
+            cycles=args.cycles,
+            refresh_cycles=args.refresh_cycles,
+        )
+    except BaselineNotFoundError as exc:
+        print_indented(str(exc), style="red bold")
+        return EXIT_USAGE
+    return EXIT_OK if completed else EXIT_FAILED
+
+
+def _run_compliance_trend(args: argparse.Namespace) -> int:
+    from utils import compliance_history
+
+    key = args.baseline_key or compliance_history.latest_baseline_key()
+    if key is None:
+        print_indented(
+            f"No compliance history yet in {compliance_history.HISTORY_DB}",
+            style="yellow",
+        )
+        return EXIT_FAILED
+    if not compliance_history.trend(key, args.by, days=args.days):
+        print_indented(
+            f"No runs of '{key}' in the last {args.days} days", style="yellow"
+        )
+        return EXIT_FAILED
+    compliance_history.display_trend(key, args.by, days=args.days)
+    return EXIT_OK
+
+
+def _run_fleet(args: argparse.Namespace) -> int:
+    from utils import tenant_runner
+
+    if args.parallel < 1:
+        print_indented("--parallel must be >= 1", style="red bold")
+        return EXIT_USAGE
+    if args.task == "compliance" and not args.baseline:
+        print_indented("fleet compliance needs --baseline", style="red bold")
+        return EXIT_USAGE
+
+    task_args = [args.task]
+    if args.task == "compliance":
+        task_args += ["--baseline", args.baseline]
+        if args.policy:
+            task_args += ["--policy", args.policy]
+        if args.columnar:
+            task_args += ["--columnar", args.columnar]
+
+    try:
+        results = tenant_runner.run_fleet(
+            args.task,
+            task_args,
+            manifest=args.manifest or tenant_runner.TENANT_MANIFEST,
+            fleet_dir=args.out or tenant_runner.FLEET_DIR,
+            parallel=args.parallel,
+        )
+    except tenant_runner.ManifestError as exc:
+        print_indented(str(exc), style="red bold")
+        return EXIT_USAGE
+    return EXIT_OK if all(result.exit_code == 0 for result in results) else EXIT_FAILED
+
+
+HEADLESS_COMMANDS = {
+    "export-rooms": ("export_rooms", _run_export_rooms),
+    "import-rooms": ("update_rooms", _run_import_rooms),
+    "create-rooms": ("create_rooms", _run_create_rooms),
+    "compliance": ("check_compliance", _run_compliance),
+    "compliance-diff": ("compliance_diff", _run_compliance_diff),
+    "compliance-watch": ("compliance_watch", _run_compliance_watch),
+    "compliance-trend": ("compliance_trend", _run_compliance_trend),
+    "fleet": ("fleet", _run_fleet),
+}
+# no API calls from this process » skip the token fetch (fleet runs one process per tenant)
+LOCAL_COMMANDS = {"compliance-diff", "compliance-trend", "fleet"}
+
+
 # -- PUBLIC FUNCTIONS
 
 
-def bootup():
+def bootup(*, animate: bool = True):
     global INITIAL_LOOP
     global IDENTITY
 
@@ -97,19 +527,11 @@ def bootup():
         ]
     )
 
-    try:
-        IDENTITY = get_client_details(CLIENT_ID)
-    except Exception as exc:
-        IDENTITY = {
-            "name": "Unknown credential",
-            "role": "Unknown role",
-            "error": str(exc),
-        }
+    # identity + tenant lookups run on daemon threads while the UI renders
+    _start_identity_lookup()
 
-    try:
-        IDENTITY["tenant_name"] = fetch_tenant_name() or "Unknown tenant"
-    except Exception:
-        IDENTITY["tenant_name"] = "Unknown tenant"
+    if not animate:
+        return
 
     with Live(console=console, refresh_per_second=4, screen=True) as live:
         for i, step in enumerate(steps, 1):
@@ -122,6 +544,7 @@ def bootup():
             live.update(panel)
             time.sleep(0.4)
 
+    _refresh_identity(wait_s=IDENTITY_WAIT_S)
     console.clear()
     console.print(panels.render_screen(selected=None, identity=IDENTITY))
     time.sleep(0.7)
@@ -168,10 +591,42 @@ def prompt_create_rooms() -> dict:
     }
 
 
-def main():
-    bootup()
-    tenant_name = IDENTITY.get("tenant_name", "") if IDENTITY else ""
+def run_headless(args: argparse.Namespace) -> int:
+    """run one task without the menu, animations or prompts. returns an exit code"""
+    task_name, runner = HEADLESS_COMMANDS[args.command]
+    if args.command not in LOCAL_COMMANDS:
+        from utils.auth import warm_up
+
+        warm_up()  # token + connection while the task module imports
+    _install_tracebacks()
+    gql_metrics.reset(task_name)
+    try:
+        return runner(args)
+    except KeyboardInterrupt:
+        print_indented("Interrupted", style="yellow")
+        return EXIT_INTERRUPTED
+    except Exception as exc:
+        print_indented(f"{task_name} failed: {exc}", style="red bold")
+        return EXIT_FAILED
+    finally:
+        # failed runs too » the calls made before the error are what needs looking at
+        gql_metrics.print_summary()
+
+
+def main(argv: list[str] | None = None):
+    args = _parse_args(argv)
+    if args.command:
+        return run_headless(args)
+
+    animate = not (
+        args.no_anim
+        or os.getenv("LENSCTL_NO_ANIM", "").strip().lower() in ("1", "true", "yes")
+        or not console.is_terminal
+    )
+    bootup(animate=animate)
     while True:
+        _refresh_identity()
+        tenant_name = IDENTITY.get("tenant_name", "") if IDENTITY else ""
         console.clear()
         console.print(
             panels.render_screen(selected=None, identity=IDENTITY, flash=FLASH)
@@ -182,19 +637,32 @@ def main():
         if choice == panels.SECRET_CODE:
             toggle_dark_mode()
             continue
+        if choice in ("1", "2", "3", "4"):
+            _install_tracebacks()
         if choice == "1":
+            from utils.room_ops import export_rooms
+
+            gql_metrics.reset("export_rooms")
             console.print(
                 f"[ok]Exporting Rooms...[/ok] {tenant_name} » room_data.csv \n"
             )
             time.sleep(0.8)
             export_rooms()
         elif choice == "2":
+            from utils.room_ops import update_rooms
+
+            gql_metrics.reset("update_rooms")
             console.print(
                 f"[ok]Updating Room Records...[/ok] room_data.csv » {tenant_name} \n"
             )
 
             update_rooms()
         elif choice == "3":
+            import requests
+            from utils.bulk_create import create_rooms
+            from utils.site_ops import create_site_if_not_exists
+
+            gql_metrics.reset("create_rooms")
             params = prompt_create_rooms()
             if not params:
                 time.sleep(0.5)
@@ -217,10 +685,13 @@ def main():
                     time.sleep(0.8)
                     continue
             console.print("[ok]Creating rooms in bulk...[/ok] \n")
-            create_rooms(**params, siteId=site_id)
+            create_rooms(**params, siteId=site_id, interactive_pause=True)
             time.sleep(0.8)
         elif choice == "4":
-            check_compliance()
+            from utils.compliance_ops import check_compliance
+
+            gql_metrics.reset("check_compliance")
+            check_compliance(profile=args.profile, pstats_path=args.profile_out)
         elif choice == "0":
             print_goodbye()
             sys.exit(0)
@@ -229,4 +700,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
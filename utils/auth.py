@@ -1,11 +1,17 @@
-import requests
+import time
+import threading
 import os
-from rich.traceback import install
-from requests.adapters import HTTPAdapter
+from concurrent.futures import Future
 from utils.env_helper import get_required_env, logger
-from typing import Optional, Dict, Any
+import utils.gql_metrics as gql_metrics
+import utils.fast_json as fast_json
+from typing import Optional, Dict, Any, Callable, Hashable, TYPE_CHECKING
 
-install()  # colorize uncaught exceptions and tracebacks
+if TYPE_CHECKING:
+    import requests
+
+# requests (~90ms with its CA bundle preload) is imported on the first HTTP call,
+# so cli startup and env validation don't pay for it
 
 # -- config constants
 
@@ -49,20 +55,33 @@ query TenantName($tenantId: ID!) {
 
 _token_cache: Optional[str] = None
 _headers: Dict[str, str] = {"content-type": "application/json"}
-_session: Optional[requests.Session] = None
+_session: Optional["requests.Session"] = None
+_token_lock = threading.Lock()
+_session_lock = threading.Lock()
+WARM_UP_TIMEOUT_S = 5
 
 
-def _get_session() -> requests.Session:
+def _get_session() -> "requests.Session":
     global _session
-    if _session is None:
-        _session = requests.Session()
-        # pool_maxsize should be >= max_wakers in ThreadPoolExecutor
-        adapter = HTTPAdapter(
-            pool_connections=50,  # cache for 50 different hosts
-            pool_maxsize=50,  # allow up to 50 concurrent connections per host
-        )
-        _session.mount("https://", adapter)
-        _session.mount("http://", adapter)
+    if _session is not None:
+        return _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.request import ACCEPT_ENCODING
+
+            _session = requests.Session()
+            # ask for every encoding urllib3 can undo here » gzip/deflate always,
+            # br/zstd when brotli/zstandard are installed
+            _session.headers["accept-encoding"] = ACCEPT_ENCODING
+            # pool_maxsize should be >= max_wakers in ThreadPoolExecutor
+            adapter = HTTPAdapter(
+                pool_connections=50,  # cache for 50 different hosts
+                pool_maxsize=50,  # allow up to 50 concurrent connections per host
+            )
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
     return _session
 
 
@@ -70,6 +89,15 @@ def _token_request() -> str:
     global _token_cache
     if _token_cache:
         return _token_cache
+    with _token_lock:
+        # another thread may have fetched it while this one waited
+        if _token_cache:
+            return _token_cache
+        return _fetch_token()
+
+
+def _fetch_token() -> str:
+    global _token_cache
 
     auth_payload = {
         "client_id": CLIENT_ID,
@@ -79,7 +107,7 @@ def _token_request() -> str:
     auth_response = _get_session().post(TOKEN_URL, headers=_headers, json=auth_payload)
     try:
         auth_response.raise_for_status()
-    except requests.HTTPError as exception:
+    except Exception as exception:  # requests.HTTPError
         logger.error(
             f"The Auth token request failed: {exception}\n {auth_response.text}"
         )
@@ -93,30 +121,139 @@ def _token_request() -> str:
     return token
 
 
+def _wire_bytes(response: "requests.Response") -> int | None:
+    # bytes urllib3 pulled off the socket » the compressed size when content-encoding applied
+    try:
+        return response.raw.tell()
+    except Exception:
+        return None
+
+
+def _warm_connection() -> None:
+    # TCP + TLS handshake to LENS_EP while the token is fetched » the socket goes
+    # back to the pool, so the first GraphQL call skips the handshake
+    try:
+        _get_session().head(GRAPHQL_URL, timeout=WARM_UP_TIMEOUT_S)
+    except Exception:
+        pass  # best effort » the real call will open its own connection
+
+
+def _warm_token() -> None:
+    try:
+        _token_request()
+    except Exception:
+        pass  # already logged » callers retry and surface the error themselves
+
+
+# -- SESSION CACHE » identity lookups hit the API once per process; failures aren't kept
+
+_session_lookups: Dict[Hashable, Future] = {}
+_session_lookups_lock = threading.Lock()
+
+
+def _once_per_session(key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    with _session_lookups_lock:
+        future = _session_lookups.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _session_lookups[key] = future
+
+    # concurrent + later callers share the leader's result (or re-raise its exception)
+    if not leader:
+        return future.result()
+
+    try:
+        result = fn(*args, **kwargs)
+    except BaseException as exc:
+        with _session_lookups_lock:
+            _session_lookups.pop(key, None)  # next caller gets a fresh attempt
+        future.set_exception(exc)
+        raise
+    future.set_result(result)
+    return result
+
+
 # -- PUBLIC FUNCTIONS
 
 
+def warm_up() -> None:
+    """start the token fetch and a connection to LENS_EP on daemon threads. returns at once"""
+    for target in (_warm_token, _warm_connection):
+        threading.Thread(target=target, daemon=True).start()
+
+
 def get_headers() -> Dict[str, Any]:
     token = _token_request()
     return {**_headers, "authorization": f"Bearer {token}"}
 
 
+def post_gql(
+    payload: Dict[str, Any], *, timeout: float | None = None
+) -> tuple["requests.Response", Optional[Dict[str, Any]]]:
+    """
+    pooled + instrumented POST to the GraphQL endpoint.
+    returns (response, parsed body) » body is None unless the status is 2xx.
+    status handling is left to the caller
+    """
+    operation = gql_metrics.operation_name(payload.get("query", ""))
+    body = fast_json.dumps(payload)
+    headers = get_headers()
+    start = time.perf_counter()
+    try:
+        response = _get_session().post(
+            GRAPHQL_URL, headers=headers, data=body, timeout=timeout
+        )
+    except Exception as exception:  # requests.RequestException and friends
+        gql_metrics.record(
+            operation,
+            latency_s=time.perf_counter() - start,
+            status=None,
+            request_bytes=len(body),
+            response_bytes=0,
+            error=type(exception).__name__,
+        )
+        raise
+    latency = time.perf_counter() - start
+
+    data = None
+    if response.ok:
+        try:
+            data = fast_json.loads(response.content)
+        except ValueError:
+            pass
+    gql_metrics.record(
+        operation,
+        latency_s=latency,
+        status=response.status_code,
+        request_bytes=len(body),
+        response_bytes=len(response.content),
+        wire_bytes=_wire_bytes(response),
+        query_cost=gql_metrics.extract_query_cost(data),
+    )
+    return response, data
+
+
 def execute_gql(
     query: str, variables: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     payload: Dict[str, Any] = {"query": query}
     if variables is not None:
         payload["variables"] = variables
-    response = _get_session().post(GRAPHQL_URL, headers=get_headers(), json=payload)
+    response, data = post_gql(payload)
     try:
         response.raise_for_status()
-    except requests.HTTPError as exception:
+    except Exception as exception:  # requests.HTTPError
         logger.error(f"GraphQL request failed...whomp: {exception}{response.text}")
         raise
-    return response.json()
+    return data if data is not None else response.json()
 
 
 def fetch_tenant_name() -> str | None:
+    return _once_per_session(("tenant-name", TENANT_ID), _query_tenant_name)
+
+
+def _query_tenant_name() -> str | None:
     data = execute_gql(GET_TENANT_NAME, {"tenantId": TENANT_ID})
     if data.get("errors"):
         raise RuntimeError(str(data["errors"]))
@@ -127,15 +264,19 @@ def get_client_details(client_id: str, *, timeout: int = 10) -> Dict[str, Any]:
     cid = client_id or CLIENT_ID
     if not cid:
         raise RuntimeError("CLIENT_ID is not set in .env file")
+    # copy » callers decorate the identity dict (tenant_name) in place
+    return dict(
+        _once_per_session(("client-details", cid), _query_client_details, cid, timeout)
+    )
+
+
+def _query_client_details(cid: str, timeout: int) -> Dict[str, Any]:
     payload = {
         "query": GET_CLIENT_DETAILS,
         "variables": {"clientCredentialId": cid},
     }
-    response = _get_session().post(
-        GRAPHQL_URL, headers=get_headers(), json=payload, timeout=timeout
-    )
+    response, data = post_gql(payload, timeout=timeout)
     response.raise_for_status()
-    data = response.json()
     if data.get("errors"):
         raise RuntimeError(str(data["errors"]))
     creds = data["data"]["clientCredential"]
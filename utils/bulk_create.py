@@ -2,13 +2,15 @@ import json
 import time
 import requests
 from rich.text import Text
-from typing import Optional
-from pygments import highlight
-from pygments.formatters import TerminalFormatter
-from pygments.lexers import JsonLexer
+from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-from utils.env_helper import logger, console_log, console
+from utils.env_helper import logger, console_log, highlight_json
 import utils.auth as auth
+import utils.gql_metrics as gql_metrics
+from utils.journal import OperationJournal, make_operation_id
+from utils.input_helpers import menu_return
+from utils.room_ops import fetch_room_id_by_name
 
 # -- GLOBALS
 DEFAULT_ROOM = {
@@ -36,6 +38,21 @@ mutation updateRoomData($fields: UpsertRoomRequest!) {
 }
 """
 
+# mutations can't select calculateQueryCost, so pacing probes it with a tiny query
+CHECK_QUERY_COST = """
+query checkQueryCost {
+  calculateQueryCost {
+    queryCost
+    costUsed
+    costRemaining
+    secondsToReset
+  }
+}
+"""
+
+RETRYABLE_STATUS = (429, 502, 503, 504)
+MAX_RETRIES = 5
+
 
 # -- PRIVATE HELPERS » NO TOUCHY!
 def _make_room_name(base: str | None, n: int, sep: str = " ") -> str:
@@ -43,61 +60,239 @@ def _make_room_name(base: str | None, n: int, sep: str = " ") -> str:
     return f"{base}{sep}{n}" if base else str(n)
 
 
+def _create_room(fields: Dict[str, Any]) -> Dict[str, Any]:
+    # runs on a worker thread » retries throttled/unavailable responses with backoff
+    retry_count = 0
+    while True:
+        try:
+            return auth.execute_gql(BULK_CREATE_ROOMS, {"fields": fields})
+        except requests.HTTPError as err:
+            retryable = (
+                err.response is not None
+                and err.response.status_code in RETRYABLE_STATUS
+            )
+            if not retryable or retry_count >= MAX_RETRIES:
+                raise
+            retry_count += 1
+            gql_metrics.record_retry("updateRoomData")
+            backoff = min(2 * (2 ** (retry_count - 1)), 60)
+            console_log(
+                f"[yellow]HTTP {err.response.status_code} creating '{fields.get('name')}' "
+                f"(attempt {retry_count}/{MAX_RETRIES}), retrying in {backoff}s...[/yellow]"
+            )
+            time.sleep(backoff)
+
+
+def _fetch_query_cost() -> Dict[str, Any]:
+    try:
+        data = auth.execute_gql(CHECK_QUERY_COST)
+    except requests.RequestException as err:
+        logger.warning(f"Query cost probe failed, pacing skipped: {err}")
+        return {}
+    return (data.get("data") or {}).get("calculateQueryCost") or {}
+
+
+def _pace_from_cost(
+    cost_info: Dict[str, Any], cost_per_room: float, in_flight: int
+) -> float:
+    """sleep until reset if the remaining budget can't cover the next wave of rooms. returns seconds slept"""
+    cost_remaining = cost_info.get("costRemaining")
+    if cost_remaining is None or cost_per_room <= 0:
+        return 0.0
+
+    # 2.0x buffer, same as the policy batch fetcher
+    needed = cost_per_room * max(in_flight, 1) * 2.0
+    if cost_remaining >= needed:
+        return 0.0
+
+    wait_time = (cost_info.get("secondsToReset") or 60) + 2
+    console_log(
+        f"[yellow]Rate limit approaching:[/yellow] "
+        f"{cost_remaining:,} points left, ~{cost_per_room:,.1f} per room. "
+        f"Waiting {wait_time}s for reset..."
+    )
+    time.sleep(wait_time)
+    return float(wait_time)
+
+
 # -- PUBLIC FUNCTIONS
 def create_rooms(
     count: int,
     base_name: str = "None",
     start: int = 0,
-    delay: float = 0.5,
     siteId: Optional[str] = None,
     *,
+    max_workers: int = 4,
+    cost_check_every: int = 50,
+    progress_interval_s: float = 2.0,
     interactive_pause: bool = False,
-):
+) -> tuple[int, int]:
     total_rooms_created = 0
     total_errors = 0
+    total_skipped = 0
     all_errors = []
-    counter = start
 
-    for _ in range(count):
+    # same inputs » same journal, so an interrupted run picks up where it stopped
+    journal = OperationJournal(
+        make_operation_id("create-rooms", base_name, start, count, siteId)
+    )
+    if journal.resumed:
+        console_log(
+            f"[yellow]Resuming bulk create from journal[/yellow] [dim]{journal.path}[/dim]"
+        )
+
+    # build every room up front so workers only do network I/O
+    pending_rooms = []
+    for counter in range(start, start + count):
         fields = DEFAULT_ROOM.copy()
         fields["name"] = _make_room_name(base_name, counter)
         if siteId is not None:
             fields["siteId"] = siteId
-        counter += 1
-        time.sleep(delay)
 
-        # build the payload structure
-        payload = {"query": BULK_CREATE_ROOMS, "variables": {"fields": fields}}
+        if journal.is_done(fields["name"]):
+            total_skipped += 1
+            continue
+        if journal.is_in_doubt(fields["name"]):
+            # request went out but the outcome was never recorded » one lookup decides
+            try:
+                existing_id = fetch_room_id_by_name(fields["name"])
+            except (requests.RequestException, RuntimeError) as err:
+                logger.warning(
+                    f"Couldn't reconcile '{fields['name']}' from journal: {err}"
+                )
+                existing_id = None
+            if existing_id:
+                journal.complete(fields["name"], existing_id)
+                total_skipped += 1
+                continue
+        pending_rooms.append(fields)
+    pending_rooms.reverse()  # pop() from the end keeps creation order
+
+    if total_skipped:
+        console_log(
+            f"[dim]Skipping {total_skipped} room(s) already created in a previous run[/dim]"
+        )
+    count = len(pending_rooms)
+
+    console_log(
+        f"[bold]Creating [blue]{count:,}[/blue] rooms with [blue]{max_workers}[/blue] workers[/bold]"
+    )
+
+    start_time = time.monotonic()
+    last_progress = start_time
+    time_sleeping = 0.0
+
+    # cost pacing state » per-room cost is learned from costUsed deltas between probes
+    cost_info = _fetch_query_cost()
+    last_cost_used = cost_info.get("costUsed")
+    created_at_last_probe = 0
+    cost_per_room = 0.0
+    since_last_probe = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        active_futures = {}
+
+        def _submit_next():
+            fields = pending_rooms.pop()
+            journal.begin(fields["name"], fields)
+            active_futures[executor.submit(_create_room, fields)] = fields
+
+        for _ in range(min(max_workers, len(pending_rooms))):
+            _submit_next()
 
         try:
-            response = requests.post(
-                auth.GRAPHQL_URL, json=payload, headers=auth.get_headers()
-            )
-            response.raise_for_status()
-            data = response.json()
+            while active_futures:
+                done_futures, _ = wait(active_futures, return_when=FIRST_COMPLETED)
 
-            highlighted = highlight(
-                json.dumps(data, indent=2), JsonLexer(), TerminalFormatter()
-            )
+                for future in done_futures:
+                    fields = active_futures.pop(future)
+                    since_last_probe += 1
+
+                    try:
+                        data = future.result()
+                        highlighted = highlight_json(data)
+
+                        if "errors" in data:
+                            # log GQL errors
+                            gql_error = f"GraphQL error creating: \n{highlighted}"
+                            logger.error(gql_error)
+                            all_errors.append(gql_error)
+                            journal.fail(fields["name"], json.dumps(data["errors"]))
+                            total_errors += 1
+                        else:
+                            # log successful GQL response
+                            logger.info(f"Room created: \n{highlighted}")
+                            room = (data.get("data") or {}).get("upsertRoom") or {}
+                            journal.complete(fields["name"], room.get("id"))
+                            total_rooms_created += 1
+
+                    # log network or HTTP errors
+                    except requests.RequestException as err:
+                        http_err = f"Request error for '{fields.get('name')}': {err}"
+                        logger.error(http_err)
+                        all_errors.append(http_err)
+                        journal.fail(fields["name"], str(err))
+                        total_errors += 1
+
+                # throughput + ETA
+                now = time.monotonic()
+                processed = total_rooms_created + total_errors
+                if (now - last_progress) >= progress_interval_s or processed == count:
+                    elapsed = max(now - start_time, 0.001)
+                    rate = processed / elapsed
+                    remaining_secs = (count - processed) / rate if rate > 0 else 0
+                    console_log(
+                        f"Progress: [blue]{processed:,}/{count:,} ({processed/count*100:.1f}%)[/blue] | "
+                        f"[green]✓[/green] {total_rooms_created:,} | [red]✗[/red] {total_errors} | "
+                        f"Rate: [magenta]{rate:.1f}/sec[/magenta] | "
+                        f"ETA: [bold]{remaining_secs/60:.1f} min[/bold]"
+                    )
+                    last_progress = now
+
+                # re-probe query cost every N rooms and back off before the budget runs dry
+                if pending_rooms and since_last_probe >= cost_check_every:
+                    since_last_probe = 0
+                    cost_info = _fetch_query_cost()
+                    cost_used = cost_info.get("costUsed")
+                    created_since = total_rooms_created - created_at_last_probe
+                    if (
+                        cost_used is not None
+                        and last_cost_used is not None
+                        and cost_used >= last_cost_used
+                        and created_since > 0
+                    ):
+                        cost_per_room = (cost_used - last_cost_used) / created_since
+                    last_cost_used = cost_used
+                    created_at_last_probe = total_rooms_created
+
+                    slept = _pace_from_cost(cost_info, cost_per_room, max_workers)
+                    if slept:
+                        time_sleeping += slept
+                        # budget reset while we slept » start the delta over
+                        cost_info = _fetch_query_cost()
+                        last_cost_used = cost_info.get("costUsed")
+
+                while pending_rooms and len(active_futures) < max_workers:
+                    _submit_next()
+
+        except KeyboardInterrupt:
+            console_log("[yellow]Interrupted - cancelling remaining rooms...[/yellow]")
+            for future in active_futures:
+                future.cancel()
+            journal.close(remove_if_clean=False)
+            raise
+
+    if journal.close():
+        console_log(
+            f"[yellow]Journal kept for retry:[/yellow] [dim]{journal.path}[/dim] "
+            "Run the same bulk create again to resume."
+        )
 
-            if "errors" in data:
-                # log GQL errors
-                gql_error = f"GraphQL error creating: \n{highlighted}"
-                logger.error(gql_error)
-                all_errors.append(gql_error)
-                total_errors += 1
-            else:
-                # log successful GQL response
-                logger.info(f"Room created: \n{highlighted}")
-                total_rooms_created += 1
-
-        # log network or HTTP errors
-        except requests.RequestException as err:
-            http_err = f"Request error for {err}"
-            logger.error(http_err)
-            all_errors.append(http_err)
-
-            total_errors += 1
+    elapsed = max(time.monotonic() - start_time, 0.001)
+    console_log(
+        f"[dim]Finished in {elapsed:.1f}s | {(total_rooms_created + total_errors) / elapsed:.1f} rooms/sec | "
+        f"rate limit waits: {time_sleeping:.0f}s[/dim]"
+    )
 
     if not total_errors:
         console_log(
@@ -122,4 +317,6 @@ def create_rooms(
         )
         console_log(message)
 
-    console.input("[dim]Press Enter to return to main menu [/dim]")
+    if interactive_pause:
+        menu_return()
+    return total_rooms_created, total_errors
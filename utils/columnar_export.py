@@ -0,0 +1,173 @@
+"""Parquet / Arrow IPC export of the per-device compliance results.
+pyarrow is optional » without it the export is skipped."""
+
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from utils.env_helper import console_log
+from utils.compliance_analysis import evaluate_device_compliance
+
+# -- GLOBALS
+
+FORMATS = ("parquet", "arrow")
+FORMAT_ENV = "LENSCTL_COLUMNAR_EXPORT"
+BATCH_ROWS = 10_000
+DEFAULT_FILENAMES = {
+    "parquet": "desktop-app-compliance-full.parquet",
+    "arrow": "desktop-app-compliance-full.arrow",
+}
+
+# evaluate_device_compliance key → column, in file order
+STRING_COLUMNS = (
+    "device_id",
+    "device_name",
+    "device_user",
+    "platform",
+    "software_version",
+    "controlling_type",
+    "controlling_id",
+    "controlling_name",
+    "expected_version",
+    "baseline_version",
+)
+BOOL_COLUMNS = (
+    "use_latest",
+    "compliant_with_controlling",
+    "compliant_with_baseline",
+    "policy_override",
+)
+
+
+# -- PRIVATE HELPERS » NO TOUCHY!
+
+
+def _schema(pa):
+    layer = pa.struct(
+        [
+            ("type", pa.string()),
+            ("id", pa.string()),
+            ("name", pa.string()),
+            ("priority", pa.float64()),
+            ("has_settings", pa.bool_()),
+            ("is_controlling", pa.bool_()),
+        ]
+    )
+    return pa.schema(
+        [("run_ts", pa.timestamp("us", tz="UTC")), ("baseline_layer", pa.string())]
+        + [(name, pa.string()) for name in STRING_COLUMNS]
+        + [(name, pa.bool_()) for name in BOOL_COLUMNS]
+        + [("policy_stack", pa.list_(layer))]
+    )
+
+
+def _policy_stack(
+    all_layers: List[Dict[str, Any]], controlling_id: str | None
+) -> List[Dict[str, Any]]:
+    # highest → lowest priority, same order as the CSV column
+    return [
+        {
+            "type": layer.get("type"),
+            "id": layer.get("id"),
+            "name": layer.get("name"),
+            "priority": layer.get("priority"),
+            "has_settings": bool(layer.get("has_settings")),
+            "is_controlling": layer.get("id") == controlling_id,
+        }
+        for layer in all_layers
+    ]
+
+
+def _open_writer(pa, fmt: str, filename: str, schema):
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(filename, schema, compression="zstd")
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    return pa.ipc.new_file(filename, schema, options=options)
+
+
+def _empty_columns(schema) -> Dict[str, list]:
+    return {name: [] for name in schema.names}
+
+
+# -- PUBLIC FUNCTIONS
+
+
+def available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def format_from_env() -> str | None:
+    fmt = os.getenv(FORMAT_ENV, "").strip().lower()
+    return fmt if fmt in FORMATS else None
+
+
+def export_compliance_columnar(
+    devices: List[Dict[str, Any]],
+    latest_versions: Dict[str, str | None],
+    compliance_baseline: Dict[str, Any],
+    fmt: str = "parquet",
+    filename: str | None = None,
+    run_ts: datetime | None = None,
+) -> bool:
+    """write one typed row per device in record batches. False when pyarrow is missing"""
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown columnar format: {fmt} (use {' or '.join(FORMATS)})")
+    if not available():
+        console_log(
+            f"[yellow]Skipping {fmt} export » pyarrow isn't installed (pip install pyarrow)[/yellow]"
+        )
+        return False
+
+    import pyarrow as pa
+
+    filename = filename or DEFAULT_FILENAMES[fmt]
+    run_ts = run_ts or datetime.now(timezone.utc)
+    baseline_layer = compliance_baseline.get("layer")
+    console_log(f"[cyan]Exporting per-device results to {fmt}: {filename}[/cyan]")
+
+    schema = _schema(pa).with_metadata(
+        {
+            "baseline": str(compliance_baseline.get("display", "Unknown")),
+            "run_ts": run_ts.isoformat(),
+        }
+    )
+    columns = _empty_columns(schema)
+    row_count = 0
+    batch_count = 0
+
+    writer = _open_writer(pa, fmt, filename, schema)
+    try:
+        for device in devices:
+            result = evaluate_device_compliance(
+                device, latest_versions, compliance_baseline
+            )
+            columns["run_ts"].append(run_ts)
+            columns["baseline_layer"].append(baseline_layer)
+            for name in STRING_COLUMNS + BOOL_COLUMNS:
+                columns[name].append(result[name])
+            columns["policy_stack"].append(
+                _policy_stack(result["all_layers"], result["controlling_id"])
+            )
+            row_count += 1
+
+            if len(columns["run_ts"]) >= BATCH_ROWS:
+                writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+                columns = _empty_columns(schema)
+                batch_count += 1
+
+        if columns["run_ts"] or batch_count == 0:
+            writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+            batch_count += 1
+    finally:
+        writer.close()
+
+    console_log(
+        f"[bold]Exported [blue]{row_count:,}[/blue] devices in {batch_count:,} batches to [green]{filename}[/green][/bold]"
+    )
+    return True
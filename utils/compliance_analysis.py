@@ -1,10 +1,38 @@
-from typing import List, Dict, Any
+import gc
+import pickle
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import List, Dict, Any, NamedTuple, Tuple
 
 PLATFORM_CATALOG_MAP = {
     "Desktop App MacOS": "lens-desktop-mac",
     "Desktop App Windows x64": "lens-desktop-windows",
     "Desktop App Windows ARM": "lens-desktop-windows-arm",
 }
+FACTS_KEY = "compliance_facts"  # device dict key the cached DeviceFacts live under
+SHARD_MIN_DEVICES = 10_000  # smaller shards cost more to ship than to analyze
+
+
+class DeviceFacts(NamedTuple):
+    # what these were derived from » a new attribution or latest_versions dict recomputes
+    attribution: Dict[str, Any] | None
+    latest_versions: Dict[str, str | None]
+    platform: str
+    software_version: str
+    catalog_id: str | None
+    controlling: Dict[str, Any]
+    controlling_type: str
+    use_latest: bool
+    expected_version: str  # "" when use_latest and the latest version is unknown
+    layers: List[Dict[str, Any]]  # all_layers, highest priority first
+    # devices with equal keys are interchangeable for every baseline. layers are
+    # keyed by identity » shared model/site/group layers (layer_cache) line up
+    key: tuple
+
+
+_NO_LAYER: Dict[str, Any] = {}  # read-only stand-in for a missing controlling layer
 
 # -- PRIVATE HELPERS » NO TOUCHY!
 
@@ -39,87 +67,263 @@ def _normalize_version(version: str | None) -> str:
     return ".".join(parts[:3]) if len(parts) >= 3 else version
 
 
-# -- DESKTOP APP SPECIFIC
+def _effective_from_sources(
+    sorted_sources: List[Dict[str, Any]], catalog_id: str | None
+) -> Dict[str, Any]:
+    # what the API reports as the applied policy (trimmed fragment doesn't fetch it):
+    # first source by priority configured for this platform. variations for other
+    # platforms only fall through to lower layers
+    for source in sorted_sources:
+        source_caps = source.get("capabilities") or {}
+        source_sw = (
+            source_caps.get("com", {}).get("poly", {}).get("software_update", {})
+        )
+        variations = source_sw.get("policy_variations") or []
+        if variations:
+            for variation in variations:
+                if (variation.get("property_value") or {}).get("value") == catalog_id:
+                    return {
+                        "version": (variation.get("version") or {}).get("value"),
+                        "use_latest": (variation.get("use_latest") or {}).get("value"),
+                    }
+            continue
+        policy = source_sw.get("policy") or {}
+        version = (policy.get("version") or {}).get("value")
+        use_latest = (policy.get("use_latest") or {}).get("value")
+        if version is not None or use_latest is not None:
+            return {"version": version, "use_latest": use_latest}
+    return {"version": None, "use_latest": None}
+
+
+def _parse_source_layer(source: Dict[str, Any]) -> Dict[str, Any]:
+    source_type = source.get("type")
+    source_priority = float(source.get("priority", 999))
+    source_name = source.get("name", "Unknown")
+    source_id = source.get("id")
+
+    # check if this source has configured settings
+    source_caps = source.get("capabilities") or {}
+    source_sw = source_caps.get("com", {}).get("poly", {}).get("software_update", {})
+    source_policy = source_sw.get("policy")
+    policy_variations = source_sw.get("policy_variations") or {}
+
+    policy_has_values = False
+    if source_policy:
+        version = source_policy.get("version", {})
+        use_latest = source_policy.get("use_latest", {})
+        policy_has_values = (version and version.get("value") is not None) or (
+            use_latest and use_latest.get("value") is not None
+        )
+
+    # has settings if either policy has values or policy_variations exists
+    has_settings = policy_has_values or len(policy_variations) > 0
 
+    layer_info = {
+        "type": source_type,
+        "priority": source_priority,
+        "name": source_name,
+        "id": source_id,
+        "has_settings": has_settings,
+        "settings": None,
+    }
 
-def parse_policy_attribution(policy_stack: Dict[str, Any]) -> Dict[str, Any]:
-    # get effective policy from capabilities
-    capabilities = policy_stack.get("capabilities") or {}
-    sw_update = capabilities.get("com", {}).get("poly", {}).get("software_update", {})
-    policy = sw_update.get("policy") or {}
+    # if settings, extract em
+    if has_settings:
+        if len(policy_variations) > 0:
+            # store platform specific variations
+            layer_info["settings"] = {
+                "has_variations": True,
+                "variations": policy_variations,
+                "version": None,
+                "use_latest": None,
+            }
+        elif source_policy:
+            # simple policy (device)
+            version_obj = source_policy.get("version") or {}
+            use_latest_obj = source_policy.get("use_latest") or {}
+            layer_info["settings"] = {
+                "has_variations": False,
+                "variations": None,
+                "version": version_obj.get("value"),
+                "use_latest": use_latest_obj.get("value"),
+            }
+    return layer_info
 
-    version_obj = policy.get("version") or {}
-    effective_version = version_obj.get("value")
 
-    use_latest_obj = policy.get("use_latest") or {}
-    effective_use_latest = use_latest_obj.get("value")
+def _expected_versions_by_platform(
+    layer: Dict[str, Any], latest_versions: Dict[str, str | None]
+) -> Dict[str, str] | None:
+    """what a policy layer expects per platform » {"Mac": "2.3.1", ...}. None when it has no settings"""
+    settings = layer.get("settings")
+    if not settings:
+        return None
 
-    effective = {"version": effective_version, "use_latest": effective_use_latest}
+    all_platform_versions = {}
 
+    # check if policy has platform-specific variations
+    if settings.get("has_variations"):
+        variations = settings.get("variations", [])
+
+        for variation in variations:
+            # Get catalog_id from property_value
+            catalog_id = variation.get("property_value", {}).get("value")
+
+            # Determine platform name from catalog_id
+            if catalog_id == "lens-desktop-mac":
+                platform_short = "Mac"
+            elif catalog_id == "lens-desktop-windows":
+                platform_short = "Windows x64"
+            elif catalog_id == "lens-desktop-windows-arm":
+                platform_short = "Windows ARM"
+            else:
+                continue
+
+            # check if use_latest or specific version
+            use_latest_obj = variation.get("use_latest")
+            if use_latest_obj and use_latest_obj.get("value"):
+                version = latest_versions.get(catalog_id, "Unknown")
+            else:
+                version_obj = variation.get("version")
+                version = (
+                    version_obj.get("value", "Unknown") if version_obj else "Unknown"
+                )
+
+            all_platform_versions[platform_short] = _normalize_version(version)
+    else:
+        # simple policy without variations - applies same version to all platforms
+        use_latest = settings.get("use_latest")
+        if use_latest:
+            # apply to both platforms
+            for catalog_id, platform_name in [
+                ("lens-desktop-mac", "Mac"),
+                ("lens-desktop-windows", "Windows x64"),
+                ("lens-desktop-windows-arm", "Windows ARM"),
+            ]:
+                version = latest_versions.get(catalog_id, "Unknown")
+                all_platform_versions[platform_name] = _normalize_version(version)
+        else:
+            version = settings.get("version", "Unknown")
+            # single version applies to all platforms
+            for platform_name in ["Mac", "Windows x64", "Windows ARM"]:
+                all_platform_versions[platform_name] = _normalize_version(version)
+
+    return all_platform_versions
+
+
+def _index_groups_by_policy(
+    groups: List[Dict[str, Any]],
+    grouping_layers: Dict[str, Dict[str, Any]],
+    latest_versions: Dict[str, str | None],
+) -> Dict[str, Dict[str, Any]]:
+    """
+    one pass over the groups » policy id → its groups + what it expects per platform.
+    report builders read a policy's section from here instead of rescanning every
+    group (and their devices) per policy, which went quadratic with device policies
+    """
+    policies: Dict[str, Dict[str, Any]] = {}
+    largest: Dict[tuple, int] = {}  # (policy id, platform) → count of its biggest group
+
+    for group in groups:
+        grouping_id = group["grouping_id"]
+        policy = policies.get(grouping_id)
+        if policy is None:
+            policy = policies[grouping_id] = {
+                "grouping_id": grouping_id,
+                "grouping_type": group["grouping_type"],
+                "grouping_name": group["grouping_name"],
+                "groups": [],
+                "controlling_types": set(),
+                # platform → controlling expected version » fallback w/o a policy layer
+                "controlling_expected": {},
+                # platform → baseline expected version of its biggest group
+                "baseline_expected": {},
+                "expected_versions": None,
+            }
+        policy["groups"].append(group)
+        policy["controlling_types"].add(group["controlling_type"])
+
+        platform_short = group["platform"].replace("Desktop App ", "")
+        expected = group["controlling_expected_version"]
+        if expected and expected != "N/A" and expected != "Unknown":
+            policy["controlling_expected"][platform_short] = expected
+
+        key = (grouping_id, platform_short)
+        if group["count"] > largest.get(key, 0):
+            largest[key] = group["count"]
+            policy["baseline_expected"][platform_short] = group[
+                "baseline_expected_version"
+            ]
+
+    for grouping_id, policy in policies.items():
+        layer = grouping_layers.get(grouping_id)
+        if layer is not None:
+            policy["expected_versions"] = _expected_versions_by_platform(
+                layer, latest_versions
+            )
+        else:
+            # no device carries this policy layer (failed fetches) » use group-level data
+            policy["expected_versions"] = policy["controlling_expected"]
+    return policies
+
+
+# -- DESKTOP APP SPECIFIC
+
+
+def parse_policy_attribution(
+    policy_stack: Dict[str, Any],
+    hardware_product: str | None = None,
+    layer_cache: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    """
+    layer_cache » pass the same dict for every device of a crawl. model/site/group
+    sources repeat across thousands of devices; an identical source (deep ==) reuses
+    the already-parsed layer, so the raw response can be freed and far fewer
+    objects stay alive. results are unchanged; layers are shared, don't mutate them
+    """
     # parse sources to find contolling policy layer
     sources = policy_stack.get("sources", [])
 
     # sort by priority - lower number = higher priority
     sorted_sources = sorted(sources, key=lambda s: float(s.get("priority", 999)))
 
+    # get effective policy from capabilities, or from sources when it wasn't fetched
+    if "capabilities" in policy_stack:
+        capabilities = policy_stack.get("capabilities") or {}
+        sw_update = (
+            capabilities.get("com", {}).get("poly", {}).get("software_update", {})
+        )
+        policy = sw_update.get("policy") or {}
+
+        version_obj = policy.get("version") or {}
+        effective_version = version_obj.get("value")
+
+        use_latest_obj = policy.get("use_latest") or {}
+        effective_use_latest = use_latest_obj.get("value")
+
+        effective = {"version": effective_version, "use_latest": effective_use_latest}
+    else:
+        effective = _effective_from_sources(
+            sorted_sources, _get_catalog_id(hardware_product)
+        )
+
     controlling_layer = None
     account_policy = None
     all_layers = []
 
     for source in sorted_sources:
-        source_type = source.get("type")
-        source_priority = float(source.get("priority", 999))
-        source_name = source.get("name", "Unknown")
-        source_id = source.get("id")
-
-        # check if this source has configured settings
-        source_caps = source.get("capabilities") or {}
-        source_sw = (
-            source_caps.get("com", {}).get("poly", {}).get("software_update", {})
-        )
-        source_policy = source_sw.get("policy")
-        policy_variations = source_sw.get("policy_variations") or {}
-
-        policy_has_values = False
-        if source_policy:
-            version = source_policy.get("version", {})
-            use_latest = source_policy.get("use_latest", {})
-            policy_has_values = (version and version.get("value") is not None) or (
-                use_latest and use_latest.get("value") is not None
-            )
-
-        # has settings if either policy has values or policy_variations exists
-        has_settings = policy_has_values or len(policy_variations) > 0
-
-        layer_info = {
-            "type": source_type,
-            "priority": source_priority,
-            "name": source_name,
-            "id": source_id,
-            "has_settings": has_settings,
-            "settings": None,
-        }
-
-        # if settings, extract em
-        if has_settings:
-            if len(policy_variations) > 0:
-                # store platform specific variations
-                layer_info["settings"] = {
-                    "has_variations": True,
-                    "variations": policy_variations,
-                    "version": None,
-                    "use_latest": None,
-                }
-            elif source_policy:
-                # simple policy (device)
-                version_obj = source_policy.get("version") or {}
-                use_latest_obj = source_policy.get("use_latest") or {}
-                layer_info["settings"] = {
-                    "has_variations": False,
-                    "variations": None,
-                    "version": version_obj.get("value"),
-                    "use_latest": use_latest_obj.get("value"),
-                }
+        layer_info = None
+        cacheable = layer_cache is not None and source.get("type") != "device"
+        if cacheable:
+            # same policy already parsed for another device » share its layer
+            cached = layer_cache.get(source.get("id"))
+            if cached is not None and cached[0] == source:
+                layer_info = cached[1]
+        if layer_info is None:
+            layer_info = _parse_source_layer(source)
+            if cacheable:
+                layer_cache[source.get("id")] = (source, layer_info)
+        has_settings = layer_info["has_settings"]
+        source_type = layer_info["type"]
         all_layers.append(layer_info)
 
         # first source w/ settings is controlling (applied) policy
@@ -174,52 +378,84 @@ def extract_unique_policies(devices: List[Dict]) -> Dict[str, List[Dict]]:
     }
 
 
-def _get_baseline_version_for_device(
-    device: Dict[str, Any],
-    compliance_baseline: Dict[str, Any],
-    latest_versions: Dict[str, str | None],
-) -> str:
-
-    baseline_layer = compliance_baseline.get("layer")
-
-    if compliance_baseline.get("all_policies"):
-        attribution = device.get("policy_attribution") or {}
-        all_layers = attribution.get("all_layers", [])
-
-        matching_layer = None
-        for layer in all_layers:
-            if layer.get("type") == baseline_layer:
-                matching_layer = layer
-                break
-        if not matching_layer:
-            return "N/A"
+def _device_facts(
+    device: Dict[str, Any], latest_versions: Dict[str, str | None]
+) -> DeviceFacts:
+    """
+    everything about a device that doesn't depend on the baseline. cached on the
+    device dict (like policy_attribution) so switching baselines reuses it
+    """
+    attribution = device.get("policy_attribution")
+    facts = device.get(FACTS_KEY)
+    if (
+        facts is not None
+        and facts.attribution is attribution
+        and facts.latest_versions is latest_versions
+    ):
+        return facts
+
+    attribution_dict = attribution or _NO_LAYER
+    controlling = attribution_dict.get("controlling_layer") or _NO_LAYER
+    effective = attribution_dict.get("effective") or _NO_LAYER
+    layers = attribution_dict.get("all_layers") or []
+    platform = _normalize_platform(device.get("hardwareProduct", "Unknown"))
+    software_version = _normalize_version(device.get("softwareVersion") or "")
+    catalog_id = (
+        PLATFORM_CATALOG_MAP.get(platform) if device.get("hardwareProduct") else None
+    )
 
-        settings = matching_layer.get("settings", {})
+    use_latest = bool(effective.get("use_latest"))
+    if use_latest:
+        raw_version = latest_versions.get(catalog_id) if catalog_id else ""
+        expected_version = _normalize_version(raw_version) if raw_version else ""
+    else:
+        expected_version = _normalize_version(effective.get("version") or "")
+
+    facts = DeviceFacts(
+        attribution,
+        latest_versions,
+        platform,
+        software_version,
+        catalog_id,
+        controlling,
+        controlling.get("type", "unknown"),
+        use_latest,
+        expected_version,
+        layers,
+        (
+            platform,
+            software_version,
+            id(controlling),
+            use_latest,
+            expected_version,
+            *[id(layer) for layer in layers],
+        ),
+    )
+    device[FACTS_KEY] = facts
+    return facts
 
-    # specific policy layer
-    baseline_policy = compliance_baseline.get("policy", {})
-    baseline_policy_id = baseline_policy.get("id")
 
-    # find this policy in the device's stack
-    attribution = device.get("policy_attribution") or {}
-    all_layers = attribution.get("all_layers", [])
+def _find_layer(
+    layers: List[Dict[str, Any]], field: str, value: Any
+) -> Dict[str, Any] | None:
+    # first match in priority order » stacks are a handful of layers
+    for layer in layers:
+        if layer.get(field) == value:
+            return layer
+    return None
 
-    matching_layer = None
-    for layer in all_layers:
-        if layer.get("id") == baseline_policy_id:
-            matching_layer = layer
-            break
-    if not matching_layer:
-        # device doesn't have this policy applied
-        return "N/A"
 
-    # extract version from this layer's settings
-    settings = matching_layer.get("settings", {})
+def _layer_baseline_version(
+    layer: Dict[str, Any],
+    catalog_id: str | None,
+    latest_versions: Dict[str, str | None],
+) -> str:
+    """version a specific baseline policy layer expects on this platform, or N/A"""
+    settings = layer.get("settings") or {}
 
     # handle platform specific variations
     if settings.get("has_variations"):
         variations = settings.get("variations", [])
-        catalog_id = _get_catalog_id(device.get("hardwareProduct"))
 
         for var in variations:
             if (var.get("property_value") or {}).get("value") == catalog_id:
@@ -233,7 +469,6 @@ def _get_baseline_version_for_device(
 
     # device level policy
     if settings.get("use_latest"):
-        catalog_id = _get_catalog_id(device.get("hardwareProduct"))
         raw_version = latest_versions.get(catalog_id) if catalog_id else ""
         return _normalize_version(raw_version) if raw_version else "N/A"
     else:
@@ -241,128 +476,220 @@ def _get_baseline_version_for_device(
         return _normalize_version(version) if version else "N/A"
 
 
+def _layer_baseline_expected(
+    layer: Dict[str, Any],
+    catalog_id: str | None,
+    latest_versions: Dict[str, str | None],
+) -> str:
+    """version a device's own site/group layer expects (all-policies baselines)"""
+    baseline_settings = layer.get("settings") or {}
+
+    # Check if this policy has platform-specific variations
+    if baseline_settings.get("has_variations"):
+        # Find the variation matching this device's catalog_id
+        variations = baseline_settings.get("variations", [])
+        matching_variation = None
+
+        for variation in variations:
+            prop_value = variation.get("property_value", {}).get("value")
+            if prop_value == catalog_id:
+                matching_variation = variation
+                break
+
+        if not matching_variation:
+            return "Not Configured"
+        # Extract version from the matching variation
+        use_latest_obj = matching_variation.get("use_latest") or {}
+        if use_latest_obj.get("value"):
+            raw_version = latest_versions.get(catalog_id) if catalog_id else ""
+            return _normalize_version(raw_version) if raw_version else "Unknown"
+        version_obj = matching_variation.get("version") or {}
+        return _normalize_version(version_obj.get("value") or "")
+
+    # Simple policy (no variations)
+    if baseline_settings.get("use_latest"):
+        raw_version = latest_versions.get(catalog_id) if catalog_id else ""
+        return _normalize_version(raw_version) if raw_version else "Unknown"
+    return _normalize_version(baseline_settings.get("version") or "")
+
+
+def _get_baseline_version_for_device(
+    device: Dict[str, Any],
+    compliance_baseline: Dict[str, Any],
+    latest_versions: Dict[str, str | None],
+) -> str:
+    facts = _device_facts(device, latest_versions)
+
+    if compliance_baseline.get("all_policies"):
+        if not _find_layer(facts.layers, "type", compliance_baseline.get("layer")):
+            return "N/A"
+
+    # specific policy layer » find this policy in the device's stack
+    baseline_policy_id = compliance_baseline.get("policy", {}).get("id")
+    matching_layer = _find_layer(facts.layers, "id", baseline_policy_id)
+    if not matching_layer:
+        # device doesn't have this policy applied
+        return "N/A"
+    return _layer_baseline_version(matching_layer, facts.catalog_id, latest_versions)
+
+
 # -- ANALYSIS FUNCS
 
 
-def analyze_and_group_devices(
-    devices: List[Dict[str, Any]],
+def evaluate_device_compliance(
+    device: Dict[str, Any],
     latest_versions: Dict[str, str | None],
     compliance_baseline: Dict[str, Any],
 ) -> Dict[str, Any]:
+    """
+    one device vs its controlling policy and the baseline » typed values, no display
+    formatting. shared by the per-device exports (CSV, Parquet/Arrow)
+    """
+    facts = _device_facts(device, latest_versions)
+    software_version = facts.software_version
+    controlling = facts.controlling
+    controlling_type = facts.controlling_type
+    use_latest = facts.use_latest
+    expected_version = facts.expected_version
+
+    # calc baseline version for device
+    baseline_version = _normalize_version(
+        _get_baseline_version_for_device(device, compliance_baseline, latest_versions)
+    )
+
+    # Compliance requires BOTH version match AND correct policy source
+    is_compliant_with_baseline = False
+    is_policy_override = False  # right version, but an override policy set it
+    if baseline_version and baseline_version != "N/A":
+        version_matches = software_version == baseline_version
 
+        # Check if version is coming from the correct policy layer
+        policy_source_matches = controlling_type == compliance_baseline.get("layer")
+
+        # Both must be true for compliance
+        is_compliant_with_baseline = version_matches and policy_source_matches
+        is_policy_override = version_matches and not policy_source_matches
+
+    return {
+        "device_id": device.get("id", ""),
+        "device_name": device.get("name", ""),
+        "device_user": device.get("user_email") or "",
+        "platform": facts.platform,
+        "software_version": software_version,
+        "controlling_type": controlling_type,
+        "controlling_id": controlling.get("id", "unknown"),
+        "controlling_name": controlling.get("name", "Unknown"),
+        "use_latest": use_latest,
+        "expected_version": expected_version,
+        "baseline_version": baseline_version,
+        "compliant_with_controlling": (
+            software_version == expected_version if expected_version else False
+        ),
+        "compliant_with_baseline": is_compliant_with_baseline,
+        "policy_override": is_policy_override,
+        "all_layers": facts.layers,
+    }
+
+
+@contextmanager
+def frozen_heap():
+    """
+    opt-in (--freeze-gc) » keep the cyclic GC off everything allocated so far.
+    devices, attributions and layers live for the whole run, yet each full
+    collection during a big analysis walks all of them again. objects created
+    inside are still collected as usual; the heap is unfrozen on exit
+    """
+    if gc.get_freeze_count():
+        yield  # already frozen further up » leave it to whoever froze it
+        return
+    gc.freeze()
+    try:
+        yield
+    finally:
+        gc.unfreeze()
+
+
+def _group_devices(
+    devices: List[Dict[str, Any]],
+    latest_versions: Dict[str, str | None],
+    compliance_baseline: Dict[str, Any],
+) -> Tuple[Dict[tuple, Dict[str, Any]], Dict[str, Dict[str, Any]], Dict[str, int]]:
+    """groups, grouping layers & platform totals » the per-device half of the analysis"""
     # group device by: controlling_layer, platform & device version
     groups = {}
+    grouping_layers = {}  # grouping id → first policy layer seen for it
     platform_totals = {}  # track total devices per platform for % calc
 
+    baseline_layer = compliance_baseline.get("layer")
+    all_policies = compliance_baseline.get("all_policies")
+    baseline_policy_id = (compliance_baseline.get("policy") or {}).get("id")
+
+    # bucket devices that look the same to every baseline (platform, version,
+    # controlling policy, policy stack). the per-device facts are cached, so after
+    # the first baseline this is one dict lookup per device and the rest of the
+    # analysis runs once per class (thousands) instead of once per device
+    classes: Dict[tuple, tuple] = {}
     for device in devices:
-        platform = _normalize_platform(device.get("hardwareProduct", "Unknown"))
-        software_version = _normalize_version(device.get("softwareVersion", "Unknown"))
+        facts = _device_facts(device, latest_versions)
+        bucket = classes.get(facts.key)
+        if bucket is None:
+            classes[facts.key] = (facts, [device])
+        else:
+            bucket[1].append(device)
+
+    for facts, class_devices in classes.values():
+        count = len(class_devices)
+        platform = facts.platform
+        software_version = facts.software_version
+        catalog_id = facts.catalog_id
 
         # track platform totals
         if platform not in platform_totals:
             platform_totals[platform] = 0
-        platform_totals[platform] += 1
+        platform_totals[platform] += count
 
         # get controlling policy
-        attribution = device.get("policy_attribution") or {}
-        controlling = attribution.get("controlling_layer") or {}
-        effective = attribution.get("effective") or {}
-
-        controlling_type = controlling.get("type", "unknown")
+        controlling = facts.controlling
+        controlling_type = facts.controlling_type
         controlling_name = controlling.get("name", "Unknown")
-        controlling_id = controlling.get("id", "unknown")
 
         # controlling policy expected version
-        catalog_id = _get_catalog_id(device.get("hardwareProduct"))
-        if effective.get("use_latest"):
-            raw_version = latest_versions.get(catalog_id) if catalog_id else ""
-            expected_version = (
-                _normalize_version(raw_version) if raw_version else "Unknown"
+        expected_version = facts.expected_version or "Unknown"
+
+        if all_policies:
+            # find baseline policy layer (site or user_group) in this device's policy stack
+            baseline_policy_for_device = _find_layer(
+                facts.layers, "type", baseline_layer
             )
-        else:
-            expected_version = _normalize_version(effective.get("version") or "")
-
-        if compliance_baseline.get("all_policies"):
-            baseline_layer = compliance_baseline.get("layer")  # site or user_group
-            # find baseline policy layer in this device's policy stack
-            all_layers = attribution.get("all_layers", [])
-
-            baseline_policy_for_device = None
-
-            for layer in all_layers:
-                if layer.get("type") == baseline_layer:
-                    baseline_policy_for_device = layer
-                    break
-
-            if baseline_policy_for_device:
-                # use baseline layer policy for grouping
-                grouping_type = baseline_policy_for_device.get("type", "unknown")
-                grouping_name = baseline_policy_for_device.get("name", "Unknown")
-                grouping_id = baseline_policy_for_device.get("id", "unknown")
-
-                # get expected version from baseline layer policy settings
-                baseline_settings = baseline_policy_for_device.get("settings", {})
-
-                # Check if this policy has platform-specific variations
-                if baseline_settings.get("has_variations"):
-                    # Find the variation matching this device's catalog_id
-                    variations = baseline_settings.get("variations", [])
-                    matching_variation = None
-
-                    for variation in variations:
-                        prop_value = variation.get("property_value", {}).get("value")
-                        if prop_value == catalog_id:
-                            matching_variation = variation
-                            break
-
-                    if matching_variation:
-                        # Extract version from the matching variation
-                        use_latest_obj = matching_variation.get("use_latest") or {}
-                        if use_latest_obj.get("value"):
-                            raw_version = (
-                                latest_versions.get(catalog_id) if catalog_id else ""
-                            )
-                            baseline_expected_version = (
-                                _normalize_version(raw_version)
-                                if raw_version
-                                else "Unknown"
-                            )
-                        else:
-                            version_obj = matching_variation.get("version") or {}
-                            baseline_expected_version = _normalize_version(
-                                version_obj.get("value") or ""
-                            )
-                    else:
-                        # No matching variation found
-                        baseline_expected_version = "Not Configured"
-                else:
-                    # Simple policy (no variations)
-                    if baseline_settings.get("use_latest"):
-                        raw_version = (
-                            latest_versions.get(catalog_id) if catalog_id else ""
-                        )
-                        baseline_expected_version = (
-                            _normalize_version(raw_version)
-                            if raw_version
-                            else "Unknown"
-                        )
-                    else:
-                        baseline_expected_version = _normalize_version(
-                            baseline_settings.get("version") or ""
-                        )
-            else:
+            if not baseline_policy_for_device:
                 # device not member of any site/group → skip it
                 # should've been filtered already but catch in case
                 continue
+
+            # use baseline layer policy for grouping
+            grouping_type = baseline_policy_for_device.get("type", "unknown")
+            grouping_name = baseline_policy_for_device.get("name", "Unknown")
+            grouping_id = baseline_policy_for_device.get("id", "unknown")
+            grouping_layers.setdefault(grouping_id, baseline_policy_for_device)
+
+            # get expected version from baseline layer policy settings
+            baseline_expected_version = _layer_baseline_expected(
+                baseline_policy_for_device, catalog_id, latest_versions
+            )
         else:
             # single policy specified. use controlling policy for grouping
             grouping_type = controlling.get("type", "unknown")
             grouping_name = controlling.get("name", "Unknown")
             grouping_id = controlling.get("id", "unknown")
-
-            # get baseline expected version
-            baseline_expected_version = _get_baseline_version_for_device(
-                device, compliance_baseline, latest_versions
+            if controlling:
+                grouping_layers.setdefault(grouping_id, controlling)
+
+            # get baseline expected version » N/A when the policy isn't in its stack
+            baseline_policy = _find_layer(facts.layers, "id", baseline_policy_id)
+            baseline_expected_version = (
+                _layer_baseline_version(baseline_policy, catalog_id, latest_versions)
+                if baseline_policy
+                else "N/A"
             )
 
         is_compliant_with_controlling = (
@@ -375,7 +702,6 @@ def analyze_and_group_devices(
             version_matches = software_version == baseline_expected_version
 
             # Check if version is coming from the correct policy layer
-            baseline_layer = compliance_baseline.get("layer")
             policy_source_matches = controlling_type == baseline_layer
 
             # Both must be true for compliance
@@ -409,13 +735,25 @@ def analyze_and_group_devices(
                 "devices": [],  # device list for csv export
             }
 
-        groups[group_key]["count"] += 1
+        groups[group_key]["count"] += count
         if is_compliant_with_controlling:
-            groups[group_key]["compliant_with_controlling_count"] += 1
+            groups[group_key]["compliant_with_controlling_count"] += count
         if is_compliant_with_baseline:
-            groups[group_key]["compliant_with_baseline_count"] += 1
-        groups[group_key]["devices"].append(device)
+            groups[group_key]["compliant_with_baseline_count"] += count
+        groups[group_key]["devices"].extend(class_devices)
+
+    return groups, grouping_layers, platform_totals
+
 
+def _summarize_groups(
+    groups: Dict[tuple, Dict[str, Any]],
+    grouping_layers: Dict[str, Dict[str, Any]],
+    platform_totals: Dict[str, int],
+    total_devices: int,
+    latest_versions: Dict[str, str | None],
+    compliance_baseline: Dict[str, Any],
+) -> Dict[str, Any]:
+    # only reads group counters » the same for serial and merged shard groups
     compliance_by_layer = {
         "device": {"total": 0, "compliant": 0, "version_match": 0},
         "user_group": {"total": 0, "compliant": 0, "version_match": 0},
@@ -452,9 +790,236 @@ def analyze_and_group_devices(
     )
     return {
         "groups": list(groups.values()),
+        "policies": _index_groups_by_policy(
+            list(groups.values()), grouping_layers, latest_versions
+        ),
         "platform_totals": platform_totals,
-        "total_devices": len(devices),
+        "total_devices": total_devices,
         "total_compliant_with_baseline": total_compliant_with_baseline,
         "compliance_baseline": compliance_baseline,
         "compliance_by_layer": compliance_by_layer,
     }
+
+
+def _intern(value: Any, table: List[Any], index: Dict[Any, int]) -> int:
+    position = index.get(value)
+    if position is None:
+        position = index[value] = len(table)
+        table.append(value)
+    return position
+
+
+def _encode_shard(devices: List[Dict[str, Any]]) -> tuple:
+    """
+    a shard as tables + integer columns » only what _device_facts reads. each
+    policy layer is shipped once per shard, however many devices share it, and
+    layer identity (what the facts key on) survives as the table index
+    """
+    layers: List[Dict[str, Any]] = []
+    layer_index: Dict[int, int] = {}  # id(layer) → position
+    signatures: List[tuple | None] = []
+    signature_index: Dict[tuple | None, int] = {}
+    by_attribution: Dict[int, int] = {}  # id(attribution) → signature position
+    hardware: List[str | None] = []
+    hardware_index: Dict[str | None, int] = {}
+    versions: List[str] = []
+    version_index: Dict[str, int] = {}
+    hardware_col, version_col, signature_col = array("I"), array("I"), array("I")
+
+    def layer_position(layer: Dict[str, Any]) -> int:
+        position = layer_index.get(id(layer))
+        if position is None:
+            position = layer_index[id(layer)] = len(layers)
+            layers.append(layer)
+        return position
+
+    for device in devices:
+        attribution = device.get("policy_attribution")
+        position = by_attribution.get(id(attribution))
+        if position is None:
+            if attribution is None:
+                signature = None
+            else:
+                controlling = attribution.get("controlling_layer")
+                effective = attribution.get("effective") or _NO_LAYER
+                signature = (
+                    layer_position(controlling) if controlling else -1,
+                    tuple(
+                        layer_position(layer)
+                        for layer in attribution.get("all_layers") or []
+                    ),
+                    bool(effective.get("use_latest")),
+                    effective.get("version") or "",
+                )
+            position = _intern(signature, signatures, signature_index)
+            by_attribution[id(attribution)] = position
+        signature_col.append(position)
+        hardware_col.append(
+            _intern(device.get("hardwareProduct"), hardware, hardware_index)
+        )
+        version_col.append(
+            _intern(device.get("softwareVersion") or "", versions, version_index)
+        )
+
+    return (
+        layers,
+        signatures,
+        hardware,
+        versions,
+        hardware_col,
+        version_col,
+        signature_col,
+    )
+
+
+def _analyze_shard(*shard) -> tuple:
+    # own process » freezing here keeps the GC off the heap a forked worker
+    # inherited without touching the caller's GC state
+    with frozen_heap():
+        return _group_shard(*shard)
+
+
+def _group_shard(
+    latest_versions: Dict[str, str | None],
+    compliance_baseline: Dict[str, Any],
+    layers: List[Dict[str, Any]],
+    signatures: List[tuple | None],
+    hardware: List[str | None],
+    versions: List[str],
+    hardware_col: array,
+    version_col: array,
+    signature_col: array,
+) -> tuple:
+    """
+    worker side » rebuild lean devices from the columns and group them. group
+    devices come back as row numbers, grouping layers as layer table positions
+    """
+    attributions = [
+        (
+            None
+            if signature is None
+            else {
+                "controlling_layer": (
+                    layers[signature[0]] if signature[0] >= 0 else None
+                ),
+                "effective": {"use_latest": signature[2], "version": signature[3]},
+                "all_layers": [layers[position] for position in signature[1]],
+            }
+        )
+        for signature in signatures
+    ]
+    # facts once per distinct (hardware, version, attribution) » rows sharing one
+    # get it pre-cached, so grouping is a dict lookup per row
+    facts_by_columns: Dict[tuple, DeviceFacts] = {}
+    devices = []
+    for row, columns in enumerate(zip(hardware_col, version_col, signature_col)):
+        facts = facts_by_columns.get(columns)
+        if facts is None:
+            facts = facts_by_columns[columns] = _device_facts(
+                {
+                    "hardwareProduct": hardware[columns[0]],
+                    "softwareVersion": versions[columns[1]],
+                    "policy_attribution": attributions[columns[2]],
+                },
+                latest_versions,
+            )
+        devices.append(
+            {"row": row, "policy_attribution": facts.attribution, FACTS_KEY: facts}
+        )
+    groups, grouping_layers, platform_totals = _group_devices(
+        devices, latest_versions, compliance_baseline
+    )
+    for group in groups.values():
+        group["devices"] = array("L", [device["row"] for device in group["devices"]])
+    layer_index = {id(layer): position for position, layer in enumerate(layers)}
+    return (
+        groups,
+        {
+            grouping_id: layer_index[id(layer)]
+            for grouping_id, layer in grouping_layers.items()
+        },
+        platform_totals,
+    )
+
+
+def _group_devices_sharded(
+    devices: List[Dict[str, Any]],
+    latest_versions: Dict[str, str | None],
+    compliance_baseline: Dict[str, Any],
+    workers: int,
+) -> tuple | None:
+    """
+    contiguous shards, one per worker, merged back in shard order. a group's
+    first device sits in the earliest shard holding it, so groups (and their
+    header fields) come out in the same order as the serial pass. None when the
+    pool can't run » caller falls back to serial
+    """
+    shard_size = -(-len(devices) // workers)
+    starts = range(0, len(devices), shard_size)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shards = []
+            for start in starts:
+                encoded = _encode_shard(devices[start : start + shard_size])
+                future = pool.submit(
+                    _analyze_shard, latest_versions, compliance_baseline, *encoded
+                )
+                shards.append((start, encoded[0], future))
+
+            groups: Dict[tuple, Dict[str, Any]] = {}
+            grouping_layers: Dict[str, Dict[str, Any]] = {}
+            platform_totals: Dict[str, int] = {}
+            for start, layers, future in shards:
+                shard_groups, shard_grouping_layers, shard_totals = future.result()
+                for group_key, group in shard_groups.items():
+                    group["devices"] = [
+                        devices[start + row] for row in group["devices"]
+                    ]
+                    merged = groups.get(group_key)
+                    if merged is None:
+                        groups[group_key] = group
+                        continue
+                    merged["count"] += group["count"]
+                    merged["compliant_with_controlling_count"] += group[
+                        "compliant_with_controlling_count"
+                    ]
+                    merged["compliant_with_baseline_count"] += group[
+                        "compliant_with_baseline_count"
+                    ]
+                    merged["devices"].extend(group["devices"])
+                for grouping_id, position in shard_grouping_layers.items():
+                    grouping_layers.setdefault(grouping_id, layers[position])
+                for platform, count in shard_totals.items():
+                    platform_totals[platform] = platform_totals.get(platform, 0) + count
+    except (BrokenProcessPool, OSError, pickle.PicklingError) as err:
+        from utils.env_helper import logger
+
+        logger.warning(f"Sharded analysis unavailable, running serially: {err}")
+        return None
+    return groups, grouping_layers, platform_totals
+
+
+def analyze_and_group_devices(
+    devices: List[Dict[str, Any]],
+    latest_versions: Dict[str, str | None],
+    compliance_baseline: Dict[str, Any],
+    *,
+    workers: int = 1,
+) -> Dict[str, Any]:
+    """
+    workers > 1 splits the devices across a process pool (at least
+    SHARD_MIN_DEVICES per worker) and merges the shard groups. same result as
+    serial, except each group's device list follows shard order. serial runs
+    cache per-device facts on the devices, sharded runs leave them alone
+    """
+    workers = min(workers, len(devices) // SHARD_MIN_DEVICES)
+    grouped = (
+        _group_devices_sharded(devices, latest_versions, compliance_baseline, workers)
+        if workers > 1
+        else None
+    )
+    if grouped is None:
+        grouped = _group_devices(devices, latest_versions, compliance_baseline)
+    return _summarize_groups(
+        *grouped, len(devices), latest_versions, compliance_baseline
+    )
@@ -0,0 +1,334 @@
+"""Compliance history » an embedded SQLite store of daily rollups per baseline.
+Trend queries read the rollups by (baseline, day), never per-device rows."""
+
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+from rich.table import Table
+
+from utils.env_helper import console, console_log, logger
+from utils.compliance_snapshots import baseline_key
+
+# -- GLOBALS
+
+DEFAULT_HISTORY_DB = os.path.join(".history", "compliance.sqlite3")
+HISTORY_DB = os.getenv("LENSCTL_HISTORY_DB", DEFAULT_HISTORY_DB)
+TREND_KINDS = ("overall", "layer", "platform", "version")
+
+# a run adds one `runs` row and replaces that day's rollups for its baseline
+# » a day always holds the latest state seen that day
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    run_ts TEXT NOT NULL,
+    day TEXT NOT NULL,
+    baseline_key TEXT NOT NULL,
+    baseline TEXT NOT NULL,
+    total_devices INTEGER NOT NULL,
+    compliant INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_baseline ON runs (baseline_key, run_ts);
+CREATE TABLE IF NOT EXISTS daily_compliance (
+    baseline_key TEXT NOT NULL,
+    day TEXT NOT NULL,
+    baseline TEXT NOT NULL,
+    runs INTEGER NOT NULL,
+    total_devices INTEGER NOT NULL,
+    compliant INTEGER NOT NULL,
+    min_pct REAL NOT NULL,
+    max_pct REAL NOT NULL,
+    PRIMARY KEY (baseline_key, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily_layers (
+    baseline_key TEXT NOT NULL,
+    day TEXT NOT NULL,
+    layer TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    compliant INTEGER NOT NULL,
+    version_match INTEGER NOT NULL,
+    PRIMARY KEY (baseline_key, day, layer)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily_platforms (
+    baseline_key TEXT NOT NULL,
+    day TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    compliant INTEGER NOT NULL,
+    PRIMARY KEY (baseline_key, day, platform)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily_versions (
+    baseline_key TEXT NOT NULL,
+    day TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    version TEXT NOT NULL,
+    devices INTEGER NOT NULL,
+    compliant INTEGER NOT NULL,
+    PRIMARY KEY (baseline_key, day, platform, version)
+) WITHOUT ROWID;
+"""
+
+TREND_QUERIES = {
+    "overall": """
+        SELECT day, total_devices, compliant FROM daily_compliance
+        WHERE baseline_key = ? AND day >= ? ORDER BY day
+    """,
+    "layer": """
+        SELECT day, layer, total, compliant FROM daily_layers
+        WHERE baseline_key = ? AND day >= ? ORDER BY day, layer
+    """,
+    "platform": """
+        SELECT day, platform, total, compliant FROM daily_platforms
+        WHERE baseline_key = ? AND day >= ? ORDER BY day, platform
+    """,
+    "version": """
+        SELECT day, platform || ' ' || version, devices, compliant FROM daily_versions
+        WHERE baseline_key = ? AND day >= ? ORDER BY day, platform, version
+    """,
+}
+
+DAILY_TABLES = ("daily_layers", "daily_platforms", "daily_versions")
+SPARK_BARS = "▁▂▃▄▅▆▇█"
+SPARK_WIDTH = 24  # longer ranges are averaged into this many buckets
+
+
+# -- PRIVATE HELPERS » NO TOUCHY!
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _pct(compliant: int, total: int) -> float:
+    return compliant / total * 100 if total else 0.0
+
+
+def _rollup_rows(analysis: Dict[str, Any]) -> Tuple[list, list, list]:
+    """compliance_by_layer, platform_totals and group counts → daily row values"""
+    layers = [
+        (layer, data["total"], data["compliant"], data["version_match"])
+        for layer, data in analysis.get("compliance_by_layer", {}).items()
+    ]
+
+    platform_compliant: Dict[str, int] = {}
+    versions: Dict[Tuple[str, str], List[int]] = {}
+    for group in analysis.get("groups", []):
+        platform = group["platform"]
+        compliant = group["compliant_with_baseline_count"]
+        platform_compliant[platform] = platform_compliant.get(platform, 0) + compliant
+        counts = versions.setdefault((platform, group["device_version"]), [0, 0])
+        counts[0] += group["count"]
+        counts[1] += compliant
+
+    platforms = [
+        (platform, total, platform_compliant.get(platform, 0))
+        for platform, total in analysis.get("platform_totals", {}).items()
+    ]
+    version_rows = [
+        (platform, version, devices, compliant)
+        for (platform, version), (devices, compliant) in versions.items()
+    ]
+    return layers, platforms, version_rows
+
+
+def _sparkline(values: List[float]) -> str:
+    if not values:
+        return ""
+    if len(values) > SPARK_WIDTH:
+        size = len(values) / SPARK_WIDTH
+        buckets = [
+            values[int(i * size) : int((i + 1) * size)] for i in range(SPARK_WIDTH)
+        ]
+        values = [sum(bucket) / len(bucket) for bucket in buckets]
+    low, high = min(values), max(values)
+    span = (high - low) or 1.0
+    return "".join(
+        SPARK_BARS[int((value - low) / span * (len(SPARK_BARS) - 1))]
+        for value in values
+    )
+
+
+# -- PUBLIC FUNCTIONS
+
+
+def record_run(
+    analysis: Dict[str, Any],
+    compliance_baseline: Dict[str, Any],
+    *,
+    run_ts: datetime | None = None,
+    path: str = HISTORY_DB,
+) -> str:
+    """store one analysis result and refresh its day's rollups. returns the baseline key"""
+    run_ts = run_ts or datetime.now(timezone.utc)
+    day = run_ts.date().isoformat()
+    key = baseline_key(compliance_baseline)
+    display = compliance_baseline.get("display", "Unknown")
+    total = analysis.get("total_devices", 0)
+    compliant = analysis.get("total_compliant_with_baseline", 0)
+    pct = _pct(compliant, total)
+    layers, platforms, versions = _rollup_rows(analysis)
+
+    with closing(_connect(path)) as conn, conn:
+        conn.execute(
+            "INSERT INTO runs (run_ts, day, baseline_key, baseline, total_devices, compliant) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (run_ts.isoformat(timespec="seconds"), day, key, display, total, compliant),
+        )
+        conn.execute(
+            """
+            INSERT INTO daily_compliance
+                (baseline_key, day, baseline, runs, total_devices, compliant, min_pct, max_pct)
+            VALUES (?, ?, ?, 1, ?, ?, ?, ?)
+            ON CONFLICT (baseline_key, day) DO UPDATE SET
+                baseline = excluded.baseline,
+                runs = runs + 1,
+                total_devices = excluded.total_devices,
+                compliant = excluded.compliant,
+                min_pct = MIN(min_pct, excluded.min_pct),
+                max_pct = MAX(max_pct, excluded.max_pct)
+            """,
+            (key, day, display, total, compliant, pct, pct),
+        )
+        # breakdowns hold the day's latest run » replace, don't accumulate
+        for table in DAILY_TABLES:
+            conn.execute(
+                f"DELETE FROM {table} WHERE baseline_key = ? AND day = ?", (key, day)
+            )
+        conn.executemany(
+            "INSERT INTO daily_layers VALUES (?, ?, ?, ?, ?, ?)",
+            [(key, day, *row) for row in layers],
+        )
+        conn.executemany(
+            "INSERT INTO daily_platforms VALUES (?, ?, ?, ?, ?)",
+            [(key, day, *row) for row in platforms],
+        )
+        conn.executemany(
+            "INSERT INTO daily_versions VALUES (?, ?, ?, ?, ?, ?)",
+            [(key, day, *row) for row in versions],
+        )
+    return key
+
+
+def latest_baseline_key(path: str = HISTORY_DB) -> str | None:
+    if not os.path.exists(path):
+        return None
+    with closing(_connect(path)) as conn:
+        row = conn.execute(
+            "SELECT baseline_key FROM runs ORDER BY run_ts DESC, run_id DESC LIMIT 1"
+        ).fetchone()
+    return row[0] if row else None
+
+
+def latest_run(path: str = HISTORY_DB) -> Dict[str, Any] | None:
+    """the most recent run's row, i.e. for rolling several tenants' stores into one report"""
+    if not os.path.exists(path):
+        return None
+    with closing(_connect(path)) as conn:
+        row = conn.execute(
+            "SELECT run_ts, day, baseline_key, baseline, total_devices, compliant "
+            "FROM runs ORDER BY run_ts DESC, run_id DESC LIMIT 1"
+        ).fetchone()
+    if row is None:
+        return None
+    run_ts, day, key, baseline, total, compliant = row
+    return {
+        "run_ts": run_ts,
+        "day": day,
+        "baseline_key": key,
+        "baseline": baseline,
+        "total_devices": total,
+        "compliant": compliant,
+        "pct": _pct(compliant, total),
+    }
+
+
+def trend(
+    key: str,
+    kind: str = "overall",
+    *,
+    days: int = 90,
+    path: str = HISTORY_DB,
+) -> List[Dict[str, Any]]:
+    """
+    daily compliance for one baseline, oldest first. overall rows have no series;
+    layer/platform/version rows carry the series name (i.e. "Desktop App MacOS 2.3.1")
+    """
+    if kind not in TREND_KINDS:
+        raise ValueError(f"unknown trend: {kind} (use {', '.join(TREND_KINDS)})")
+    since = (datetime.now(timezone.utc).date() - timedelta(days=days)).isoformat()
+    with closing(_connect(path)) as conn:
+        rows = conn.execute(TREND_QUERIES[kind], (key, since)).fetchall()
+
+    if kind == "overall":
+        return [
+            {"day": day, "series": None, "total": total, "compliant": compliant}
+            | {"pct": _pct(compliant, total)}
+            for day, total, compliant in rows
+        ]
+    return [
+        {"day": day, "series": series, "total": total, "compliant": compliant}
+        | {"pct": _pct(compliant, total)}
+        for day, series, total, compliant in rows
+    ]
+
+
+def display_trend(
+    key: str, kind: str = "overall", *, days: int = 14, path: str = HISTORY_DB
+) -> None:
+    rows = trend(key, kind, days=days, path=path)
+    if not rows:
+        return
+
+    # one line per series » sparkline of daily compliance % + first/last values
+    series: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        series.setdefault(row["series"] or "All devices", []).append(row)
+
+    table = Table(
+        title=f"Compliance trend » last {days} days ({kind})",
+        title_justify="left",
+        header_style="bold",
+    )
+    table.add_column("Series", style="cyan", overflow="fold")
+    table.add_column("Days", justify="right")
+    table.add_column("Trend", no_wrap=True, min_width=SPARK_WIDTH)
+    table.add_column("First", justify="right")
+    table.add_column("Latest", justify="right")
+    table.add_column("Devices", justify="right")
+    for name, points in series.items():
+        first, last = points[0]["pct"], points[-1]["pct"]
+        style = "green" if last > first else "red" if last < first else "dim"
+        table.add_row(
+            name.replace("Desktop App ", ""),
+            f"{len(points)}",
+            _sparkline([point["pct"] for point in points]),
+            f"{first:.1f}%",
+            f"[{style}]{last:.1f}%[/{style}]",
+            f"{points[-1]['total']:,}",
+        )
+    console.print(table)
+    console.print()
+
+
+def record_and_display(
+    analysis: Dict[str, Any], compliance_baseline: Dict[str, Any]
+) -> str | None:
+    """record this run and show the baseline's recent trend once there's more than one day"""
+    try:
+        key = record_run(analysis, compliance_baseline)
+    except sqlite3.Error as err:
+        logger.warning(f"Couldn't record compliance history in {HISTORY_DB}: {err}")
+        return None
+    console_log(f"[dim]Compliance history updated » {HISTORY_DB}[/dim]")
+    if len(trend(key, days=14)) > 1:
+        console.print()
+        display_trend(key, days=14)
+    return key
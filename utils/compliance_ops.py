@@ -1,24 +1,27 @@
+import os
 import csv
+from contextlib import nullcontext
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Tuple
 from rich.table import Table
 from rich.panel import Panel
 from rich.text import Text
 from rich.align import Align
-import re
 
 from utils import auth
+from utils import phase_profiler
+from utils import columnar_export
+from utils import policy_names
+from utils import compliance_history, compliance_snapshots
 from utils.env_helper import console_log, console
 from utils.input_helpers import menu_return, ask_int, ask_str
 
 from utils.compliance_analysis import (
     PLATFORM_CATALOG_MAP,
-    _normalize_platform,
-    _normalize_version,
-    _get_catalog_id,
     extract_unique_policies,
     analyze_and_group_devices,
-    _get_baseline_version_for_device,
+    evaluate_device_compliance,
+    frozen_heap,
 )
 from utils.device_ops import (
     fetch_devices_by_model,
@@ -27,6 +30,84 @@ from utils.device_ops import (
 )
 
 
+BASELINE_LAYERS = ("model", "site", "user_group")
+FREEZE_GC_ENV = "LENSCTL_FREEZE_GC"
+ANALYSIS_WORKERS_ENV = "LENSCTL_ANALYSIS_WORKERS"  # process count or "auto"
+SUMMARY_COLUMNS = (
+    "Platform",
+    "Device Count",
+    "Device SW Ver.",
+    "% Platform",
+    "Compliance Status",
+)
+
+
+class BaselineNotFoundError(Exception):
+    pass
+
+
+def resolve_compliance_baseline(
+    unique_policies: Dict[str, List[Dict]],
+    layer: str,
+    policy: str | None = None,
+) -> Dict[str, Any]:
+    """
+    headless counterpart of prompt_compliance_target. builds the same baseline dict
+    from a layer + optional policy name/id. site/user_group without a policy (or
+    policy="all") compares every device to its own site/group policy
+    """
+    layer = "user_group" if layer == "group" else layer
+    if layer not in BASELINE_LAYERS:
+        raise BaselineNotFoundError(
+            f"Unknown baseline layer '{layer}'. Use one of: {', '.join(BASELINE_LAYERS)}"
+        )
+
+    candidates = [p for p in unique_policies.get(layer, []) if p["has_settings"]]
+    if not candidates:
+        raise BaselineNotFoundError(
+            f"No {layer} policies with Desktop App settings found in this tenant"
+        )
+
+    if layer != "model" and (policy is None or policy.lower() == "all"):
+        layer_name = "Sites" if layer == "site" else "Groups"
+        return {
+            "layer": layer,
+            "all_policies": True,
+            "policies": candidates,
+            "display": f"All {layer_name}",
+        }
+
+    if policy is None:
+        selected = candidates[0]  # same pick as the interactive menu
+    else:
+        wanted = policy.strip().lower()
+        selected = next(
+            (
+                p
+                for p in candidates
+                if p["id"] == policy or (p["name"] or "").lower() == wanted
+            ),
+            None,
+        )
+        if selected is None:
+            available = ", ".join(f"'{p['name']}'" for p in candidates[:10])
+            raise BaselineNotFoundError(
+                f"No {layer} policy named '{policy}'. Available: {available}"
+                + (" ..." if len(candidates) > 10 else "")
+            )
+
+    if layer == "model":
+        display = f"Account Model Policy: {selected['name']}"
+    else:
+        display = selected["name"]
+    return {
+        "layer": layer,
+        "policy": selected,
+        "all_policies": False,
+        "display": display,
+    }
+
+
 def prompt_compliance_target(
     unique_policies: Dict[str, List[Dict]],
 ) -> Dict[str, Any] | None:
@@ -282,132 +363,18 @@ def filter_devices_by_baseline(
 # ----------display funcs----------
 
 
-def _get_expected_versions_display(
-    groups: List[Dict[str, Any]],
-    grouping_id: str,
-    latest_versions: Dict[str, str | None],
-) -> str:
+def _get_expected_versions_display(policy: Dict[str, Any] | None) -> str:
     """
     get display string showing expected versions for THIS policy. i.e., "Expected: Mac 2.3.1 | Win 2.1.1"
     shows ALL platforms THIS policy defines, even if no devices exist on that platform.
 
     args:
-        groups: List of group dicts from analysis
-        grouping_id: The policy ID to get versions for
-        latest_versions: Dict mapping catalog_ids to latest GA versions
+        policy: entry from analysis["policies"] (built once by analyze_and_group_devices)
     """
-    matching_groups = [g for g in groups if g["grouping_id"] == grouping_id]
-
-    if not matching_groups:
+    if not policy or policy["expected_versions"] is None:
         return "Expected: Unknown"
 
-    # find a device with valid policy attribution to read policy settings from
-    # search through all groups since some groups may have devices with failed policy fetches
-    reference_device = None
-    grouping_type = matching_groups[0]["grouping_type"]
-
-    for group in matching_groups:
-        for device in group.get("devices", []):
-            attribution = device.get("policy_attribution")
-            if attribution:
-                # check if this device has the policy layer we need
-                all_layers = attribution.get("all_layers", [])
-                for layer in all_layers:
-                    if (
-                        layer.get("id") == grouping_id
-                        and layer.get("type") == grouping_type
-                    ):
-                        reference_device = device
-                        break
-                if reference_device:
-                    break
-        if reference_device:
-            break
-
-    # ff no device has valid attribution, fallback to group-level data
-    if not reference_device:
-        all_platform_versions = {}
-        for group in matching_groups:
-            platform_short = group["platform"].replace("Desktop App ", "")
-            expected = group["controlling_expected_version"]
-            if expected and expected != "N/A" and expected != "Unknown":
-                all_platform_versions[platform_short] = expected
-
-        if all_platform_versions:
-            parts = [
-                f"{platform} {version}"
-                for platform, version in sorted(all_platform_versions.items())
-            ]
-            return "Expected: " + " | ".join(parts)
-        return "Expected: N/A"
-
-    # access the policy settings from the reference device's attribution
-    attribution = reference_device.get("policy_attribution") or {}
-    all_layers = attribution.get("all_layers", [])
-
-    # find the specific layer for this grouping_id
-    matching_layer = None
-    for layer in all_layers:
-        if layer.get("id") == grouping_id and layer.get("type") == grouping_type:
-            matching_layer = layer
-            break
-
-    if not matching_layer:
-        return "Expected: Unknown"
-
-    settings = matching_layer.get("settings")
-    if not settings:
-        return "Expected: Unknown"
-
-    all_platform_versions = {}
-
-    # check if policy has platform-specific variations
-    if settings.get("has_variations"):
-        variations = settings.get("variations", [])
-
-        for variation in variations:
-            # Get catalog_id from property_value
-            catalog_id = variation.get("property_value", {}).get("value")
-
-            # Determine platform name from catalog_id
-            if catalog_id == "lens-desktop-mac":
-                platform_short = "Mac"
-            elif catalog_id == "lens-desktop-windows":
-                platform_short = "Windows x64"
-            elif catalog_id == "lens-desktop-windows-arm":
-                platform_short = "Windows ARM"
-            else:
-                continue
-
-            # check if use_latest or specific version
-            use_latest_obj = variation.get("use_latest")
-            if use_latest_obj and use_latest_obj.get("value"):
-                version = latest_versions.get(catalog_id, "Unknown")
-            else:
-                version_obj = variation.get("version")
-                version = (
-                    version_obj.get("value", "Unknown") if version_obj else "Unknown"
-                )
-
-            all_platform_versions[platform_short] = _normalize_version(version)
-    else:
-        # simple policy without variations - applies same version to all platforms
-        use_latest = settings.get("use_latest")
-        if use_latest:
-            # apply to both platforms
-            for catalog_id, platform_name in [
-                ("lens-desktop-mac", "Mac"),
-                ("lens-desktop-windows", "Windows x64"),
-                ("lens-desktop-windows-arm", "Windows ARM"),
-            ]:
-                version = latest_versions.get(catalog_id, "Unknown")
-                all_platform_versions[platform_name] = _normalize_version(version)
-        else:
-            version = settings.get("version", "Unknown")
-            # single version applies to all platforms
-            for platform_name in ["Mac", "Windows x64", "Windows ARM"]:
-                all_platform_versions[platform_name] = _normalize_version(version)
-
+    all_platform_versions = policy["expected_versions"]
     if not all_platform_versions:
         return "Expected: N/A"
 
@@ -419,13 +386,39 @@ def _get_expected_versions_display(
     return "Expected: " + " | ".join(parts)
 
 
+def _sorted_policy_sections(
+    analysis: Dict[str, Any], baseline_layer: str | None
+) -> List[tuple]:
+    """
+    report sections in display order » [(policy, sorted groups), ...]
+    baseline policies first, then by policy priority. groups by platform then count
+    """
+    # priority → baseline first then by policy priority
+    type_priority = {"device": 0, "user_group": 1, "site": 2, "model": 3}
+
+    def policy_key(policy):
+        grouping_type = policy["grouping_type"]
+        return (
+            0 if grouping_type == baseline_layer else 1,
+            type_priority.get(grouping_type, 99),
+            policy["grouping_id"],
+        )
+
+    return [
+        (
+            policy,
+            sorted(policy["groups"], key=lambda g: (g["platform"], -g["count"])),
+        )
+        for policy in sorted(analysis.get("policies", {}).values(), key=policy_key)
+    ]
+
+
 def display_aggregated_compliance_report(
     analysis: Dict[str, Any],
     compliance_baseline: Dict[str, Any],
     latest_versions: Dict[str, str | None],
 ):
 
-    groups: List[Dict[str, Any]] = analysis.get("groups", [])
     platform_totals = analysis["platform_totals"]
     total_devices = analysis["total_devices"]
 
@@ -543,12 +536,9 @@ def display_aggregated_compliance_report(
         else:
             baseline_policy = compliance_baseline.get("policy", {})
             policy_name = baseline_policy.get("name", "Unknown")
-            if baseline_layer == "site":
-                match = re.search(r"\(([^)]+)\)", policy_name)
-                clean_name = match.group(1) if match else policy_name
-            else:
-                match = re.search(r"Group\(([^)]+)\)", policy_name)
-                clean_name = match.group(1) if match else policy_name
+            clean_name = policy_names.display_name(
+                baseline_layer, policy_name, fallback=policy_name
+            )
 
         title = f"Desktop App Compliance Summary - [bold]{clean_name}[/bold]"
     else:
@@ -563,22 +553,7 @@ def display_aggregated_compliance_report(
 
     baseline_layer = compliance_baseline.get("layer")
 
-    def sort_key(g):
-        grouping_type = g["grouping_type"]
-        is_baseline = grouping_type == baseline_layer
-
-        # priority → baseline first then by policy priority
-        type_priority = {"device": 0, "user_group": 1, "site": 2, "model": 3}
-
-        return (
-            0 if is_baseline else 1,
-            type_priority.get(grouping_type, 99),
-            g["grouping_id"],
-            g["platform"],
-            -g["count"],
-        )
-
-    sorted_groups = sorted(groups, key=sort_key)
+    sections = _sorted_policy_sections(analysis, baseline_layer)
 
     # group by policy for section-based display
     if compliance_baseline.get("all_policies"):
@@ -595,147 +570,108 @@ def display_aggregated_compliance_report(
     console_log(f"[bold]{grouping_label}[/bold]")
     console.print()
 
-    current_policy_id = None
-    current_table = None
-    current_platform = None
-    header_text = ""
-    show_controlling_column = False
-
-    for group in sorted_groups:
-        grouping_type = group["grouping_type"]
-        grouping_name = group["grouping_name"]
-        grouping_id = group["grouping_id"]
-        controlling_type = group["controlling_type"]
-        controlling_name = group["controlling_name"]
-        platform = group["platform"]
-        device_version = group["device_version"]
-        controlling_expected = group["controlling_expected_version"]
-        baseline_expected = group["baseline_expected_version"]
-        count = group["count"]
-        pct_platform = group["pct_of_platform"]
-        compliant_with_baseline = group["compliant_with_baseline_count"]
+    # create section header with policy type and name
+    type_headers = {
+        "device": "▶ DEVICE POLICY",
+        "user_group": "▶ DEVICE USER GROUP POLICY",
+        "site": "▶ SITE POLICY",
+        "model": "▶ ACCOUNT POLICY",
+    }
+
+    for policy, policy_groups in sections:
+        grouping_type = policy["grouping_type"]
+        grouping_name = policy["grouping_name"]
 
         # extract policy display name
-        if grouping_type == "device":
-            match = re.search(r"\(([a-f0-9-]+)\)", grouping_name)
-            policy_display = match.group(1)[:12] + "..." if match else "Unknown"
-        elif grouping_type == "site":
-            match = re.search(r"\(([^)]+)\)", grouping_name)
-            policy_display = match.group(1) if match else "Unknown"
-        elif grouping_type == "user_group":
-            match = re.search(r"Group\(([^)]+)\)", grouping_name)
-            policy_display = match.group(1) if match else "Unknown"
-        else:
-            match = re.search(r"^(.*?)\s+Update\s+Policy", grouping_name)
-            policy_display = match.group(1) if match else "Unknown"
-
-        # when we hit a new policy, print the previous table and create a new section
-        if current_policy_id != grouping_id:
-            # print previous table if it exists
-            if current_table is not None:
-                policy_panel = Panel(
-                    Align.center(current_table),
-                    title=header_text if header_text else "",
-                    border_style="dim",
-                    padding=(0, 1),
-                )
-                console.print(policy_panel)
-                console.print()
+        policy_display = policy_names.display_name(
+            grouping_type, grouping_name, fallback="Unknown"
+        )
 
-            # create section header with policy type and name
-            type_headers = {
-                "device": "▶ DEVICE POLICY",
-                "user_group": "▶ DEVICE USER GROUP POLICY",
-                "site": "▶ SITE POLICY",
-                "model": "▶ ACCOUNT POLICY",
-            }
-            header_prefix = type_headers.get(
-                grouping_type, f"▶ {grouping_type.upper()}"
-            )
+        header_prefix = type_headers.get(grouping_type, f"▶ {grouping_type.upper()}")
 
-            # Get expected versions for this policy
-            expected_versions_text = _get_expected_versions_display(
-                groups, grouping_id, latest_versions
-            )
+        # Get expected versions for this policy
+        expected_versions_text = _get_expected_versions_display(policy)
 
-            # header text with policy name and expected versions
-            header_text = f"[cyan]{header_prefix}:[/cyan] [bold]{policy_display}[/bold] [dim]|[/dim] [magenta]{expected_versions_text}[/magenta]"
+        # header text with policy name and expected versions
+        header_text = f"[cyan]{header_prefix}:[/cyan] [bold]{policy_display}[/bold] [dim]|[/dim] [magenta]{expected_versions_text}[/magenta]"
 
-            # create new table for this policy
-            current_table = Table(show_header=True, header_style="bold", padding=(0, 0))
-            current_table.add_column(
-                "Platform", style="white", width=30, justify="center", no_wrap=True
-            )
-            current_table.add_column(
-                "Device Count", style="white", justify="center", width=16
-            )
-            current_table.add_column(
-                "Device SW Ver.", style="cyan", justify="center", width=16
-            )
+        # create new table for this policy
+        current_table = Table(show_header=True, header_style="bold", padding=(0, 0))
+        current_table.add_column(
+            "Platform", style="white", width=30, justify="center", no_wrap=True
+        )
+        current_table.add_column(
+            "Device Count", style="white", justify="center", width=16
+        )
+        current_table.add_column(
+            "Device SW Ver.", style="cyan", justify="center", width=16
+        )
+        current_table.add_column(
+            "% Platform", style="white", justify="center", width=12
+        )
+
+        # only show controlling policy column when:
+        # 1. baseline is site or user_group
+        # 2. at least one device in this policy section has a policy override
+        show_controlling_column = baseline_layer in ["site", "user_group"] and any(
+            ct != baseline_layer for ct in policy["controlling_types"]
+        )
+
+        if show_controlling_column:
             current_table.add_column(
-                "% Platform", style="white", justify="center", width=12
+                "Controlling Policy", style="dim", justify="center", width=60
             )
 
-            # only show controlling policy column when:
-            # 1. baseline is site or user_group
-            # 2. at least one device in this policy section has a policy override
-            show_controlling_column = False
-            if baseline_layer in ["site", "user_group"]:
-                # look ahead to see if any devices in this policy section have overrides
-                for g in sorted_groups:
-                    if g["grouping_id"] == grouping_id:
-                        if g["controlling_type"] != baseline_layer:
-                            show_controlling_column = True
-                            break
-
-            if show_controlling_column:
-                current_table.add_column(
-                    "Controlling Policy", style="dim", justify="center", width=60
-                )
+        current_platform = None
 
-            current_policy_id = grouping_id
-            current_platform = None
+        for group in policy_groups:
+            controlling_type = group["controlling_type"]
+            controlling_name = group["controlling_name"]
+            platform = group["platform"]
+            device_version = group["device_version"]
+            baseline_expected = group["baseline_expected_version"]
+            count = group["count"]
+            pct_platform = group["pct_of_platform"]
+            compliant_with_baseline = group["compliant_with_baseline_count"]
 
             # add platform header row to distinguish grouping
-        if current_platform != platform and current_table is not None:
-            platform_short = platform.replace("Desktop App ", "")
+            if current_platform != platform:
+                platform_short = platform.replace("Desktop App ", "")
 
-            # platform header row - name in col 1 rest empty
-            if show_controlling_column:
-                current_table.add_row(
-                    f"[reverse bold blue]{platform_short }[/reverse bold blue]",
-                    "",
-                    "",
-                    "",
-                    "",
-                )
-            else:
-                current_table.add_row(
-                    f"[reverse bold blue]{platform_short }[/reverse bold blue]",
-                    "",
-                    "",
-                    "",
-                )
-            current_platform = platform
+                # platform header row - name in col 1 rest empty
+                if show_controlling_column:
+                    current_table.add_row(
+                        f"[reverse bold blue]{platform_short }[/reverse bold blue]",
+                        "",
+                        "",
+                        "",
+                        "",
+                    )
+                else:
+                    current_table.add_row(
+                        f"[reverse bold blue]{platform_short }[/reverse bold blue]",
+                        "",
+                        "",
+                        "",
+                    )
+                current_platform = platform
 
-        # add row to current table
-        baseline_layer = compliance_baseline.get("layer")
-        is_group_compliant_with_baseline = compliant_with_baseline == count
+            # add row to current table
+            is_group_compliant_with_baseline = compliant_with_baseline == count
 
-        version_matches = device_version == baseline_expected
-        policy_source_matches = controlling_type == baseline_layer
+            version_matches = device_version == baseline_expected
+            policy_source_matches = controlling_type == baseline_layer
 
-        if is_group_compliant_with_baseline:
-            # Green: compliant
-            device_version_display = f"[green]{device_version}[/green]"
-        elif version_matches and not policy_source_matches:
-            # Yellow: correct version but override policy
-            device_version_display = f"[yellow]{device_version}[/yellow]"
-        else:
-            # Red: wrong version
-            device_version_display = f"[red]{device_version}[/red]"
+            if is_group_compliant_with_baseline:
+                # Green: compliant
+                device_version_display = f"[green]{device_version}[/green]"
+            elif version_matches and not policy_source_matches:
+                # Yellow: correct version but override policy
+                device_version_display = f"[yellow]{device_version}[/yellow]"
+            else:
+                # Red: wrong version
+                device_version_display = f"[red]{device_version}[/red]"
 
-        if current_table is not None:
             if show_controlling_column:
                 current_table.add_row(
                     "",
@@ -752,8 +688,6 @@ def display_aggregated_compliance_report(
                     f"{pct_platform:.1f}%",
                 )
 
-    # print final table
-    if current_table is not None:
         policy_panel = Panel(
             Align.center(current_table),
             title=header_text,
@@ -767,7 +701,7 @@ def display_aggregated_compliance_report(
     )
     console.print()
     console.print(
-        "[dim yellow]Note:[/dim yellow][dim] Aggregated view showing device distribution. Full details exported to CSV.[/dim]"
+        "[dim yellow]Note:[/dim yellow][dim] Aggregated view showing device distribution. Full details exported to CSV and XLSX.[/dim]"
     )
     console.print()
 
@@ -775,6 +709,43 @@ def display_aggregated_compliance_report(
 # -- Csv Export Funcs
 
 
+def _full_detail_row(result: Dict[str, Any]) -> Dict[str, Any]:
+    """one evaluated device → full-details row (CSV + XLSX Devices sheet)"""
+    all_layers = result["all_layers"]
+
+    policy_stack_summary = []
+    for layer in all_layers:
+        # memoized per (type, name) » no regex per device
+        display = policy_names.stack_label(
+            layer.get("type") or "", layer.get("name", "Unknown")
+        )
+
+        # Mark controlling layer with asterisk
+        if layer.get("is_controlling", False):
+            display += "*"
+
+        policy_stack_summary.append(display)
+    policy_stack_str = " >> ".join(policy_stack_summary)
+
+    return {
+        "Device ID": result["device_id"],
+        "Device Name": result["device_name"],
+        "Device User": result["device_user"],
+        "Platform": result["platform"],
+        "Device SW Version": result["software_version"],
+        "Compliant with Baseline": (
+            "Yes" if result["compliant_with_baseline"] else "No"
+        ),
+        "Policy Layers (Highest >> Lowest Priority)": f"{policy_stack_str}",
+        "Winning Policy Layer": result["controlling_type"],
+        "Winning Policy Name": result["controlling_name"],
+        "Winning Policy Setting": (
+            "use_latest" if result["use_latest"] else result["expected_version"]
+        ),
+        "Winning Policy Version": result["expected_version"],
+    }
+
+
 def export_compliance_csv_full_details(
     devices: List[Dict[str, Any]],
     latest_versions: Dict[str, str | None],
@@ -788,114 +759,10 @@ def export_compliance_csv_full_details(
 
     with open(filename, "w", newline="", encoding="utf-8") as f:
         for device in devices:
-            device_id = device.get("id", "")
-            device_name = device.get("name", "")
-            platform = _normalize_platform(device.get("hardwareProduct", "Unknown"))
-            software_version = device.get("softwareVersion") or ""
-            software_version_normalized = _normalize_version(software_version)
-            user_email = device.get("user_email") or ""
-
-            # attribution info (from check_compliance)
-            attribution = device.get("policy_attribution") or {}
-            controlling = attribution.get("controlling_layer") or {}
-            effective = attribution.get("effective") or {}
-            account_policy = attribution.get("account_policy") or {}
-            all_layers = attribution.get("all_layers") or {}
-
-            controlling_type = controlling.get("type", "unknown")
-            controlling_name = controlling.get("name", "Unknown")
-            controlling_priority = controlling.get("priority", "")
-            controlling_id = controlling.get("id", "unknown")
-
-            catalog_id = _get_catalog_id(device.get("hardwareProduct"))
-            effective_policy_setting = None
-
-            if effective.get("use_latest"):
-                raw_version = latest_versions.get(catalog_id) if catalog_id else ""
-                expected_version = (
-                    _normalize_version(raw_version) if raw_version else ""
-                )
-                effective_policy_setting = "use_latest"
-            else:
-                expected_version = _normalize_version(effective.get("version") or "")
-                effective_policy_setting = expected_version
-
-            # calc baseline version for device
-            baseline_version = _get_baseline_version_for_device(
-                device, compliance_baseline, latest_versions
-            )
-            baseline_version_normalized = _normalize_version(baseline_version)
-
-            # calc compliance for device
-            is_compliant_with_controlling = (
-                software_version_normalized == expected_version
-                if expected_version
-                else False
+            result = evaluate_device_compliance(
+                device, latest_versions, compliance_baseline
             )
-
-            # Compliance requires BOTH version match AND correct policy source
-            is_compliant_with_baseline = False
-            if baseline_version_normalized and baseline_version_normalized != "N/A":
-                version_matches = (
-                    software_version_normalized == baseline_version_normalized
-                )
-
-                # Check if version is coming from the correct policy layer
-                baseline_layer = compliance_baseline.get("layer")
-                policy_source_matches = controlling_type == baseline_layer
-
-                # Both must be true for compliance
-                is_compliant_with_baseline = version_matches and policy_source_matches
-
-            baseline_display = compliance_baseline.get("display", "Unknown")
-
-            policy_stack_summary = []
-            for layer in all_layers:
-                layer_type = layer.get("type") or ""
-                layer_name = layer.get("name", "Unknown")
-                is_controlling = layer.get("is_controlling", False)
-                has_settings = layer.get("has_settings", False)
-
-                # Extract clean policy name
-                if layer_type == "device":
-                    match = re.search(r"\(([a-f0-9-]+)\)", layer_name)
-                    clean_name = match.group(1)[:8] + "..." if match else "Device"
-                    display = f"Device ({clean_name})"
-                elif layer_type == "site":
-                    match = re.search(r"\(([^)]+)\)", layer_name)
-                    clean_name = match.group(1) if match else "Site"
-                    display = f"Site ({clean_name})"
-                elif layer_type == "user_group":
-                    match = re.search(r"Group\(([^)]+)\)", layer_name)
-                    clean_name = match.group(1) if match else "User Group"
-                    display = f"User Group ({clean_name})"
-                elif layer_type == "model":
-                    display = "Account model"
-                else:
-                    display = layer_type.title()
-
-                # Mark controlling layer with asterisk
-                if is_controlling:
-                    display += "*"
-
-                policy_stack_summary.append(display)
-            policy_stack_str = " >> ".join(policy_stack_summary)
-
-            row = {
-                "Device ID": device_id,
-                "Device Name": device_name,
-                "Device User": user_email,
-                "Platform": platform,
-                "Device SW Version": software_version_normalized,
-                "Compliant with Baseline": (
-                    "Yes" if is_compliant_with_baseline else "No"
-                ),
-                "Policy Layers (Highest >> Lowest Priority)": f"{policy_stack_str}",
-                "Winning Policy Layer": controlling_type,
-                "Winning Policy Name": controlling_name,
-                "Winning Policy Setting": effective_policy_setting,
-                "Winning Policy Version": expected_version,
-            }
+            row = _full_detail_row(result)
 
             if writer is None:
                 writer = csv.DictWriter(f, fieldnames=list(row.keys()))
@@ -912,11 +779,14 @@ def export_compliance_csv_full_details(
     )
 
 
-def export_compliance_csv_summary(
-    analysis: Dict[str, Any],
-    compliance_baseline: Dict[str, Any],
-    filename: str = "desktop-app-compliance-summary.csv",
-):
+def _summary_rows(
+    analysis: Dict[str, Any], compliance_baseline: Dict[str, Any]
+) -> Iterator[Tuple[str, List[Any]]]:
+    """
+    summary report rows as (kind, cells) » kind is meta | section | header |
+    platform | group | blank. group rows carry raw count/percent so each writer
+    formats them its own way (CSV text vs typed XLSX cells)
+    """
     run_date = datetime.now().strftime("%d-%m-%Y %H:%M")
     baseline_display = compliance_baseline.get("display", "Unknown")
     baseline_layer = compliance_baseline.get("layer")
@@ -929,41 +799,6 @@ def export_compliance_csv_summary(
         else "N/A"
     )
 
-    layer_labels = {
-        "device": "Device Policy",
-        "user_group": "User Group Policy",
-        "site": "Site Policy",
-        "model": "Account Model ",
-    }
-
-    def _clean_policy_name(name, policy_type):
-        if policy_type == "device":
-            match = re.search(r"\(([a-f0-9-]+)\)", name)
-            return match.group(1)[:12] + "..." if match else name
-        elif policy_type == "site":
-            match = re.search(r"\(([^)]+)\)", name)
-            return match.group(1) if match else name
-        elif policy_type == "user_group":
-            match = re.search(r"Group\(([^)]+)\)", name)
-            return match.group(1) if match else name
-        else:
-            match = re.search(r"^(.*?)\s+Update\s+Policy", name)
-            return match.group(1) if match else name
-
-    def sort_key(g):
-        type_priority = {"device": 0, "user_group": 1, "site": 2, "model": 3}
-        return (
-            0 if g["grouping_type"] == baseline_layer else 1,
-            type_priority.get(g["grouping_type"], 99),
-            g["grouping_id"],
-            g["platform"],
-            -g["count"],
-        )
-
-    sorted_groups = sorted(analysis.get("groups", []), key=sort_key)
-
-    console_log(f"[cyan]Exporting compliance summary to CSV: {filename}[/cyan]")
-
     type_headers = {
         "device": "DEVICE POLICY",
         "user_group": "USER GROUP POLICY",
@@ -971,78 +806,51 @@ def export_compliance_csv_summary(
         "model": "ACCOUNT MODEL",
     }
 
-    col_headers = [
-        "Platform",
-        "Device Count",
-        "Device SW Ver.",
-        "% Platform",
-        "Compliance Status",
-    ]
+    yield "meta", [f"Run Date: {run_date}"]
+    yield "meta", [f"Baseline >> {baseline_display}"]
+    yield "meta", [f"Overall Compliance: {overall_pct}"]
+    yield "blank", []
 
-    row_count = 0
-    with open(filename, "w", newline="", encoding="utf-8") as f:
-        just = csv.writer(f)
-        just.writerow([f"Run Date: {run_date}"])
-        just.writerow([f"Baseline >> {baseline_display}"])
-        just.writerow([f"Overall Compliance: {overall_pct}"])
-        just.writerow([])
+    first_section = True
+
+    for policy, policy_groups in _sorted_policy_sections(analysis, baseline_layer):
+        grouping_type = policy["grouping_type"]
+
+        if not first_section:
+            yield "blank", []
+        first_section = False
+
+        policy_display = policy_names.display_name(
+            grouping_type, policy["grouping_name"], fallback=policy["grouping_name"]
+        )
+        header_prefix = type_headers.get(grouping_type, grouping_type.upper())
+
+        # baseline expected version of each platform's biggest group
+        expected_parts = [
+            f"{p} {v}" for p, v in sorted(policy["baseline_expected"].items())
+        ]
+        expected_text = (
+            "Expected: " + " | ".join(expected_parts)
+            if expected_parts
+            else "Expected: N/A"
+        )
+
+        yield "section", [f">> {header_prefix}: {policy_display} | {expected_text}"]
+        yield "header", list(SUMMARY_COLUMNS)
 
-        current_policy_id = None
         current_platform = None
-        first_section = True
 
-        for group in sorted_groups:
-            grouping_type = group["grouping_type"]
-            grouping_name = group["grouping_name"]
-            grouping_id = group["grouping_id"]
+        for group in policy_groups:
             controlling_type = group["controlling_type"]
             platform = group["platform"]
             device_version = group["device_version"]
             baseline_expected = group["baseline_expected_version"]
             count = group["count"]
-            pct_platform = group["pct_of_platform"]
             compliant = group["compliant_with_baseline_count"]
 
-            if current_policy_id != grouping_id:
-                if not first_section:
-                    just.writerow([])
-                first_section = False
-
-                policy_display = _clean_policy_name(grouping_name, grouping_type)
-                header_prefix = type_headers.get(grouping_type, grouping_type.upper())
-
-                policy_groups = [
-                    group
-                    for group in sorted_groups
-                    if group["grouping_id"] == grouping_id
-                ]
-                platform_versions = {}
-                for pg in policy_groups:
-                    platform_short = pg["platform"].replace("Desktop App ", "")
-                    if platform_short not in platform_versions:
-                        platform_versions[platform_short] = pg[
-                            "baseline_expected_version"
-                        ]
-                expected_parts = [
-                    f"{p} {v}" for p, v in sorted(platform_versions.items())
-                ]
-                expected_text = (
-                    "Expected: " + " | ".join(expected_parts)
-                    if expected_parts
-                    else "Expected: N/A"
-                )
-
-                just.writerow(
-                    [f">> {header_prefix}: {policy_display} | {expected_text}"]
-                )
-                just.writerow(col_headers)
-
-                current_policy_id = grouping_id
-                current_platform = None
-
             if current_platform != platform:
                 platform_short = platform.replace("Desktop App ", "")
-                just.writerow([f"[ {platform_short} ]"])
+                yield "platform", [f"[ {platform_short} ]"]
                 current_platform = platform
 
             is_group_compliant = compliant == count
@@ -1056,10 +864,31 @@ def export_compliance_csv_summary(
             else:
                 status = "Non-Compliant"
 
-            just.writerow(
-                ["", f"{count:,}", device_version, f"{pct_platform:.1f}%", status]
-            )
-            row_count += 1
+            yield "group", ["", count, device_version, group["pct_of_platform"], status]
+
+
+def export_compliance_csv_summary(
+    analysis: Dict[str, Any],
+    compliance_baseline: Dict[str, Any],
+    filename: str = "desktop-app-compliance-summary.csv",
+):
+    console_log(f"[cyan]Exporting compliance summary to CSV: {filename}[/cyan]")
+
+    row_count = 0
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        just = csv.writer(f)
+        for kind, cells in _summary_rows(analysis, compliance_baseline):
+            if kind == "group":
+                _, count, device_version, pct_platform, status = cells
+                cells = [
+                    "",
+                    f"{count:,}",
+                    device_version,
+                    f"{pct_platform:.1f}%",
+                    status,
+                ]
+                row_count += 1
+            just.writerow(cells)
 
     console_log(
         f"[bold]Exported [blue]{row_count:,}[/blue] rows to [green]{filename}[/green][/bold]"
@@ -1069,10 +898,270 @@ def export_compliance_csv_summary(
     )
 
 
+# -- Xlsx Export
+
+
+def export_compliance_xlsx(
+    devices: List[Dict[str, Any]],
+    analysis: Dict[str, Any],
+    latest_versions: Dict[str, str | None],
+    compliance_baseline: Dict[str, Any],
+    filename: str = "desktop-app-compliance.xlsx",
+):
+    """
+    one workbook » Summary sheet (same sections as the summary CSV) + Devices sheet
+    (same rows as the full CSV). write-only mode streams rows to disk as they're
+    appended, so memory stays flat on 100k-device tenants
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    console_log(f"[cyan]Exporting compliance workbook to XLSX: {filename}[/cyan]")
+
+    workbook = Workbook(write_only=True)
+    bold = Font(bold=True)
+
+    def _styled(sheet, value, *, font=None, number_format=None):
+        cell = WriteOnlyCell(sheet, value=value)
+        if font is not None:
+            cell.font = font
+        if number_format is not None:
+            cell.number_format = number_format
+        return cell
+
+    # summary sheet
+    summary = workbook.create_sheet("Summary")
+    for column, width in zip("ABCDE", (30, 14, 16, 12, 18)):
+        summary.column_dimensions[column].width = width
+
+    for kind, cells in _summary_rows(analysis, compliance_baseline):
+        if kind == "group":
+            _, count, device_version, pct_platform, status = cells
+            summary.append(
+                [
+                    "",
+                    _styled(summary, count, number_format="#,##0"),
+                    device_version,
+                    _styled(summary, pct_platform / 100, number_format="0.0%"),
+                    status,
+                ]
+            )
+        elif kind in ("section", "header", "platform"):
+            summary.append([_styled(summary, value, font=bold) for value in cells])
+        else:
+            summary.append(cells)
+
+    # devices sheet » header comes from the first row, like the full CSV
+    details = workbook.create_sheet("Devices")
+    details.freeze_panes = "A2"
+    row_count = 0
+    for device in devices:
+        row = _full_detail_row(
+            evaluate_device_compliance(device, latest_versions, compliance_baseline)
+        )
+        if row_count == 0:
+            details.append([_styled(details, key, font=bold) for key in row])
+        details.append(list(row.values()))
+        row_count += 1
+
+    workbook.save(filename)
+
+    console_log(
+        f"[bold]Exported [blue]{row_count:,}[/blue] devices + summary to [green]{filename}[/green][/bold]"
+    )
+    console_log("[dim]XLSX sheets: Summary, Devices[/dim]")
+
+
 # -- called from cli.py
 
 
-def check_compliance():
+def _prompt_and_confirm_baseline(
+    devices: List[Dict[str, Any]], unique_policies: Dict[str, List[Dict]]
+) -> Dict[str, Any] | None:
+    # loop to allow user to change baseline selection
+    with phase_profiler.phase("baseline prompt (waiting on input)"):
+        while True:
+            compliance_baseline = prompt_compliance_target(unique_policies)
+            console.print()
+
+            if not compliance_baseline:
+                console_log("[yellow]Returning to main menu[/yellow]\n")
+                return None
+            console.print()
+
+            # preivew filtering to show accurate device count
+            preview_devices = filter_devices_by_baseline(
+                devices, compliance_baseline, silent=True
+            )
+            baseline_layer = compliance_baseline.get("layer")
+
+            # conf step
+            baseline_display = compliance_baseline.get("display", "Unknown")
+            device_count = len(preview_devices)
+            total_count = len(devices)
+
+            # diff messages for filtered vs unfiltered
+            if baseline_layer in ["site", "user_group"] and device_count < total_count:
+                device_msg = f"[cyan]Devices in {baseline_layer}s:[/cyan] [bold]{device_count:,}[/bold] of {total_count:,} total"
+            else:
+                device_msg = (
+                    f"[cyan]Devices to Analyze:[/cyan] [bold]{device_count:,}[/bold]"
+                )
+
+            console.print(
+                Panel(
+                    Text.from_markup(
+                        f"[cyan]Compliance Baseline:[/cyan][bold] {baseline_display}[/bold]\n"
+                        f"{device_msg}"
+                    ),
+                    title="[yellow]Confirm Analysis[/yellow]",
+                    border_style="yellow",
+                )
+            )
+            console.print()
+
+            confirm = ask_str(
+                "Proceed with analysis?",
+                default="y",
+                explain="y=yes, n=change baseline, q=cancel & exit",
+            ).lower()
+            console.print()
+
+            if confirm in ["y", "yes", ""]:
+                return compliance_baseline
+            elif confirm in ["n", "no"]:
+                continue
+            elif confirm in ["q", "quit"]:
+                console_log("[yellow]Compliance check cancelled[/yellow]")
+                return None
+            else:
+                console.print()
+                console_log(
+                    "[red]Invalid choice.[bold] Please enter y, n, or q[/bold][/red]"
+                )
+                console.print()
+                continue
+
+
+def _ask_another_baseline() -> bool:
+    console.print()
+    answer = ask_str(
+        "Check another baseline?",
+        default="n",
+        explain="y=pick another baseline (reuses this crawl), n=finish",
+    ).lower()
+    console.print()
+    return answer in ["y", "yes"]
+
+
+def _analysis_workers_from_env() -> int:
+    raw = os.getenv(ANALYSIS_WORKERS_ENV, "").strip().lower()
+    if not raw:
+        return 1
+    if raw == "auto":
+        return os.cpu_count() or 1
+    try:
+        return max(int(raw), 1)
+    except ValueError:
+        console_log(
+            f"{ANALYSIS_WORKERS_ENV}={raw!r} isn't a number or 'auto' » analyzing serially",
+            style="yellow",
+        )
+        return 1
+
+
+def _report_on_baseline(
+    devices: List[Dict[str, Any]],
+    latest_versions: Dict[str, str | None],
+    compliance_baseline: Dict[str, Any],
+    columnar: str | None = None,
+    freeze_gc: bool = False,
+    analysis_workers: int = 1,
+) -> bool:
+    """filter, analyze, report and export one baseline. False when no device is in scope"""
+    # step 4: Filter devices based on baseline selection
+    with phase_profiler.phase("baseline filtering"):
+        filtered_devices = filter_devices_by_baseline(devices, compliance_baseline)
+
+    if not filtered_devices:
+        console_log(
+            "[yellow]No devices found for selected baseline. This may indicate:[/yellow]"
+        )
+        console_log("[yellow]  • No devices are members of this site/group[/yellow]")
+        console_log("[yellow]  • All devices were filtered out[/yellow]")
+        return False
+
+    console.print()
+
+    # step 5: Analyze and group devices
+    with phase_profiler.phase("analysis"), (
+        frozen_heap() if freeze_gc else nullcontext()
+    ):
+        analysis = analyze_and_group_devices(
+            filtered_devices,
+            latest_versions,
+            compliance_baseline=compliance_baseline,
+            workers=analysis_workers,
+        )
+    console.print()
+
+    # step 6: display aggregated report
+    with phase_profiler.phase("report rendering"):
+        display_aggregated_compliance_report(
+            analysis, compliance_baseline, latest_versions
+        )
+
+    # step 7: export full .csv
+    with phase_profiler.phase("export full csv"):
+        export_compliance_csv_full_details(
+            filtered_devices, latest_versions, compliance_baseline
+        )
+    console.print()
+
+    # step 7b: typed per-device export for BI pipelines (optional, needs pyarrow)
+    if columnar:
+        with phase_profiler.phase(f"export {columnar}"):
+            columnar_export.export_compliance_columnar(
+                filtered_devices, latest_versions, compliance_baseline, fmt=columnar
+            )
+        console.print()
+
+    # step 8: export summary .csv
+    with phase_profiler.phase("export summary csv"):
+        export_compliance_csv_summary(analysis, compliance_baseline)
+    console.print()
+
+    # step 9: both reports in one workbook (Summary + Devices sheets)
+    with phase_profiler.phase("export xlsx workbook"):
+        export_compliance_xlsx(
+            filtered_devices, analysis, latest_versions, compliance_baseline
+        )
+    console.print()
+
+    # step 10: save this run + drift vs the previous run of the same baseline
+    with phase_profiler.phase("snapshot + drift"):
+        compliance_snapshots.record_and_diff(
+            filtered_devices, latest_versions, compliance_baseline
+        )
+    console.print()
+
+    # step 11: daily rollups for trend queries (compliance-trend)
+    with phase_profiler.phase("history rollup"):
+        compliance_history.record_and_display(analysis, compliance_baseline)
+    console.print()
+    return True
+
+
+def _run_compliance_check(
+    baseline_layer: str | None = None,
+    baseline_policy: str | None = None,
+    columnar: str | None = None,
+    freeze_gc: bool = False,
+    analysis_workers: int = 1,
+) -> bool:
+    # baseline_layer set » headless run: baseline from flags, no prompts
+    interactive = baseline_layer is None
     console_log("[bold]Starting Desktop App Compliance Check[/bold]")
     console.print()
 
@@ -1080,8 +1169,9 @@ def check_compliance():
     tenant_id = auth.TENANT_ID
     if not tenant_id:
         console_log("[red]Error: TENANT_ID not found in .env [/red]")
-        menu_return()
-        return
+        if interactive:
+            menu_return()
+        return False
 
     console_log(f"Tenant ID: [bold]{tenant_id}[/bold]")
     console.print()
@@ -1089,35 +1179,41 @@ def check_compliance():
     # step 1: fetch latest CDN versions for both platforms
     catalog_ids = list(PLATFORM_CATALOG_MAP.values())
     labels = {value: key for key, value in PLATFORM_CATALOG_MAP.items()}
-    latest_versions = fetch_multiple_latest_versions(catalog_ids, labels)
+    with phase_profiler.phase("latest version fetch"):
+        latest_versions = fetch_multiple_latest_versions(catalog_ids, labels)
     console.print()
 
     # step 2: fetch devices
-    devices = fetch_devices_by_model(
-        tenant_id, "Desktop App", log_prefix="Desktop App devices"
-    )
+    with phase_profiler.phase("inventory paging"):
+        devices = fetch_devices_by_model(
+            tenant_id, "Desktop App", log_prefix="Desktop App devices"
+        )
     if not devices:
         console_log("[yellow]No Desktop App devices found [/yellow]")
-        menu_return()
-        return
+        if interactive:
+            menu_return()
+        return False
     console.print()
 
     # step 3: fetch policy attribution for each device
     # Uses batching (25 devices per query) + concurrent workers to optimize performance
 
-    _, failed = fetch_policy_attributions_concurrent(devices)
+    with phase_profiler.phase("policy attribution"):
+        _, failed = fetch_policy_attributions_concurrent(devices)
 
     if failed > len(devices) * 0.5:
         console_log(
             f"[red]Too many failures. Check API connectivity and rate limits[/red]"
         )
-        menu_return()
-        return
+        if interactive:
+            menu_return()
+        return False
     console.print()
 
     # extract unique policies and prompt for baseline
     console_log("[bold]Analyzing policy landscape...[/bold]")
-    unique_policies = extract_unique_policies(devices)
+    with phase_profiler.phase("extract unique policies"):
+        unique_policies = extract_unique_policies(devices)
 
     total_policies = sum(len(policies) for policies in unique_policies.values())
     if total_policies == 0:
@@ -1125,104 +1221,86 @@ def check_compliance():
             "[yellow]No Desktop App policies found in this tenant [/yellow]"
             "[yellow]Devices are unmanaged → no compliance baseline available [/yellow]"
         )
-        menu_return()
-        return
+        if interactive:
+            menu_return()
+        return False
 
-    # loop to allow user to change baseline selection
-    while True:
-        compliance_baseline = prompt_compliance_target(unique_policies)
-        console.print()
-
-        if not compliance_baseline:
-            console_log("[yellow]Returning to main menu[/yellow]\n")
-            return
-        console.print()
-
-        # preivew filtering to show accurate device count
-        preview_devices = filter_devices_by_baseline(
-            devices, compliance_baseline, silent=True
+    if not interactive:
+        compliance_baseline = resolve_compliance_baseline(
+            unique_policies, baseline_layer, baseline_policy
         )
-        baseline_layer = compliance_baseline.get("layer")
-
-        # conf step
-        baseline_display = compliance_baseline.get("display", "Unknown")
-        device_count = len(preview_devices)
-        total_count = len(devices)
-
-        # diff messages for filtered vs unfiltered
-        if baseline_layer in ["site", "user_group"] and device_count < total_count:
-            device_msg = f"[cyan]Devices in {baseline_layer}s:[/cyan] [bold]{device_count:,}[/bold] of {total_count:,} total"
-        else:
-            device_msg = (
-                f"[cyan]Devices to Analyze:[/cyan] [bold]{device_count:,}[/bold]"
-            )
+        console_log(
+            f"Compliance Baseline: [bold]{compliance_baseline.get('display')}[/bold]"
+        )
+    else:
+        compliance_baseline = _prompt_and_confirm_baseline(devices, unique_policies)
+        if not compliance_baseline:
+            return False
 
-        console.print(
-            Panel(
-                Text.from_markup(
-                    f"[cyan]Compliance Baseline:[/cyan][bold] {baseline_display}[/bold]\n"
-                    f"{device_msg}"
-                ),
-                title="[yellow]Confirm Analysis[/yellow]",
-                border_style="yellow",
+    # steps 4-11 » interactive runs can then try other baselines on the same crawl.
+    # per-device facts are cached on the devices, so only baseline columns are redone
+    completed = False
+    while True:
+        completed = (
+            _report_on_baseline(
+                devices,
+                latest_versions,
+                compliance_baseline,
+                columnar,
+                freeze_gc,
+                analysis_workers,
             )
+            or completed
         )
-        console.print()
-
-        confirm = ask_str(
-            "Proceed with analysis?",
-            default="y",
-            explain="y=yes, n=change baseline, q=cancel & exit",
-        ).lower()
-        console.print()
-
-        if confirm in ["y", "yes", ""]:
+        if not interactive or not _ask_another_baseline():
+            break
+        compliance_baseline = _prompt_and_confirm_baseline(devices, unique_policies)
+        if not compliance_baseline:
             break
-        elif confirm in ["n", "no"]:
-            continue
-        elif confirm in ["q", "quit"]:
-            console_log("[yellow]Compliance check cancelled[/yellow]")
-            return
-        else:
-            console.print()
-            console_log(
-                "[red]Invalid choice.[bold] Please enter y, n, or q[/bold][/red]"
-            )
-            console.print()
-            continue
-
-    # step 4: Filter devices based on baseline selection
-    filtered_devices = filter_devices_by_baseline(devices, compliance_baseline)
 
-    if not filtered_devices:
-        console_log(
-            "[yellow]No devices found for selected baseline. This may indicate:[/yellow]"
-        )
-        console_log("[yellow]  • No devices are members of this site/group[/yellow]")
-        console_log("[yellow]  • All devices were filtered out[/yellow]")
+    if completed:
+        console_log("[bold]Compliance check complete[/bold]")
+    if interactive:
         menu_return()
-        return
-
-    console.print()
-
-    # step 5: Analyze and group devices
-    analysis = analyze_and_group_devices(
-        filtered_devices, latest_versions, compliance_baseline=compliance_baseline
-    )
-    console.print()
-
-    # step 6: display aggregated report
-    display_aggregated_compliance_report(analysis, compliance_baseline, latest_versions)
-
-    # step 7: export full .csv
-    export_compliance_csv_full_details(
-        filtered_devices, latest_versions, compliance_baseline
+    return completed
+
+
+def check_compliance(
+    *,
+    profile: bool = False,
+    pstats_path: str | None = None,
+    baseline_layer: str | None = None,
+    baseline_policy: str | None = None,
+    columnar: str | None = None,
+    freeze_gc: bool = False,
+    analysis_workers: int | None = None,
+) -> bool:
+    """
+    interactive by default. passing baseline_layer runs headless (no prompts)
+    and raises BaselineNotFoundError when the flags don't match a policy.
+    columnar="parquet"|"arrow" also writes the typed per-device export
+    (defaults to LENSCTL_COLUMNAR_EXPORT).
+    freeze_gc=True keeps the GC off the crawled devices during analysis (or LENSCTL_FREEZE_GC=1)
+    analysis_workers=N shards the analysis over N processes (or LENSCTL_ANALYSIS_WORKERS=N|auto)
+    returns True once the CSVs and workbook are written
+    """
+    columnar = columnar or columnar_export.format_from_env()
+    freeze_gc = freeze_gc or os.getenv(FREEZE_GC_ENV, "").strip().lower() in (
+        "1",
+        "true",
+        "yes",
     )
-    console.print()
-
-    # step 8: export summary .csv
-    export_compliance_csv_summary(analysis, compliance_baseline)
-    console.print()
-
-    console_log("[bold]Compliance check complete[/bold]")
-    menu_return()
+    policy_names.clear()  # display names are memoized per run
+    # --profile » per-phase wall/CPU/memory report before the final prompt
+    if profile or pstats_path:
+        phase_profiler.start("check_compliance", pstats_path=pstats_path)
+    try:
+        return _run_compliance_check(
+            baseline_layer,
+            baseline_policy,
+            columnar,
+            freeze_gc,
+            analysis_workers or _analysis_workers_from_env(),
+        )
+    finally:
+        phase_profiler.finish()  # no-op once menu_return() has printed it
@@ -0,0 +1,466 @@
+"""Per-run compliance snapshots under .snapshots/<baseline>/ and the drift between
+two runs of the same baseline, diffed by device id."""
+
+import os
+import csv
+import gzip
+import re
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+from rich.panel import Panel
+from rich.table import Table
+
+import utils.fast_json as fast_json
+from utils.env_helper import console, console_log, logger
+from utils import policy_names
+from utils.compliance_analysis import evaluate_device_compliance
+
+# -- GLOBALS
+
+SNAPSHOT_DIR = os.getenv("LENSCTL_SNAPSHOT_DIR", ".snapshots")
+SNAPSHOT_KEEP_ENV = "LENSCTL_SNAPSHOT_KEEP"
+SNAPSHOT_KEEP = 30  # runs kept per baseline, oldest pruned first
+SNAPSHOT_VERSION = 1
+DRIFT_CSV = "desktop-app-compliance-drift.csv"
+
+COMPLIANT = "Compliant"
+OVERRIDE = "Policy Override"
+NON_COMPLIANT = "Non-Compliant"
+
+
+# -- PRIVATE HELPERS » NO TOUCHY!
+
+
+def _status(result: Dict[str, Any]) -> str:
+    if result["compliant_with_baseline"]:
+        return COMPLIANT
+    if result["policy_override"]:
+        return OVERRIDE
+    return NON_COMPLIANT
+
+
+def _version_key(version: str | None) -> Tuple[int, ...] | None:
+    try:
+        return tuple(int(part) for part in (version or "").split("."))
+    except ValueError:
+        return None
+
+
+def _version_move(old: str, new: str) -> str:
+    old_key, new_key = _version_key(old), _version_key(new)
+    if old_key is None or new_key is None or old_key == new_key:
+        return "changed"  # unparseable, or only the spelling differs
+    return "upgrade" if new_key > old_key else "downgrade"
+
+
+def _policy_label(record: Dict[str, Any]) -> str:
+    policy_type, name = record["controlling_type"], record["controlling_name"]
+    return (
+        f"{policy_type}: {policy_names.display_name(policy_type, name, fallback=name)}"
+    )
+
+
+def _tally(devices: List[Dict[str, Any]]) -> Dict[Tuple[str, str], List[int]]:
+    # (controlling policy, platform) → [devices, compliant]
+    tally: Dict[Tuple[str, str], List[int]] = {}
+    for record in devices:
+        counts = tally.setdefault((_policy_label(record), record["platform"]), [0, 0])
+        counts[0] += 1
+        counts[1] += record["status"] == COMPLIANT
+    return tally
+
+
+def _pct(compliant: int, total: int) -> float:
+    return compliant / total * 100 if total else 0.0
+
+
+def _snapshot_keep() -> int:
+    raw = os.getenv(SNAPSHOT_KEEP_ENV, "").strip()
+    if not raw:
+        return SNAPSHOT_KEEP
+    try:
+        keep = int(raw)
+    except ValueError:
+        console_log(
+            f"{SNAPSHOT_KEEP_ENV}={raw!r} isn't a number » keeping {SNAPSHOT_KEEP} runs",
+            style="yellow",
+        )
+        return SNAPSHOT_KEEP
+    if keep <= 0:
+        console_log(
+            f"{SNAPSHOT_KEEP_ENV}={keep} would prune every run » keeping 1",
+            style="yellow",
+        )
+    return max(keep, 1)
+
+
+def _run_label(meta: Dict[str, Any]) -> str:
+    # run_ts keeps microseconds for the file name » the panel only needs seconds
+    return datetime.fromisoformat(meta["run_ts"]).isoformat(timespec="seconds")
+
+
+# -- PUBLIC FUNCTIONS
+
+
+def baseline_key(compliance_baseline: Dict[str, Any]) -> str:
+    """directory name for a baseline » runs are only diffed against the same one"""
+    layer = compliance_baseline.get("layer") or "unknown"
+    if compliance_baseline.get("all_policies"):
+        return f"{layer}-all"
+    policy_id = (compliance_baseline.get("policy") or {}).get("id") or "unknown"
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", f"{layer}-{policy_id}")
+
+
+def build_snapshot(
+    devices: List[Dict[str, Any]],
+    latest_versions: Dict[str, str | None],
+    compliance_baseline: Dict[str, Any],
+    run_ts: datetime | None = None,
+) -> Dict[str, Any]:
+    run_ts = run_ts or datetime.now(timezone.utc)
+    records = []
+    for device in devices:
+        result = evaluate_device_compliance(
+            device, latest_versions, compliance_baseline
+        )
+        records.append(
+            {
+                "id": result["device_id"],
+                "name": result["device_name"],
+                "platform": result["platform"],
+                "version": result["software_version"],
+                "status": _status(result),
+                "controlling_type": result["controlling_type"],
+                "controlling_id": result["controlling_id"],
+                "controlling_name": result["controlling_name"],
+                "baseline_version": result["baseline_version"],
+            }
+        )
+    return {
+        "meta": {
+            "version": SNAPSHOT_VERSION,
+            "run_ts": run_ts.isoformat(timespec="microseconds"),
+            "baseline": compliance_baseline.get("display", "Unknown"),
+            "baseline_key": baseline_key(compliance_baseline),
+            "device_count": len(records),
+        },
+        "devices": records,
+    }
+
+
+def save_snapshot(snapshot: Dict[str, Any], directory: str = SNAPSHOT_DIR) -> str:
+    folder = os.path.join(directory, snapshot["meta"]["baseline_key"])
+    os.makedirs(folder, exist_ok=True)
+    # sub-second stamp » two runs in the same second don't overwrite each other
+    stamp = datetime.fromisoformat(snapshot["meta"]["run_ts"]).strftime(
+        "%Y%m%dT%H%M%S.%fZ"
+    )
+    path = os.path.join(folder, f"{stamp}.json.gz")
+    # write + rename » a crash mid-write never leaves a truncated snapshot behind
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wb", compresslevel=5) as f:
+        f.write(fast_json.dumps(snapshot))
+    os.replace(tmp_path, path)
+
+    # retention » oldest runs go first
+    for stale in list_snapshots(folder)[: -_snapshot_keep()]:
+        try:
+            os.remove(stale)
+        except OSError as err:
+            logger.warning(f"Couldn't prune snapshot {stale}: {err}")
+    return path
+
+
+def load_snapshot(path: str) -> Dict[str, Any]:
+    with gzip.open(path, "rb") as f:
+        return fast_json.loads(f.read())
+
+
+def list_snapshots(folder: str) -> List[str]:
+    """snapshot paths in a baseline folder, oldest first (names sort by run time)"""
+    if not os.path.isdir(folder):
+        return []
+    return sorted(
+        os.path.join(folder, name)
+        for name in os.listdir(folder)
+        if name.endswith(".json.gz")
+    )
+
+
+def latest_snapshot_path(
+    compliance_baseline: Dict[str, Any], directory: str = SNAPSHOT_DIR
+) -> str | None:
+    paths = list_snapshots(os.path.join(directory, baseline_key(compliance_baseline)))
+    return paths[-1] if paths else None
+
+
+def latest_pair(directory: str = SNAPSHOT_DIR) -> Tuple[str, str] | None:
+    """the two newest runs of the most recently checked baseline » (older, newer)"""
+    if not os.path.isdir(directory):
+        return None
+    newest: Tuple[str, List[str]] | None = None
+    for name in os.listdir(directory):
+        paths = list_snapshots(os.path.join(directory, name))
+        if len(paths) < 2:
+            continue
+        stamp = os.path.basename(paths[-1])
+        if newest is None or stamp > newest[0]:
+            newest = (stamp, paths)
+    return (newest[1][-2], newest[1][-1]) if newest else None
+
+
+def diff_snapshots(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """one pass over each snapshot, keyed by device id"""
+    old_by_id = {record["id"]: record for record in old["devices"]}
+    seen = set()
+
+    transitions: Counter = Counter()  # (old status, new status) → devices
+    version_moves: Counter = Counter()  # upgrade / downgrade / changed
+    policy_switches = 0
+    changes: List[Dict[str, Any]] = []
+    added: List[Dict[str, Any]] = []
+
+    for record in new["devices"]:
+        device_id = record["id"]
+        before = old_by_id.get(device_id)
+        if before is None:
+            added.append(record)
+            continue
+        seen.add(device_id)
+
+        kinds = []
+        if before["status"] != record["status"]:
+            transitions[(before["status"], record["status"])] += 1
+            kinds.append("status")
+        if before["version"] != record["version"]:
+            move = _version_move(before["version"], record["version"])
+            version_moves[move] += 1
+            kinds.append(move)
+        if before["controlling_id"] != record["controlling_id"]:
+            policy_switches += 1
+            kinds.append("policy")
+        if kinds:
+            changes.append({"change": kinds, "before": before, "after": record})
+
+    removed = [record for record in old["devices"] if record["id"] not in seen]
+
+    # compliant/total per controlling policy + platform, both runs
+    old_tally, new_tally = _tally(old["devices"]), _tally(new["devices"])
+    deltas = []
+    for key in old_tally.keys() | new_tally.keys():
+        old_total, old_compliant = old_tally.get(key, (0, 0))
+        new_total, new_compliant = new_tally.get(key, (0, 0))
+        if (old_total, old_compliant) == (new_total, new_compliant):
+            continue
+        deltas.append(
+            {
+                "policy": key[0],
+                "platform": key[1],
+                "devices_before": old_total,
+                "devices_after": new_total,
+                "compliant_before": old_compliant,
+                "compliant_after": new_compliant,
+                "pct_delta": _pct(new_compliant, new_total)
+                - _pct(old_compliant, old_total),
+            }
+        )
+    # biggest compliance swings first, then biggest population changes
+    deltas.sort(
+        key=lambda d: (
+            -abs(d["compliant_after"] - d["compliant_before"]),
+            -abs(d["devices_after"] - d["devices_before"]),
+            d["policy"],
+            d["platform"],
+        )
+    )
+
+    old_compliant = sum(r["status"] == COMPLIANT for r in old["devices"])
+    new_compliant = sum(r["status"] == COMPLIANT for r in new["devices"])
+    return {
+        "old_meta": old["meta"],
+        "new_meta": new["meta"],
+        "compliance_before": _pct(old_compliant, len(old["devices"])),
+        "compliance_after": _pct(new_compliant, len(new["devices"])),
+        "transitions": transitions,
+        "version_moves": version_moves,
+        "policy_switches": policy_switches,
+        "added": added,
+        "removed": removed,
+        "changes": changes,
+        "deltas": deltas,
+    }
+
+
+def display_drift(diff: Dict[str, Any], *, top: int = 15) -> None:
+    old_meta, new_meta = diff["old_meta"], diff["new_meta"]
+    before, after = diff["compliance_before"], diff["compliance_after"]
+    delta = after - before
+    delta_style = "green" if delta > 0 else "red" if delta < 0 else "dim"
+    moves = diff["version_moves"]
+
+    summary = Table.grid(padding=(0, 2))
+    summary.add_column(style="cyan")
+    summary.add_column()
+    summary.add_row(
+        "Previous run", f"{_run_label(old_meta)} ({old_meta['device_count']:,} devices)"
+    )
+    summary.add_row(
+        "This run", f"{_run_label(new_meta)} ({new_meta['device_count']:,} devices)"
+    )
+    summary.add_row(
+        "Compliance",
+        f"{before:.1f}% → {after:.1f}% [{delta_style}]({delta:+.1f} pts)[/{delta_style}]",
+    )
+    summary.add_row(
+        "Devices",
+        f"[green]+{len(diff['added']):,} new[/green]  [red]-{len(diff['removed']):,} removed[/red]",
+    )
+    summary.add_row(
+        "Versions",
+        f"{moves['upgrade']:,} upgraded  {moves['downgrade']:,} downgraded"
+        + (f"  {moves['changed']:,} changed" if moves["changed"] else ""),
+    )
+    summary.add_row("Policy switches", f"{diff['policy_switches']:,}")
+    console.print(
+        Panel(
+            summary,
+            title=f"Compliance drift » {new_meta['baseline']}",
+            border_style="cyan",
+            padding=(1, 2),
+        )
+    )
+
+    if diff["transitions"]:
+        table = Table(
+            title="Status transitions", title_justify="left", header_style="bold"
+        )
+        table.add_column("From")
+        table.add_column("To")
+        table.add_column("Devices", justify="right")
+        for (old_status, new_status), count in diff["transitions"].most_common():
+            style = (
+                "green"
+                if new_status == COMPLIANT
+                else "red" if old_status == COMPLIANT else "yellow"
+            )
+            table.add_row(old_status, f"[{style}]{new_status}[/{style}]", f"{count:,}")
+        console.print(table)
+
+    if diff["deltas"]:
+        table = Table(
+            title=f"Largest changes by controlling policy + platform (top {top})",
+            title_justify="left",
+            header_style="bold",
+        )
+        table.add_column("Policy", overflow="fold")
+        table.add_column("Platform")
+        table.add_column("Devices", justify="right")
+        table.add_column("Compliant", justify="right")
+        table.add_column("Δ %", justify="right")
+        for row in diff["deltas"][:top]:
+            pct = row["pct_delta"]
+            pct_style = "green" if pct > 0 else "red" if pct < 0 else "dim"
+            table.add_row(
+                row["policy"],
+                row["platform"].replace("Desktop App ", ""),
+                f"{row['devices_before']:,} → {row['devices_after']:,}",
+                f"{row['compliant_before']:,} → {row['compliant_after']:,}",
+                f"[{pct_style}]{pct:+.1f}[/{pct_style}]",
+            )
+        console.print(table)
+    console.print()
+
+
+def export_drift_csv(diff: Dict[str, Any], filename: str = DRIFT_CSV) -> int:
+    """one row per changed, new or removed device. returns the row count"""
+    columns = [
+        "Device ID",
+        "Device Name",
+        "Platform",
+        "Change",
+        "Status Before",
+        "Status After",
+        "Version Before",
+        "Version After",
+        "Controlling Policy Before",
+        "Controlling Policy After",
+    ]
+    row_count = 0
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for change in diff["changes"]:
+            before, after = change["before"], change["after"]
+            writer.writerow(
+                [
+                    after["id"],
+                    after["name"],
+                    after["platform"],
+                    " + ".join(change["change"]),
+                    before["status"],
+                    after["status"],
+                    before["version"],
+                    after["version"],
+                    _policy_label(before),
+                    _policy_label(after),
+                ]
+            )
+            row_count += 1
+        for kind, records in (("new", diff["added"]), ("removed", diff["removed"])):
+            for record in records:
+                is_new = kind == "new"
+                writer.writerow(
+                    [
+                        record["id"],
+                        record["name"],
+                        record["platform"],
+                        kind,
+                        "" if is_new else record["status"],
+                        record["status"] if is_new else "",
+                        "" if is_new else record["version"],
+                        record["version"] if is_new else "",
+                        "" if is_new else _policy_label(record),
+                        _policy_label(record) if is_new else "",
+                    ]
+                )
+                row_count += 1
+
+    console_log(
+        f"[bold]Exported [blue]{row_count:,}[/blue] drifted devices to [green]{filename}[/green][/bold]"
+    )
+    return row_count
+
+
+def record_and_diff(
+    devices: List[Dict[str, Any]],
+    latest_versions: Dict[str, str | None],
+    compliance_baseline: Dict[str, Any],
+) -> Dict[str, Any] | None:
+    """save this run's snapshot and diff it against the previous run of the same baseline"""
+    # read the previous run before saving » retention may prune it
+    previous = None
+    previous_path = latest_snapshot_path(compliance_baseline)
+    if previous_path is not None:
+        try:
+            previous = load_snapshot(previous_path)
+        except (OSError, ValueError) as err:
+            logger.warning(f"Couldn't read previous snapshot {previous_path}: {err}")
+    snapshot = build_snapshot(devices, latest_versions, compliance_baseline)
+    path = save_snapshot(snapshot)
+    console_log(f"[dim]Compliance snapshot saved » {path}[/dim]")
+
+    if previous_path is None:
+        console_log(
+            "[dim]No earlier snapshot for this baseline » drift is reported from the next run[/dim]"
+        )
+        return None
+    if previous is None:
+        return None
+
+    diff = diff_snapshots(previous, snapshot)
+    console.print()
+    display_drift(diff)
+    export_drift_csv(diff)
+    return diff
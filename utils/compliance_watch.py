@@ -0,0 +1,455 @@
+"""Watch mode » re-evaluate one baseline on an interval without re-crawling the tenant.
+Policy stacks are only refetched for devices whose policies may have changed."""
+
+import os
+import gzip
+import math
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+import utils.fast_json as fast_json
+from utils import auth
+from utils import gql_metrics
+from utils import policy_names
+from utils import compliance_history, compliance_snapshots
+from utils.env_helper import console, console_log, logger
+from utils.device_ops import (
+    fetch_devices_by_model,
+    fetch_multiple_latest_versions,
+    fetch_policy_attributions_concurrent,
+)
+from utils.compliance_analysis import (
+    FACTS_KEY,
+    extract_unique_policies,
+    analyze_and_group_devices,
+)
+from utils.compliance_ops import (
+    PLATFORM_CATALOG_MAP,
+    BaselineNotFoundError,
+    resolve_compliance_baseline,
+    filter_devices_by_baseline,
+    export_compliance_csv_summary,
+)
+
+# -- GLOBALS
+
+DEFAULT_INTERVAL_S = 3600
+DEFAULT_REFRESH_CYCLES = 24  # hourly cycles » every stack refreshed once a day
+# an inventory this much smaller than the last one is treated as a failed crawl
+MAX_REMOVED_SHARE = 0.2
+SHARED_LAYERS = ("model", "site", "user_group")
+
+
+# -- PRIVATE HELPERS » NO TOUCHY!
+
+
+def _state_path(tenant_id: str) -> str:
+    return os.getenv("LENSCTL_WATCH_STATE") or os.path.join(
+        compliance_snapshots.SNAPSHOT_DIR, f"watch-{tenant_id}.json.gz"
+    )
+
+
+def _empty_state(tenant_id: str) -> Dict[str, Any]:
+    return {
+        "tenant_id": tenant_id,
+        "cycle": 0,
+        "devices": {},  # id → device dict incl. policy_attribution, inventory order
+        "fetched": {},  # id → cycle its policy stack was last fetched
+        "latest_versions": {},
+    }
+
+
+def _pack_attribution(
+    attribution: Dict[str, Any] | None, layers: Dict[str, Any]
+) -> Dict[str, Any] | None:
+    # shared layers are stored once in `layers` and referenced by id
+    if not attribution:
+        return None
+    controlling = attribution.get("controlling_layer")
+    packed_layers = []
+    controlling_index = None
+    for index, layer in enumerate(attribution.get("all_layers", [])):
+        if layer is controlling:
+            controlling_index = index
+        layer_id = layer.get("id")
+        if layer.get("type") in SHARED_LAYERS and layers.get(layer_id, layer) == layer:
+            layers[layer_id] = layer
+            packed_layers.append({"ref": layer_id})
+        else:
+            packed_layers.append(layer)
+    return {
+        "effective": attribution.get("effective"),
+        "controlling": controlling_index,
+        "all_layers": packed_layers,
+        "account_policy": attribution.get("account_policy"),
+    }
+
+
+def _unpack_attribution(
+    packed: Dict[str, Any] | None, layers: Dict[str, Any]
+) -> Dict[str, Any] | None:
+    if not packed:
+        return None
+    all_layers = [
+        layers[layer["ref"]] if "ref" in layer else layer
+        for layer in packed["all_layers"]
+    ]
+    controlling_index = packed.get("controlling")
+    return {
+        "effective": packed.get("effective"),
+        "controlling_layer": (
+            all_layers[controlling_index] if controlling_index is not None else None
+        ),
+        "all_layers": all_layers,
+        "account_policy": packed.get("account_policy"),
+    }
+
+
+def _save_state(state: Dict[str, Any], path: str) -> None:
+    layers: Dict[str, Any] = {}
+    devices = []
+    for device in state["devices"].values():
+        packed = {key: value for key, value in device.items() if key != FACTS_KEY}
+        packed["policy_attribution"] = _pack_attribution(
+            device.get("policy_attribution"), layers
+        )
+        devices.append(packed)
+    payload = {
+        "tenant_id": state["tenant_id"],
+        "saved_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "cycle": state["cycle"],
+        "latest_versions": state["latest_versions"],
+        "fetched": state["fetched"],
+        "layers": layers,
+        "devices": devices,
+    }
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    # write + rename » a crash mid-write never leaves a truncated state behind
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wb", compresslevel=5) as f:
+        f.write(fast_json.dumps(payload))
+    os.replace(tmp_path, path)
+
+
+def _load_state(path: str, tenant_id: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return _empty_state(tenant_id)
+    try:
+        with gzip.open(path, "rb") as f:
+            payload = fast_json.loads(f.read())
+    except (OSError, ValueError) as err:
+        logger.warning(f"Couldn't read watch state {path}: {err}")
+        return _empty_state(tenant_id)
+    if payload.get("tenant_id") != tenant_id:
+        console_log(
+            f"[yellow]Watch state {path} belongs to another tenant » starting fresh[/yellow]"
+        )
+        return _empty_state(tenant_id)
+
+    layers = payload.get("layers", {})
+    devices = {}
+    for device in payload.get("devices", []):
+        device["policy_attribution"] = _unpack_attribution(
+            device.get("policy_attribution"), layers
+        )
+        devices[device["id"]] = device
+    return {
+        "tenant_id": tenant_id,
+        "cycle": payload.get("cycle", 0),
+        "devices": devices,
+        "fetched": payload.get("fetched", {}),
+        "latest_versions": payload.get("latest_versions", {}),
+    }
+
+
+def _shared_layers_by_id(devices: Dict[str, Any]) -> Dict[str, Tuple[Any, List[str]]]:
+    """shared layer id → (parsed layer, ids of the devices it applies to)"""
+    index: Dict[str, Tuple[Any, List[str]]] = {}
+    for device_id, device in devices.items():
+        attribution = device.get("policy_attribution") or {}
+        for layer in attribution.get("all_layers", []):
+            if layer.get("type") not in SHARED_LAYERS:
+                continue
+            entry = index.get(layer.get("id"))
+            if entry is None:
+                index[layer.get("id")] = (layer, [device_id])
+            else:
+                entry[1].append(device_id)
+    return index
+
+
+def _fetch_stacks(devices: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """fetch + parse on copies » a failed fetch keeps the device's previous attribution"""
+    if not devices:
+        return {}
+    copies = [dict(device) for device in devices]
+    fetch_policy_attributions_concurrent(copies)
+    return {
+        device["id"]: device["policy_attribution"]
+        for device in copies
+        if device.get("policy_attribution")
+    }
+
+
+def _edited_layers(
+    shared: Dict[str, Tuple[Any, List[str]]],
+    sentinels: Dict[str, str],
+    fetched: Dict[str, Dict[str, Any]],
+) -> set:
+    """shared layer ids whose parsed layer changed, or that left their sentinel's stack"""
+    edited = set()
+    fetched_ids: Dict[str, set] = {}
+    for device_id, attribution in fetched.items():
+        ids = fetched_ids.setdefault(device_id, set())
+        for layer in attribution.get("all_layers", []):
+            if layer.get("type") not in SHARED_LAYERS:
+                continue
+            ids.add(layer.get("id"))
+            known = shared.get(layer.get("id"))
+            if known is not None and known[0] != layer:
+                edited.add(layer.get("id"))
+    # deleted policy (or the sentinel moved) » recheck everyone still under it
+    for layer_id, sentinel_id in sentinels.items():
+        if sentinel_id in fetched_ids and layer_id not in fetched_ids[sentinel_id]:
+            edited.add(layer_id)
+    return edited
+
+
+def _run_cycle(
+    state: Dict[str, Any], tenant_id: str, refresh_cycles: int
+) -> Dict[str, Any] | None:
+    """
+    bring state up to date. returns what changed, or None when the inventory
+    looked incomplete and the cycle was skipped
+    """
+    state["cycle"] += 1
+    cycle = state["cycle"]
+    previous = state["devices"]
+
+    catalog_ids = list(PLATFORM_CATALOG_MAP.values())
+    labels = {value: key for key, value in PLATFORM_CATALOG_MAP.items()}
+    latest_versions = fetch_multiple_latest_versions(catalog_ids, labels)
+
+    inventory = fetch_devices_by_model(
+        tenant_id, "Desktop App", log_prefix="Desktop App devices", progress=False
+    )
+    if previous and len(inventory) < len(previous) * (1 - MAX_REMOVED_SHARE):
+        console_log(
+            f"[yellow]Inventory returned {len(inventory):,} of {len(previous):,} known devices "
+            "» treating it as a failed crawl, state left as-is[/yellow]"
+        )
+        return None
+
+    changes = {
+        "new": [],
+        "removed": [],
+        "version_changes": 0,
+        "platform_changes": 0,
+        "edited_policies": set(),
+        "stacks_fetched": 0,
+        "latest_changed": latest_versions != state["latest_versions"],
+    }
+
+    # step 1: diff the inventory against state » no stack fetch for version changes
+    devices: Dict[str, Dict[str, Any]] = {}
+    to_fetch: Dict[str, Dict[str, Any]] = {}
+    for node in inventory:
+        known = previous.get(node["id"])
+        if known is None:
+            changes["new"].append(node["id"])
+            node["policy_attribution"] = None
+            to_fetch[node["id"]] = node
+        else:
+            if node["softwareVersion"] != known.get("softwareVersion"):
+                changes["version_changes"] += 1
+            if node["hardwareProduct"] != known.get("hardwareProduct"):
+                changes["platform_changes"] += 1
+                to_fetch[node["id"]] = node
+            node["policy_attribution"] = known.get("policy_attribution")
+        devices[node["id"]] = node
+    changes["removed"] = [
+        device_id for device_id in previous if device_id not in devices
+    ]
+
+    # step 2: one sentinel per shared policy + the rolling slice of oldest stacks
+    shared = _shared_layers_by_id(devices)
+    sentinels = {}
+    for layer_id, (_, member_ids) in shared.items():
+        sentinel_id = next((m for m in member_ids if m in to_fetch), member_ids[0])
+        sentinels[layer_id] = sentinel_id
+        to_fetch.setdefault(sentinel_id, devices[sentinel_id])
+
+    if previous:
+        slice_size = math.ceil(len(devices) / max(refresh_cycles, 1))
+        oldest = sorted(
+            (device_id for device_id in devices if device_id not in to_fetch),
+            key=lambda device_id: state["fetched"].get(device_id, 0),
+        )
+        for device_id in oldest[:slice_size]:
+            to_fetch[device_id] = devices[device_id]
+
+    fetched = _fetch_stacks(list(to_fetch.values()))
+
+    # step 3: edited policies » refetch every other device under them
+    edited = _edited_layers(shared, sentinels, fetched)
+    if edited:
+        followup = {
+            device_id: devices[device_id]
+            for layer_id in edited
+            for device_id in shared.get(layer_id, (None, []))[1]
+            if device_id not in fetched
+        }
+        console_log(
+            f"[cyan]{len(edited)} policies changed » refetching {len(followup):,} devices under them[/cyan]"
+        )
+        fetched.update(_fetch_stacks(list(followup.values())))
+    changes["edited_policies"] = edited
+
+    attribution_changed = False
+    for device_id, attribution in fetched.items():
+        old = (previous.get(device_id) or {}).get("policy_attribution")
+        if old != attribution:
+            attribution_changed = True
+        devices[device_id]["policy_attribution"] = attribution
+        state["fetched"][device_id] = cycle
+    for device_id in changes["removed"]:
+        state["fetched"].pop(device_id, None)
+
+    changes["stacks_fetched"] = len(fetched)
+    changes["attribution_changed"] = attribution_changed
+    state["devices"] = devices
+    state["latest_versions"] = latest_versions
+    return changes
+
+
+def _has_changes(changes: Dict[str, Any]) -> bool:
+    return bool(
+        changes["new"]
+        or changes["removed"]
+        or changes["version_changes"]
+        or changes["platform_changes"]
+        or changes["attribution_changed"]
+        or changes["latest_changed"]
+    )
+
+
+def _query_cost() -> int:
+    return sum(stats["query_cost"] for stats in gql_metrics.snapshot().values())
+
+
+def _emit(
+    state: Dict[str, Any], baseline_layer: str, baseline_policy: str | None
+) -> bool:
+    """re-aggregate the in-memory devices and write the summary exports"""
+    devices = list(state["devices"].values())
+    unique_policies = extract_unique_policies(devices)
+    compliance_baseline = resolve_compliance_baseline(
+        unique_policies, baseline_layer, baseline_policy
+    )
+    filtered_devices = filter_devices_by_baseline(
+        devices, compliance_baseline, silent=True
+    )
+    if not filtered_devices:
+        console_log("[yellow]No devices found for the selected baseline[/yellow]")
+        return False
+
+    policy_names.clear()
+    analysis = analyze_and_group_devices(
+        filtered_devices, state["latest_versions"], compliance_baseline
+    )
+    total = analysis["total_devices"]
+    compliant = analysis["total_compliant_with_baseline"]
+    console_log(
+        f"[bold]{compliance_baseline.get('display')}: "
+        f"[blue]{compliant:,}/{total:,}[/blue] compliant ({compliant / total * 100:.1f}%)[/bold]"
+    )
+    export_compliance_csv_summary(analysis, compliance_baseline)
+    compliance_snapshots.record_and_diff(
+        filtered_devices, state["latest_versions"], compliance_baseline
+    )
+    compliance_history.record_run(analysis, compliance_baseline)
+    return True
+
+
+# -- PUBLIC FUNCTIONS
+
+
+def watch_compliance(
+    baseline_layer: str,
+    baseline_policy: str | None = None,
+    *,
+    interval_s: float = DEFAULT_INTERVAL_S,
+    cycles: int | None = None,
+    refresh_cycles: int = DEFAULT_REFRESH_CYCLES,
+) -> bool:
+    """
+    run until interrupted (or for `cycles` cycles). raises BaselineNotFoundError
+    when the first cycle can't resolve the baseline. returns True once every
+    cycle that had changes wrote its exports
+    """
+    tenant_id = auth.TENANT_ID
+    if not tenant_id:
+        console_log("[red]Error: TENANT_ID not found in .env [/red]")
+        return False
+
+    state_path = _state_path(tenant_id)
+    state = _load_state(state_path, tenant_id)
+    if state["devices"]:
+        console_log(
+            f"Resuming from [bold]{state_path}[/bold] » {len(state['devices']):,} devices, "
+            f"cycle {state['cycle']}"
+        )
+    else:
+        console_log("No watch state yet » first cycle is a full crawl")
+    console_log(
+        f"Watching [bold]{baseline_layer}[/bold] every {interval_s / 60:g} min, "
+        f"each stack refreshed at least every {refresh_cycles} cycles"
+    )
+    console.print()
+
+    ok = True
+    emitted = False
+    completed = 0
+    while cycles is None or completed < cycles:
+        started = time.monotonic()
+        cost_before = _query_cost()
+        console_log(f"[bold]Watch cycle {state['cycle'] + 1}[/bold]")
+
+        changes = _run_cycle(state, tenant_id, refresh_cycles)
+        if changes is not None:
+            _save_state(state, state_path)
+            console_log(
+                f"[dim]+{len(changes['new']):,} new, -{len(changes['removed']):,} removed, "
+                f"{changes['version_changes']:,} version changes, "
+                f"{len(changes['edited_policies'])} policy edits, "
+                f"{changes['stacks_fetched']:,}/{len(state['devices']):,} stacks fetched, "
+                f"query cost {_query_cost() - cost_before:,}[/dim]"
+            )
+            if _has_changes(changes) or not emitted:
+                try:
+                    ok = _emit(state, baseline_layer, baseline_policy) and ok
+                    emitted = True
+                except BaselineNotFoundError:
+                    if not emitted:
+                        raise
+                    logger.warning("Baseline policy not found this cycle » skipped")
+                    ok = False
+            else:
+                console_log(
+                    "[dim]No changes since the last cycle » exports left as-is[/dim]"
+                )
+        else:
+            ok = False
+
+        completed += 1
+        elapsed = time.monotonic() - started
+        console_log(f"[dim]Cycle done in {elapsed:.1f}s[/dim]")
+        console.print()
+        if cycles is not None and completed >= cycles:
+            break
+        time.sleep(max(interval_s - elapsed, 0))
+
+    return ok
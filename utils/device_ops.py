@@ -1,10 +1,13 @@
 from typing import List, Dict, Any, Optional
+import os
 import requests
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import threading
 
 from utils import auth
+from utils import gql_metrics
+from utils import phase_profiler
 from utils.env_helper import console_log, pretty_node_deets
 from utils.compliance_analysis import parse_policy_attribution
 
@@ -118,19 +121,7 @@ DEVICE_POLICY_CAPABILITIES = """
 """
 
 # Fragment for reusable policy structure
-POLICY_CAPABILITIES_FRAGMENT = """
-  capabilities {
-    com {
-      poly {
-        software_update {
-          policy {
-            version { value }
-            use_latest { value }
-          }
-        }
-      }
-    }
-  }
+POLICY_SOURCES_FRAGMENT = """
   sources {
     id
     name
@@ -156,6 +147,31 @@ POLICY_CAPABILITIES_FRAGMENT = """
   }
 """
 
+POLICY_CAPABILITIES_FRAGMENT = (
+    """
+  capabilities {
+    com {
+      poly {
+        software_update {
+          policy {
+            version { value }
+            use_latest { value }
+          }
+        }
+      }
+    }
+  }"""
+    + POLICY_SOURCES_FRAGMENT
+)
+
+# trimmed » skip the per-device effective `capabilities` block; parse_policy_attribution
+# resolves it from `sources` the same way the API does (first configured layer by priority)
+TRIMMED_FRAGMENT_ENV = "LENSCTL_TRIMMED_POLICY_FRAGMENT"
+
+
+def _trimmed_fragment_enabled() -> bool:
+    return os.getenv(TRIMMED_FRAGMENT_ENV, "").strip().lower() in ("1", "true", "yes")
+
 
 def fetch_devices_by_model(
     tenant_id: str,
@@ -289,6 +305,7 @@ def fetch_devices_by_model(
             )
             if retryable and retry_count < MAX_RETRIES:
                 retry_count += 1
+                gql_metrics.record_retry("deviceList")
                 backoff = min(5 * (2 ** (retry_count - 1)), 120)
                 console_log(
                     f"[yellow]Error while fetching page {page_count} "
@@ -399,7 +416,8 @@ def fetch_device_policy_stack(device_id: str) -> Dict[str, Any]:
         return {}
 
 
-def build_batch_policy_query(device_ids: List[str]) -> str:
+def build_batch_policy_query(device_ids: List[str], *, trimmed: bool = False) -> str:
+    fragment = POLICY_SOURCES_FRAGMENT if trimmed else POLICY_CAPABILITIES_FRAGMENT
     query_parts = [
         "query BatchDevicePolicies {",
         "  calculateQueryCost {",
@@ -416,7 +434,7 @@ def build_batch_policy_query(device_ids: List[str]) -> str:
         query_parts.append(
             f'  dev{i}: devicePolicyCapabilities(deviceId: "{safe_id}") {{'
         )
-        query_parts.append(f"    {POLICY_CAPABILITIES_FRAGMENT}")
+        query_parts.append(f"    {fragment}")
         query_parts.append("  }")
 
     query_parts.append("}")
@@ -424,9 +442,9 @@ def build_batch_policy_query(device_ids: List[str]) -> str:
 
 
 def fetch_device_policy_batch(
-    device_ids: List[str],
+    device_ids: List[str], *, trimmed: bool = False
 ) -> tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
-    query = build_batch_policy_query(device_ids)
+    query = build_batch_policy_query(device_ids, trimmed=trimmed)
 
     try:
         data = auth.execute_gql(query, {})
@@ -459,7 +477,11 @@ def fetch_policy_attributions_concurrent(
     devices: List[Dict[str, Any]],
     max_workers: int = 2,
     batch_size: int = 25,
+    *,
+    trimmed: bool | None = None,
 ) -> tuple[int, int]:
+    if trimmed is None:
+        trimmed = _trimmed_fragment_enabled()
 
     total = len(devices)
     completed = 0
@@ -480,6 +502,10 @@ def fetch_policy_attributions_concurrent(
     console_log(
         f"  [dim]Using [blue]{total_batches:,}[/blue] batches of [blue]{batch_size}[/blue] with [blue]{max_workers}[/blue] workers[/dim]"
     )
+    if trimmed:
+        console_log(
+            "  [dim]Trimmed policy fragment » effective policy resolved locally[/dim]"
+        )
 
     start_time = time.time()
     last_wait_log = 0
@@ -491,6 +517,8 @@ def fetch_policy_attributions_concurrent(
     last_cost_info = {}
     submission_lock = threading.Lock()
     retry_counts = {}  # track retry attempts per batch
+    parse_seconds = 0.0  # main-thread parse time » reported under --profile
+    layer_cache = {}  # shared model/site/group layers » see parse_policy_attribution
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         # don't submit all batches at once - submit gradually to control rate
@@ -501,7 +529,7 @@ def fetch_policy_attributions_concurrent(
         for _ in range(min(max_workers, len(pending_batches))):
             batch = pending_batches.pop(0)
             future = executor.submit(
-                fetch_device_policy_batch, [d["id"] for d in batch]
+                fetch_device_policy_batch, [d["id"] for d in batch], trimmed=trimmed
             )
             active_futures[future] = batch
 
@@ -528,7 +556,13 @@ def fetch_policy_attributions_concurrent(
                             policy_stack = policies_dict.get(device_id)
 
                             if policy_stack:
-                                attribution = parse_policy_attribution(policy_stack)
+                                parse_start = time.perf_counter()
+                                attribution = parse_policy_attribution(
+                                    policy_stack,
+                                    hardware_product=device.get("hardwareProduct"),
+                                    layer_cache=layer_cache,
+                                )
+                                parse_seconds += time.perf_counter() - parse_start
                                 device["policy_attribution"] = attribution
                                 completed += 1
                             else:
@@ -555,6 +589,7 @@ def fetch_policy_attributions_concurrent(
 
                             if retry_count < 3:  # max 3 retries per batch
                                 retry_counts[batch_id] = retry_count + 1
+                                gql_metrics.record_retry("BatchDevicePolicies")
                                 console_log(
                                     f"[yellow]429 Rate limit error - will retry batch "
                                     f"(attempt {retry_count + 1}/3, {len(batch)} devices)[/yellow]"
@@ -631,7 +666,9 @@ def fetch_policy_attributions_concurrent(
                         if pending_batches:
                             next_batch = pending_batches.pop(0)
                             next_future = executor.submit(
-                                fetch_device_policy_batch, [d["id"] for d in next_batch]
+                                fetch_device_policy_batch,
+                                [d["id"] for d in next_batch],
+                                trimmed=trimmed,
                             )
                             active_futures[next_future] = next_batch
 
@@ -668,9 +705,11 @@ def fetch_policy_attributions_concurrent(
                 try:
                     policy_stack = future.result(timeout=30)
                     if policy_stack:
+                        parse_start = time.perf_counter()
                         device["policy_attribution"] = parse_policy_attribution(
-                            policy_stack
+                            policy_stack, layer_cache=layer_cache
                         )
+                        parse_seconds += time.perf_counter() - parse_start
                         retry_completed += 1
                         completed += 1
                         failed -= 1
@@ -685,4 +724,5 @@ def fetch_policy_attributions_concurrent(
         )
 
     console_log(f"[green]Final: {completed:,} successful | {failed:,} failed[/green]")
+    phase_profiler.record("parse_policy_attribution (CPU)", parse_seconds)
     return completed, failed
@@ -1,6 +1,8 @@
 import os
 import sys
+import json
 import logging
+import threading
 import coloredlogs
 from dotenv import load_dotenv
 from rich.text import Text
@@ -60,6 +62,20 @@ def bool_text(val: bool) -> Text:
     return Text("None", style="dim")
 
 
+_pygments_lock = threading.Lock()
+
+
+def highlight_json(data) -> str:
+    # pygments only loads once a task actually prints a payload. its lazy lexer
+    # lookup isn't thread-safe » import workers serialize on the first load
+    with _pygments_lock:
+        from pygments import highlight
+        from pygments.formatters import TerminalFormatter
+        from pygments.lexers import JsonLexer
+
+    return highlight(json.dumps(data, indent=2), JsonLexer(), TerminalFormatter())
+
+
 def print_indented(text: str, style: str = "") -> None:
     for line in text.splitlines():
         console.print(f"{INDENT}{line}", style=style)
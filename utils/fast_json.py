@@ -0,0 +1,87 @@
+"""JSON codec for the GraphQL transport » orjson, then msgspec, then the stdlib.
+Every backend returns plain dicts/lists and raises ValueError on bad input."""
+
+import os
+import json
+from typing import Any, Callable, Dict, Tuple
+
+# -- GLOBALS
+
+BACKEND_ORDER = ("orjson", "msgspec", "stdlib")
+Codec = Tuple[Callable[[Any], Any], Callable[[Any], bytes]]  # (loads, dumps)
+
+
+# -- PRIVATE HELPERS » NO TOUCHY!
+
+
+def _stdlib_codec() -> Codec:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    return json.loads, _dumps
+
+
+def _orjson_codec() -> Codec:
+    import orjson
+
+    return orjson.loads, orjson.dumps
+
+
+def _msgspec_codec() -> Codec:
+    import msgspec
+
+    decoder = msgspec.json.Decoder()
+    encoder = msgspec.json.Encoder()
+
+    def _loads(data: Any) -> Any:
+        try:
+            return decoder.decode(data)
+        except msgspec.DecodeError as exc:
+            raise ValueError(str(exc)) from exc  # same contract as json.loads
+
+    return _loads, encoder.encode
+
+
+_CODECS: Dict[str, Callable[[], Codec]] = {
+    "orjson": _orjson_codec,
+    "msgspec": _msgspec_codec,
+    "stdlib": _stdlib_codec,
+}
+
+
+def _select(preferred: str | None) -> Tuple[str, Callable, Callable]:
+    order = BACKEND_ORDER
+    if preferred:
+        preferred = preferred.strip().lower()
+        if preferred in _CODECS:
+            # a forced backend that isn't installed still falls back to the stdlib
+            order = (preferred, "stdlib")
+    for name in order:
+        try:
+            loads_fn, dumps_fn = _CODECS[name]()
+        except ImportError:
+            continue
+        return name, loads_fn, dumps_fn
+    return "stdlib", *_stdlib_codec()
+
+
+# LENSCTL_JSON_BACKEND=stdlib|orjson|msgspec forces one » A/B runs, debugging
+BACKEND, _loads, _dumps = _select(os.getenv("LENSCTL_JSON_BACKEND"))
+
+
+# -- PUBLIC FUNCTIONS
+
+
+def loads(data: bytes | str) -> Any:
+    return _loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    return _dumps(obj)
+
+
+def use_backend(name: str) -> str:
+    """switch backends at runtime (benchmarks). returns the backend actually in use"""
+    global BACKEND, _loads, _dumps
+    BACKEND, _loads, _dumps = _select(name)
+    return BACKEND
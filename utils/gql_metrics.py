@@ -0,0 +1,308 @@
+"""Per-request GraphQL metrics » latency histograms, bytes, retries and query cost,
+rolled up per operation name."""
+
+import os
+import re
+import json
+import time
+import threading
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+from rich.table import Table
+
+from utils.env_helper import console, console_log
+
+# -- GLOBALS
+
+# upper bounds in ms » the last bucket catches everything slower
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+SPARK_CHARS = " ▁▂▃▄▅▆▇█"
+_OPERATION_RE = re.compile(r"\s*(?:query|mutation)\s+(\w+)")
+
+
+# -- PRIVATE HELPERS » NO TOUCHY!
+
+
+class _OperationStats:
+    __slots__ = (
+        "calls",
+        "errors",
+        "retries",
+        "latency_total_ms",
+        "latency_max_ms",
+        "buckets",
+        "request_bytes",
+        "response_bytes",
+        "wire_bytes",
+        "query_cost",
+        "statuses",
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.latency_total_ms = 0.0
+        self.latency_max_ms = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS_MS)
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.wire_bytes = 0
+        self.query_cost = 0
+        self.statuses: Counter = Counter()
+
+    def percentile_ms(self, pct: float) -> float | None:
+        # histogram estimate » upper bound of the bucket holding the pct-th sample
+        if not self.calls:
+            return None
+        rank = pct * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.latency_max_ms)
+        return self.latency_max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "latency_avg_ms": (
+                self.latency_total_ms / self.calls if self.calls else None
+            ),
+            "latency_p50_ms": self.percentile_ms(0.50),
+            "latency_p95_ms": self.percentile_ms(0.95),
+            "latency_max_ms": self.latency_max_ms,
+            "histogram_ms": {
+                str(bound): count
+                for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)
+            },
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "wire_bytes": self.wire_bytes,
+            "query_cost": self.query_cost,
+            "statuses": {str(k): v for k, v in self.statuses.items()},
+        }
+
+
+_lock = threading.Lock()
+_stats: Dict[str, _OperationStats] = {}
+_events: List[Dict[str, Any]] = []
+_task_name = "session"
+_task_started = time.time()
+_trace_dir = os.getenv("LENSCTL_GQL_TRACE_DIR") or None
+_summary_enabled = os.getenv("LENSCTL_GQL_SUMMARY", "1").strip().lower() not in (
+    "0",
+    "false",
+    "no",
+)
+
+
+def _bucket_index(latency_ms: float) -> int:
+    for i, bound in enumerate(LATENCY_BUCKETS_MS):
+        if latency_ms <= bound:
+            return i
+    return len(LATENCY_BUCKETS_MS) - 1
+
+
+def _sparkline(buckets: List[int]) -> str:
+    peak = max(buckets) or 1
+    steps = len(SPARK_CHARS) - 1
+    return "".join(
+        SPARK_CHARS[-(-count * steps // peak)] if count else SPARK_CHARS[0]
+        for count in buckets
+    )
+
+
+def _fmt_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:,.0f} {unit}"
+        n /= 1024
+    return f"{n:,.1f} GB"
+
+
+def _fmt_wire(raw: int, wire: int) -> str:
+    # compressed size + how much content-encoding saved
+    if not wire or wire >= raw:
+        return _fmt_bytes(wire)
+    return f"{_fmt_bytes(wire)} [dim]({raw / wire:.1f}x)[/dim]"
+
+
+def _fmt_ms(value: float | None) -> str:
+    if value is None:
+        return "-"
+    return f"{value / 1000:.2f}s" if value >= 1000 else f"{value:.0f}ms"
+
+
+# -- PUBLIC FUNCTIONS
+
+
+def operation_name(query: str) -> str:
+    match = _OPERATION_RE.match(query)
+    return match.group(1) if match else "anonymous"
+
+
+def extract_query_cost(body: Any) -> int | None:
+    if not isinstance(body, dict):
+        return None
+    cost_info = (body.get("data") or {}).get("calculateQueryCost")
+    if isinstance(cost_info, dict):
+        return cost_info.get("queryCost")
+    return None
+
+
+def record(
+    operation: str,
+    *,
+    latency_s: float,
+    status: int | None,
+    request_bytes: int,
+    response_bytes: int,
+    wire_bytes: int | None = None,
+    query_cost: int | None = None,
+    error: str | None = None,
+) -> None:
+    # wire_bytes » body size before content-encoding was undone; same as raw when uncompressed
+    if wire_bytes is None:
+        wire_bytes = response_bytes
+    latency_ms = latency_s * 1000
+    with _lock:
+        stats = _stats.get(operation)
+        if stats is None:
+            stats = _stats[operation] = _OperationStats()
+        stats.calls += 1
+        stats.latency_total_ms += latency_ms
+        stats.latency_max_ms = max(stats.latency_max_ms, latency_ms)
+        stats.buckets[_bucket_index(latency_ms)] += 1
+        stats.request_bytes += request_bytes
+        stats.response_bytes += response_bytes
+        stats.wire_bytes += wire_bytes
+        stats.statuses[status if status is not None else "conn-error"] += 1
+        if query_cost:
+            stats.query_cost += query_cost
+        if error or status is None or status >= 400:
+            stats.errors += 1
+
+        if _trace_dir:
+            _events.append(
+                {
+                    "t": round(time.time() - _task_started, 4),
+                    "operation": operation,
+                    "latency_ms": round(latency_ms, 2),
+                    "status": status,
+                    "request_bytes": request_bytes,
+                    "response_bytes": response_bytes,
+                    "wire_bytes": wire_bytes,
+                    "query_cost": query_cost,
+                    "error": error,
+                    "thread": threading.current_thread().name,
+                }
+            )
+
+
+def record_retry(operation: str) -> None:
+    with _lock:
+        stats = _stats.get(operation)
+        if stats is None:
+            stats = _stats[operation] = _OperationStats()
+        stats.retries += 1
+
+
+def reset(task_name: str = "session") -> None:
+    global _task_name, _task_started
+    with _lock:
+        _stats.clear()
+        _events.clear()
+        _task_name = task_name
+        _task_started = time.time()
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        return {name: stats.to_dict() for name, stats in _stats.items()}
+
+
+def render_summary() -> Table:
+    with _lock:
+        rows = sorted(
+            _stats.items(), key=lambda item: item[1].latency_total_ms, reverse=True
+        )
+        table = Table(
+            title=f"GraphQL calls » {_task_name}",
+            header_style="bold magenta",
+            title_justify="left",
+        )
+        table.add_column("Operation", style="cyan", no_wrap=True)
+        for column in (
+            "Calls",
+            "Err",
+            "Retry",
+            "p50",
+            "p95",
+            "Max",
+            "Sent",
+            "Recv",
+            "Wire",
+        ):
+            table.add_column(column, justify="right")
+        table.add_column("Cost", justify="right", style="green")
+        table.add_column("Latency", no_wrap=True)
+
+        for name, stats in rows:
+            table.add_row(
+                name,
+                f"{stats.calls:,}",
+                f"[red]{stats.errors:,}[/red]" if stats.errors else "0",
+                f"[yellow]{stats.retries:,}[/yellow]" if stats.retries else "0",
+                _fmt_ms(stats.percentile_ms(0.50)),
+                _fmt_ms(stats.percentile_ms(0.95)),
+                _fmt_ms(stats.latency_max_ms),
+                _fmt_bytes(stats.request_bytes),
+                _fmt_bytes(stats.response_bytes),
+                _fmt_wire(stats.response_bytes, stats.wire_bytes),
+                f"{stats.query_cost:,}" if stats.query_cost else "-",
+                _sparkline(stats.buckets),
+            )
+    return table
+
+
+def write_trace(path: str | None = None) -> Optional[str]:
+    """dump this task's summary + raw request events as JSON. returns the path written"""
+    if path is None:
+        if not _trace_dir:
+            return None
+        os.makedirs(_trace_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(_task_started))
+        path = os.path.join(_trace_dir, f"gql-trace-{_task_name}-{stamp}.json")
+
+    summary = snapshot()
+    with _lock:
+        trace = {
+            "task": _task_name,
+            "started_at": time.strftime(
+                "%Y-%m-%dT%H:%M:%S", time.localtime(_task_started)
+            ),
+            "duration_s": round(time.time() - _task_started, 3),
+            "latency_buckets_ms": [str(b) for b in LATENCY_BUCKETS_MS],
+            "operations": summary,
+            "events": list(_events),
+        }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace, f, indent=2)
+    return path
+
+
+def print_summary() -> None:
+    """end-of-task report; no-op when nothing was called"""
+    with _lock:
+        if not _stats:
+            return
+    if _summary_enabled:
+        console.print()
+        console.print(render_summary())
+    trace_path = write_trace()
+    if trace_path:
+        console_log(f"[dim]GraphQL trace saved » {trace_path}[/dim]")
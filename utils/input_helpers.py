@@ -1,5 +1,7 @@
 from utils.env_helper import print_indented, console
 import utils.panel_renderer as panels
+import utils.gql_metrics as gql_metrics
+import utils.phase_profiler as phase_profiler
 
 
 def input_prompt(question: str = "", *, uppercase: bool = True) -> str:
@@ -56,5 +58,7 @@ def ask_str(
 
 
 def menu_return():
+    phase_profiler.finish()
+    gql_metrics.print_summary()
     console.input("[dim]Press Enter to return to main menu[/dim]")
     return
@@ -0,0 +1,163 @@
+"""Write-ahead journal for room and site mutations » a rerun skips done items,
+reconciles in-doubt ones with a single lookup and retries failures."""
+
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+from utils.env_helper import logger
+
+# -- GLOBALS
+JOURNAL_DIR = ".journal"
+
+INTENT = "intent"
+DONE = "done"
+FAILED = "failed"
+
+
+# -- PRIVATE HELPERS » NO TOUCHY!
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+# -- PUBLIC FUNCTIONS
+
+
+def make_operation_id(kind: str, *parts: Any) -> str:
+    """stable id for an operation so a rerun with the same inputs finds the same journal"""
+    digest = hashlib.sha1(
+        json.dumps([str(p) for p in parts]).encode("utf-8")
+    ).hexdigest()
+    return f"{kind}-{digest[:12]}"
+
+
+def file_operation_id(kind: str, path: str) -> str:
+    """
+    operation id keyed by the file's path, not its contents » fixing rows and
+    rerunning reopens the same journal
+    """
+    return make_operation_id(kind, os.path.abspath(path))
+
+
+class OperationJournal:
+    def __init__(self, operation_id: str, directory: str = JOURNAL_DIR):
+        self.operation_id = operation_id
+        self.path = os.path.join(directory, f"{operation_id}.jsonl")
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._touched: set = set()  # keys written by this run
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._replay()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _replay(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # torn final write from a crash » everything before it is still valid
+                    logger.warning(
+                        f"Skipping unreadable journal line {line_no} in {self.path}"
+                    )
+                    continue
+                key = record.get("key")
+                if key is None:
+                    continue
+                merged = self._items.setdefault(key, {})
+                merged.update(record)
+
+    def _append(self, record: Dict[str, Any], *, sync: bool = False) -> None:
+        record["ts"] = _now()
+        with self._lock:
+            self._touched.add(record["key"])
+            merged = self._items.setdefault(record["key"], {})
+            merged.update(record)
+            self._file.write(json.dumps(record, default=str) + "\n")
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+
+    # -- item state
+
+    @property
+    def resumed(self) -> bool:
+        return bool(self._items)
+
+    def status(self, key: str) -> Optional[str]:
+        return (self._items.get(key) or {}).get("state")
+
+    def response_id(self, key: str) -> Optional[str]:
+        return (self._items.get(key) or {}).get("response_id")
+
+    def is_done(self, key: str) -> bool:
+        return self.status(key) == DONE
+
+    def is_in_doubt(self, key: str) -> bool:
+        return self.status(key) == INTENT
+
+    def fingerprint(self, key: str) -> Optional[str]:
+        return (self._items.get(key) or {}).get("fingerprint")
+
+    # -- writes
+
+    def begin(
+        self, key: str, intent: Dict[str, Any], *, fingerprint: str | None = None
+    ) -> None:
+        """fingerprint » what the item looked like, so a rerun can tell it was edited"""
+        record = {"key": key, "state": INTENT, "intent": intent}
+        if fingerprint is not None:
+            record["fingerprint"] = fingerprint
+        # fsync so the intent survives a crash mid-request
+        self._append(record, sync=True)
+
+    def complete(self, key: str, response_id: Optional[str]) -> None:
+        self._append(
+            {"key": key, "state": DONE, "response_id": response_id, "error": None}
+        )
+
+    def fail(self, key: str, error: str) -> None:
+        self._append({"key": key, "state": FAILED, "error": error})
+
+    # -- lifecycle
+
+    def counts(self) -> Dict[str, int]:
+        totals = {INTENT: 0, DONE: 0, FAILED: 0}
+        for item in self._items.values():
+            state = item.get("state")
+            if state in totals:
+                totals[state] += 1
+        return totals
+
+    def close(self, *, remove_if_clean: bool = True) -> bool:
+        """close the file. a journal with nothing failed or in-doubt is removed. returns True if kept"""
+        with self._lock:
+            self._file.close()
+            # failed in an earlier run and not retried by this one » the item was
+            # edited or removed from the input, nothing left to resume
+            for key in [
+                key
+                for key, item in self._items.items()
+                if item.get("state") == FAILED and key not in self._touched
+            ]:
+                del self._items[key]
+        counts = self.counts()
+        clean = counts[INTENT] == 0 and counts[FAILED] == 0
+        if clean and remove_if_clean:
+            try:
+                os.remove(self.path)
+            except OSError as err:
+                logger.warning(f"Couldn't remove finished journal {self.path}: {err}")
+            return False
+        return True
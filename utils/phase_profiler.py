@@ -0,0 +1,175 @@
+"""Phase-level wall/CPU/memory breakdown for long-running tasks (--profile).
+Every entry point is a no-op while no profiler is active."""
+
+import time
+import cProfile
+import contextlib
+import tracemalloc
+from typing import Dict, Any, List, Optional
+
+from rich.table import Table
+
+from utils.env_helper import console, console_log
+
+# -- GLOBALS
+
+_active: Optional["PhaseProfiler"] = None
+
+
+# -- PRIVATE HELPERS » NO TOUCHY!
+
+
+def _fmt_seconds(seconds: float) -> str:
+    if seconds >= 60:
+        return f"{int(seconds // 60)}m {seconds % 60:04.1f}s"
+    return f"{seconds:.2f}s" if seconds >= 0.01 else f"{seconds * 1000:.1f}ms"
+
+
+# -- PUBLIC FUNCTIONS
+
+
+class PhaseProfiler:
+    def __init__(
+        self,
+        task_name: str,
+        *,
+        track_memory: bool = True,
+        pstats_path: str | None = None,
+    ):
+        self.task_name = task_name
+        self.track_memory = track_memory
+        self.pstats_path = pstats_path
+        self.phases: List[Dict[str, Any]] = []
+        self._open: List[Dict[str, Any]] = []
+        self._cprofile: cProfile.Profile | None = None
+        self._started = 0.0
+        self._finished = False
+        self._owns_tracemalloc = False
+
+    def start(self) -> "PhaseProfiler":
+        self._started = time.perf_counter()
+        if self.track_memory and not tracemalloc.is_tracing():
+            # slows cpu-bound phases » only compare wall times between profiled runs
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        if self.pstats_path:
+            # main thread only » worker threads show up as time spent in wait()
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        return self
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        entry = {"name": name, "wall_s": 0.0, "cpu_s": 0.0, "peak_mb": None, "sub": {}}
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        self._open.append(entry)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()  # all threads
+        try:
+            yield entry
+        finally:
+            entry["wall_s"] = time.perf_counter() - wall_start
+            entry["cpu_s"] = time.process_time() - cpu_start
+            if tracemalloc.is_tracing():
+                peak = tracemalloc.get_traced_memory()[1]
+                entry["peak_mb"] = max(peak - baseline, 0) / (1024 * 1024)
+            self._open.pop()
+            self.phases.append(entry)
+
+    def record(self, name: str, seconds: float) -> None:
+        if self._open:
+            sub = self._open[-1]["sub"]
+            sub[name] = sub.get(name, 0.0) + seconds
+
+    def stop(self) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.pstats_path)
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+
+    def render(self) -> Table:
+        total = time.perf_counter() - self._started
+        table = Table(
+            title=f"Phase profile » {self.task_name} ({_fmt_seconds(total)} total)",
+            header_style="bold magenta",
+            title_justify="left",
+        )
+        table.add_column("Phase", style="cyan", no_wrap=True)
+        table.add_column("Wall", justify="right")
+        table.add_column("% of run", justify="right")
+        table.add_column("CPU", justify="right")
+        table.add_column("Peak alloc", justify="right")
+
+        for entry in self.phases:
+            share = entry["wall_s"] / total * 100 if total else 0
+            style = "bold red" if share >= 25 else ""
+            table.add_row(
+                entry["name"],
+                _fmt_seconds(entry["wall_s"]),
+                f"[{style}]{share:.1f}%[/{style}]" if style else f"{share:.1f}%",
+                _fmt_seconds(entry["cpu_s"]),
+                f"{entry['peak_mb']:.1f} MB" if entry["peak_mb"] is not None else "-",
+            )
+            accounted = 0.0
+            for sub_name, seconds in entry["sub"].items():
+                accounted += seconds
+                table.add_row(
+                    f"[dim]  └ {sub_name}[/dim]", f"[dim]{_fmt_seconds(seconds)}[/dim]"
+                )
+            if entry["sub"]:
+                table.add_row(
+                    "[dim]  └ network + waits[/dim]",
+                    f"[dim]{_fmt_seconds(max(entry['wall_s'] - accounted, 0))}[/dim]",
+                )
+
+        untracked = total - sum(entry["wall_s"] for entry in self.phases)
+        table.add_row("[dim]untracked[/dim]", f"[dim]{_fmt_seconds(untracked)}[/dim]")
+        return table
+
+    def report(self) -> None:
+        self.stop()
+        console.print()
+        console.print(self.render())
+        if self.pstats_path:
+            console_log(
+                f"[dim]cProfile stats saved » {self.pstats_path} "
+                f"(python -m pstats {self.pstats_path})[/dim]"
+            )
+        console.print()
+
+
+def start(
+    task_name: str, *, track_memory: bool = True, pstats_path: str | None = None
+) -> PhaseProfiler:
+    global _active
+    _active = PhaseProfiler(
+        task_name, track_memory=track_memory, pstats_path=pstats_path
+    ).start()
+    return _active
+
+
+def active() -> Optional[PhaseProfiler]:
+    return _active
+
+
+def phase(name: str):
+    return _active.phase(name) if _active is not None else contextlib.nullcontext()
+
+
+def record(name: str, seconds: float) -> None:
+    if _active is not None:
+        _active.record(name, seconds)
+
+
+def finish() -> None:
+    """print the report (once) and deactivate. safe to call when nothing is active"""
+    global _active
+    profiler, _active = _active, None
+    if profiler is not None:
+        profiler.report()
@@ -0,0 +1,75 @@
+"""Memoized policy layer display names, shared by the compliance report and exports.
+clear() drops the cache between runs."""
+
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+# -- GLOBALS
+
+DEVICE_ID_RE = re.compile(r"\(([a-f0-9-]+)\)")
+PARENS_RE = re.compile(r"\(([^)]+)\)")
+GROUP_RE = re.compile(r"Group\(([^)]+)\)")
+MODEL_RE = re.compile(r"^(.*?)\s+Update\s+Policy")
+
+
+class PolicyName(NamedTuple):
+    type: str
+    name: str
+    short: str | None  # site/group/model name, device id » None when it doesn't parse
+    id: str | None  # device policies only » the device id in the name
+
+
+# -- PRIVATE HELPERS » NO TOUCHY!
+
+
+def _pattern(policy_type: str) -> re.Pattern:
+    if policy_type == "device":
+        return DEVICE_ID_RE
+    if policy_type == "site":
+        return PARENS_RE
+    if policy_type == "user_group":
+        return GROUP_RE
+    return MODEL_RE
+
+
+# -- PUBLIC FUNCTIONS
+
+
+@lru_cache(maxsize=None)
+def parse(policy_type: str, name: str) -> PolicyName:
+    match = _pattern(policy_type).search(name or "")
+    short = match.group(1) if match else None
+    return PolicyName(
+        policy_type, name, short, short if policy_type == "device" else None
+    )
+
+
+def display_name(policy_type: str, name: str, fallback: str | None = None) -> str:
+    """short name for headers » device ids cut to 12 chars. fallback when it doesn't parse"""
+    parsed = parse(policy_type, name)
+    if parsed.short is None:
+        return fallback
+    if policy_type == "device":
+        return parsed.short[:12] + "..."
+    return parsed.short
+
+
+@lru_cache(maxsize=None)
+def stack_label(policy_type: str, name: str) -> str:
+    """one entry of the full-details policy stack column, i.e. "Site (HQ)" """
+    short = parse(policy_type, name).short
+    if policy_type == "device":
+        return f"Device ({short[:8] + '...' if short else 'Device'})"
+    if policy_type == "site":
+        return f"Site ({short or 'Site'})"
+    if policy_type == "user_group":
+        return f"User Group ({short or 'User Group'})"
+    if policy_type == "model":
+        return "Account model"
+    return policy_type.title()
+
+
+def clear() -> None:
+    parse.cache_clear()
+    stack_label.cache_clear()
@@ -1,14 +1,21 @@
 import json
 import time
 import requests
-import pandas as pd
-from pygments import highlight
-from pygments.formatters import TerminalFormatter
-from pygments.lexers import JsonLexer
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
 from rich.text import Text
-from utils.env_helper import logger, console_log, pretty_node_deets, console, bool_text
+from utils.env_helper import (
+    logger,
+    console_log,
+    pretty_node_deets,
+    console,
+    bool_text,
+    highlight_json,
+)
 import utils.auth as auth
 from utils.site_ops import resolve_site, SiteIdNotFoundError
+from utils.journal import OperationJournal, file_operation_id, make_operation_id
+from utils.input_helpers import menu_return
 
 EXPORT_ROOMS = """
 query getRoomData($params: RoomConnectionParams) {
@@ -53,8 +60,58 @@ mutation updateRoomData($fields: UpsertRoomRequest!) {
 }
 """
 
+# row outcomes of an import
+IMPORTED = "imported"
+SKIPPED = "skipped"
+FAILED = "failed"
 
-def export_rooms():
+QUERY_ROOM_BY_NAME = """
+query getRoomByName($params: RoomConnectionParams) {
+  tenants {
+    roomData(params: $params) {
+      edges {
+        node {
+          name
+          id
+        }
+      }
+    }
+  }
+}
+"""
+
+
+def fetch_room_id_by_name(room_name: str) -> str | None:
+    """single lookup used to reconcile in-doubt journal entries"""
+    data = auth.execute_gql(
+        QUERY_ROOM_BY_NAME,
+        {
+            "params": {
+                "filter": [
+                    {
+                        "field": "ROOM_NAME",
+                        "comparisonOperator": "EQUALS",
+                        "value": room_name,
+                    }
+                ],
+                "limit": 1,
+            }
+        },
+    )
+    if data.get("errors"):
+        raise RuntimeError(f"GraphQL error getting Room by Name: {data['errors']}")
+    tenants = (data.get("data") or {}).get("tenants") or []
+    if not tenants:
+        return None
+    edges = (tenants[0].get("roomData") or {}).get("edges") or []
+    for edge in edges:
+        node = edge.get("node") or {}
+        if node.get("name") == room_name:
+            return node.get("id")
+    return None
+
+
+def export_rooms(*, interactive: bool = True) -> tuple[int, int]:
     all_rooms = []
     total_rooms_exported = 0
     all_errors = []
@@ -76,6 +133,8 @@ def export_rooms():
             )
         except requests.RequestException as err:
             logger.error(f"Export request failed: {err}")
+            all_errors.append(str(err))
+            total_errors += 1
             break
 
         if data.get("errors"):
@@ -97,7 +156,8 @@ def export_rooms():
         for edge in edges:
             node = edge["node"]
             console_log(f"[muted]Exported:[/muted] {node.get('name')}")
-            time.sleep(0.1)
+            if interactive:
+                time.sleep(0.1)
             total_rooms_exported += 1
             all_rooms.append(
                 {
@@ -125,6 +185,8 @@ def export_rooms():
             break
 
     if all_rooms:
+        import pandas as pd  # deferred » keeps cli startup fast
+
         dataframe = pd.DataFrame(
             all_rooms,
             columns=["name", "id", "capacity", "size", "floor", "siteName", "siteId"],
@@ -147,165 +209,343 @@ def export_rooms():
         ("Total Rooms Exported: "), (str(total_rooms_exported), "yellow")
     )
     console_log(message)
-    console.input("[dim]Press Enter to return to main menu[/dim]")
-    return
+    if interactive:
+        menu_return()
+    return total_rooms_exported, total_errors
+
+
+def _row_journal_key(
+    room_id: str | None, site_id: str | None, site_name: str | None, name: str | None
+) -> str:
+    # who the row is, not where it sits » reordering or editing rows keeps the key
+    if room_id:
+        return f"room:{room_id}"
+    return f"room-create:{site_id or site_name or ''}:{(name or '').strip()}"
+
+
+def _row_site_id(row_dict: Dict[str, Any]) -> str | None:
+    value = row_dict.get("siteId")
+    return str(value) if value is not None else None
+
+
+def _row_site_name(row_dict: Dict[str, Any]) -> str | None:
+    value = row_dict.get("siteName")
+    return str(value) if value is not None else None
+
+
+def _row_lanes(
+    rows: List[Tuple[int, Dict[str, Any]]],
+) -> List[List[Tuple[int, Dict[str, Any]]]]:
+    """
+    rows that can change each other's outcome (same siteId, room id or room name,
+    or a siteName some siteId row may rename to) share a lane and run in csv order.
+    rows that only name a site stay apart » racing creates of one new site are
+    coalesced by site_ops' single-flight
+    """
+    renamed_to = {
+        _row_site_name(row_dict).strip()
+        for _, row_dict in rows
+        if _row_site_id(row_dict) and _row_site_name(row_dict)
+    }
+    lane_of: Dict[str, int] = {}  # dependency key → lane (its first row's index)
+    lanes: Dict[int, List[Tuple[int, Dict[str, Any]]]] = {}
+    for index, row_dict in rows:
+        site_name = (_row_site_name(row_dict) or "").strip()
+        keys = {
+            f"site:{auth.SITE_ID or _row_site_id(row_dict) or ''}",
+            f"room:{row_dict.get('id') or ''}",
+            f"name:{str(row_dict.get('name') or '').strip()}",
+        }
+        keys = {key for key in keys if not key.endswith(":")}
+        if site_name in renamed_to:
+            keys.add(f"site-name:{site_name}")
+
+        joined = sorted({lane_of[key] for key in keys if key in lane_of})
+        lane = joined[0] if joined else index
+        members = lanes.setdefault(lane, [])
+        for other in joined[1:]:
+            members.extend(lanes.pop(other))
+            for key, owner in lane_of.items():
+                if owner == other:
+                    lane_of[key] = lane
+        members.append((index, row_dict))
+        for key in keys:
+            lane_of[key] = lane
+
+    for members in lanes.values():
+        members.sort(key=lambda member: member[0])
+    return sorted(lanes.values(), key=lambda members: members[0][0])
+
+
+def _import_row(
+    index: int,
+    row_dict: Dict[str, Any],
+    journal: OperationJournal,
+    site_name_to_id: Dict[str, str],
+    site_id_to_name: Dict[str, str],
+    *,
+    interactive: bool,
+) -> Tuple[str, str | None]:
+    """resolve the site and upsert one csv row. returns (outcome, error message)"""
+    import pandas as pd  # already loaded by update_rooms » just a sys.modules hit
+
+    raw_id = row_dict.get("id")
+    raw_name = row_dict.get("name")
+    raw_capacity = row_dict.get("capacity")
+    raw_size = row_dict.get("size")
+    raw_floor = row_dict.get("floor")
+    raw_site = _row_site_id(row_dict)
+    raw_site_name = _row_site_name(row_dict)
+
+    journal_key = _row_journal_key(
+        None if pd.isna(raw_id) else str(raw_id),
+        raw_site,
+        raw_site_name,
+        None if pd.isna(raw_name) else str(raw_name),
+    )
+    fingerprint = make_operation_id("row", *sorted(row_dict.items()))
+    created_id = None
+    if journal.is_done(journal_key):
+        if journal.fingerprint(journal_key) == fingerprint:
+            return SKIPPED, None
+        # edited since it synced » a room it created gets updated, not created again
+        created_id = journal.response_id(journal_key)
+
+    if interactive:
+        time.sleep(0.3)
+    console.print()
+    pretty_node_deets(
+        row_dict, label=f"CSV row {index}", pad_braces=True, label_style="yellow"
+    )
+
+    message = Text.assemble(
+        ("🔍 Resolving site for ", "white"),
+        (repr(raw_site_name), "yellow"),
+        (":", "grey58"),
+        (repr(raw_site), "blue"),
+        ("...", "white"),
+    )
+    console_log(message)
 
+    try:
+        site_id_value = resolve_site(
+            raw_site,
+            raw_site_name,
+            site_name_to_id,
+            site_id_to_name,
+            journal=journal,
+        )
+    except SiteIdNotFoundError as error:
+        logger.error(f"Caught SiteIdNotFoundError in row {index}: {error}")
+        journal.fail(journal_key, str(error))
+        return FAILED, f"Row {index}: {error}"
+    except requests.RequestException as http_error:
+        logger.error(f"Row {index}: HTTP error during site resolution: {http_error}")
+        if http_error.response is not None:
+            logger.debug(f"Response body:\n{http_error.response.text}")
+        journal.fail(journal_key, str(http_error))
+        return FAILED, f"Row {index}: {http_error}"
+    except Exception as err:
+        logger.error(f"Row {index}: site resolution failed: {err}")
+        journal.fail(journal_key, str(err))
+        return FAILED, f"Row {index}: {err}"
 
-def update_rooms():
+    room_id_value = None if pd.isna(raw_id) else str(raw_id)
+    if room_id_value is None and created_id:
+        console_log(
+            f"[yellow]Row {index} changed since a previous run created it[/yellow] "
+            f"» updating room [dim]{created_id}[/dim]"
+        )
+        room_id_value = created_id
+
+    # if capacity is missing set it to None. otherwise, validate integer and convert to null (none) with warning on failure
+    capacity_series = pd.to_numeric(pd.Series([raw_capacity]), errors="coerce")
+    capacity_number = capacity_series.iloc[0]
+    capacity_value = None if pd.isna(capacity_number) else int(capacity_number)
+
+    if (
+        pd.isna(capacity_number)
+        and not pd.isna(raw_capacity)
+        and str(raw_capacity).strip()
+    ):
+        console_log(
+            f"[yellow]Warning:[/yellow] row {index} had [green]'capacity'[/green]: "
+            f"[red]'{raw_capacity}'[/red], which isn't a number. "
+            "It's been set to [blue]null[/blue] (None). "
+            "See README › CSV Format: https://github.com/dfreshreed/lensctl-ops-deck "
+            "for expected types. "
+            "Fix value in [green]room_data.csv[/green] and run the import again.",
+            style="bold",
+        )
+    # validate enum sizes as safety net for bad input
+    DEFAULT_SIZE = "NONE"
+    VALID_SIZES = {"NONE", "FOCUS", "HUDDLE", "SMALL", "MEDIUM", "LARGE"}
+    # if no csv value use enum defined value
+    raw_size = raw_size.upper() if pd.notna(raw_size) else DEFAULT_SIZE
+    size_value = raw_size if raw_size in VALID_SIZES else DEFAULT_SIZE
+
+    # if floor missing -> None. numbered floors are strings
+    floor_value = None if pd.isna(raw_floor) else str(raw_floor).strip()
+
+    # build room fields dictionary for payload
+    room_fields = {
+        "tenantId": auth.TENANT_ID,
+        "id": room_id_value,
+        "capacity": capacity_value,
+        "size": size_value,
+        "floor": floor_value,
+        "siteId": site_id_value,
+    }
+    # trim whitespace; validate no empty string
+    if pd.notna(raw_name) and str(raw_name).strip():
+        room_fields["name"] = str(raw_name).strip()
+
+    # in-doubt create from a previous run » one lookup decides if it landed
+    if journal.is_in_doubt(journal_key) and not room_id_value and "name" in room_fields:
+        try:
+            existing_id = fetch_room_id_by_name(room_fields["name"])
+        except (requests.RequestException, RuntimeError) as err:
+            logger.warning(f"Row {index}: couldn't reconcile journal entry: {err}")
+            existing_id = None
+        if existing_id:
+            console_log(
+                f"[ok]Row {index} already created in a previous run[/ok] [dim]{existing_id}[/dim]"
+            )
+            journal.complete(journal_key, existing_id)
+            return SKIPPED, None
+
+    # build update room payload structure
+    pretty_node_deets(
+        room_fields,
+        label=f"Sending row {index}",
+        pad_braces=True,
+        label_style="muted",
+    )
+
+    journal.begin(journal_key, room_fields, fingerprint=fingerprint)
+    try:
+        data = auth.execute_gql(UPDATE_ROOMS, {"fields": room_fields})
+        highlighted = highlight_json(data)
+        if "errors" in data:
+            gql_error = f"GraphQL error at row {index}: \n{highlighted}"
+            logger.error(gql_error)
+            journal.fail(journal_key, json.dumps(data["errors"]))
+            return FAILED, gql_error
+    # log network or HTTP errors
+    except requests.RequestException as err:
+        http_err = f"Request error at row {index}: {err}"
+        logger.error(http_err)
+        journal.fail(journal_key, str(err))
+        return FAILED, http_err
+
+    console_log(f"[ok]Row {index} synced.[/ok] Updated room record (in tenant): ")
+    print(highlighted, end="")
+    upserted = (data.get("data") or {}).get("upsertRoom") or {}
+    journal.complete(journal_key, upserted.get("id"))
+    return IMPORTED, None
+
+
+def update_rooms(*, interactive: bool = True, max_workers: int = 1) -> tuple[int, int]:
+    """
+    max_workers > 1 imports independent rows concurrently (see _row_lanes).
+    rows that depend on each other still run in csv order
+    """
     total_rooms_imported = 0
     total_errors = 0
     all_errors = []
     site_name_to_id = {}
     site_id_to_name = {}
 
+    import pandas as pd  # deferred » keeps cli startup fast
+
     # read the csv
     try:
         dataframe = pd.read_csv("./room_data.csv")
     # handle any errors
     except Exception as ex:
         logger.error(f"Failed to read csv: {ex}")
-        console.input("[dim]Press Enter to return to main menu[/dim]")
-        return
+        if interactive:
+            menu_return()
+        return 0, 1
     if dataframe.empty:
         console_log(
             "There's nothing to import! [yellow]'room_data.csv' is empty...[/yellow]"
         )
-        console.input("[dim]Press Enter to return to main menu[/dim]")
-        return
+        if interactive:
+            menu_return()
+        return 0, 0
 
-    # loop through each csv row
+    # journal keyed by csv path » fix failed rows and rerun to resume where it stopped
+    journal = OperationJournal(file_operation_id("update-rooms", "./room_data.csv"))
+    total_skipped = 0
+    if journal.resumed:
+        counts = journal.counts()
+        console_log(
+            f"[yellow]Resuming import from journal[/yellow] [dim]{journal.path}[/dim] "
+            f"[green]{counts['done']} done[/green] | [yellow]{counts['intent']} in-doubt[/yellow] | "
+            f"[red]{counts['failed']} failed[/red]"
+        )
+
+    rows = []
     for index, row in dataframe.iterrows():
-        time.sleep(0.3)
-        console.print()
         row_dict = {}
         for key, value in row.to_dict().items():
             if pd.isna(value):
                 row_dict[key] = None
             else:
                 row_dict[key] = value
+        rows.append((index, row_dict))
 
-        pretty_node_deets(
-            row_dict, label=f"CSV row {index}", pad_braces=True, label_style="yellow"
-        )
-
-        raw_id = row.get("id")
-        raw_name = row.get("name")
-        raw_capacity = row.get("capacity")
-        raw_size = row.get("size")
-        raw_floor = row.get("floor")
-        raw_site = str(row.get("siteId")) if pd.notna(row.get("siteId")) else None
-        raw_site_name = (
-            str(row.get("siteName")) if pd.notna(row.get("siteName")) else None
-        )
+    def _run_lane(lane: List[Tuple[int, Dict[str, Any]]]) -> List[tuple]:
+        return [
+            (
+                index,
+                *_import_row(
+                    index,
+                    row_dict,
+                    journal,
+                    site_name_to_id,
+                    site_id_to_name,
+                    interactive=interactive,
+                ),
+            )
+            for index, row_dict in lane
+        ]
 
-        message = Text.assemble(
-            ("🔍 Resolving site for ", "white"),
-            (repr(raw_site_name), "yellow"),
-            (":", "grey58"),
-            (repr(raw_site), "blue"),
-            ("...", "white"),
+    if max_workers > 1:
+        lanes = _row_lanes(rows)
+        console_log(
+            f"[bold]Importing [blue]{len(rows):,}[/blue] rows in [blue]{len(lanes):,}[/blue] "
+            f"independent lanes with [blue]{max_workers}[/blue] workers[/bold]"
         )
-        console_log(message)
-
-        try:
-            site_id_value = resolve_site(
-                raw_site, raw_site_name, site_name_to_id, site_id_to_name
-            )
-        except SiteIdNotFoundError as error:
-            logger.error(f"Caught SiteIdNotFoundError in row {index}: {error}")
-            all_errors.append(f"Row {index}: {error}")
-            total_errors += 1
-            continue
-        except requests.RequestException as http_error:
-            logger.error(
-                f"Row {index}: HTTP error during site resolution: {http_error}"
-            )
-            if http_error.response is not None:
-                logger.debug(f"Response body:\n{http_error.response.text}")
-            all_errors.append(f"Row {index}: {http_error}")
-            total_errors += 1
-            continue
-        except Exception as err:
-            logger.error(f"Row {index}: site resolution failed: {err}")
-            all_errors.append(f"Row {index}: {err}")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            outcomes = [
+                outcome
+                for lane_outcomes in executor.map(_run_lane, lanes)
+                for outcome in lane_outcomes
+            ]
+        outcomes.sort(key=lambda outcome: outcome[0])
+    else:
+        outcomes = _run_lane(rows)
 
+    for index, state, error in outcomes:
+        if state == IMPORTED:
+            total_rooms_imported += 1
+        elif state == SKIPPED:
+            total_skipped += 1
+        else:
             total_errors += 1
-            continue
-
-        room_id_value = None if pd.isna(raw_id) else str(raw_id)
-
-        # if capacity is missing set it to None. otherwise, validate integer and convert to null (none) with warning on failure
-        capacity_series = pd.to_numeric(pd.Series([raw_capacity]), errors="coerce")
-        capacity_number = capacity_series.iloc[0]
-        capacity_value = None if pd.isna(capacity_number) else int(capacity_number)
+            all_errors.append(error)
 
-        if (
-            pd.isna(capacity_number)
-            and not pd.isna(raw_capacity)
-            and str(raw_capacity).strip()
-        ):
-            console_log(
-                f"[yellow]Warning:[/yellow] row {index} had [green]'capacity'[/green]: "
-                f"[red]'{raw_capacity}'[/red], which isn't a number. "
-                "It's been set to [blue]null[/blue] (None). "
-                "See README › CSV Format: https://github.com/dfreshreed/lensctl-ops-deck "
-                "for expected types. "
-                "Fix value in [green]room_data.csv[/green] and run the import again.",
-                style="bold",
-            )
-        # validate enum sizes as safety net for bad input
-        DEFAULT_SIZE = "NONE"
-        VALID_SIZES = {"NONE", "FOCUS", "HUDDLE", "SMALL", "MEDIUM", "LARGE"}
-        # if no csv value use enum defined value
-        raw_size = raw_size.upper() if pd.notna(raw_size) else DEFAULT_SIZE
-        size_value = raw_size if raw_size in VALID_SIZES else DEFAULT_SIZE
-
-        # if floor missing -> None. numbered floors are strings
-        floor_value = None if pd.isna(raw_floor) else str(raw_floor).strip()
-
-        # build room fields dictionary for payload
-        room_fields = {
-            "tenantId": auth.TENANT_ID,
-            "id": room_id_value,
-            "capacity": capacity_value,
-            "size": size_value,
-            "floor": floor_value,
-            "siteId": site_id_value,
-        }
-        # trim whitespace; validate no empty string
-        if pd.notna(raw_name) and str(raw_name).strip():
-            room_fields["name"] = str(raw_name).strip()
-
-        # build update room payload structure
-        pretty_node_deets(
-            room_fields,
-            label=f"Sending row {index}",
-            pad_braces=True,
-            label_style="muted",
+    if total_skipped:
+        console_log(
+            f"[dim]Skipped {total_skipped} row(s) already completed in a previous run[/dim]"
+        )
+    if journal.close():
+        console_log(
+            f"[yellow]Journal kept for retry:[/yellow] [dim]{journal.path}[/dim] "
+            "Fix the failed rows and run the import again to resume."
         )
-
-        try:
-            data = auth.execute_gql(UPDATE_ROOMS, {"fields": room_fields})
-            highlighted = highlight(
-                json.dumps(data, indent=2), JsonLexer(), TerminalFormatter()
-            )
-            if "errors" in data:
-                gql_error = f"GraphQL error at row {index}: \n{highlighted}"
-                logger.error(gql_error)
-                all_errors.append(gql_error)
-                total_errors += 1
-            else:
-                console_log(
-                    f"[ok]Row {index} synced.[/ok] Updated room record (in tenant): "
-                )
-                print(highlighted, end="")
-                total_rooms_imported += 1
-        # log network or HTTP errors
-        except requests.RequestException as err:
-            http_err = f"Request error at row {index}: {err}"
-            logger.error(http_err)
-            all_errors.append(http_err)
-            total_errors += 1
     if not total_errors:
         console_log(
             "[magenta]update_rooms()[/magenta] [ok]completed with no errors.[/ok]"
@@ -324,5 +564,6 @@ def update_rooms():
         console_log(message)
 
         console_log("[red]Details on all errors:[/red] \n" + "\n".join(all_errors))
-    console.input("[dim]Press Enter to return to main menu[/dim]")
-    return
+    if interactive:
+        menu_return()
+    return total_rooms_imported, total_errors
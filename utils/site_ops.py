@@ -1,6 +1,8 @@
 import json
+import threading
 import requests
-import pandas as pd
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
 from utils.env_helper import logger
 import utils.auth as auth
 
@@ -41,6 +43,44 @@ CREATE_OR_UPDATE_SITE = """
 """
 
 
+# -- SINGLE-FLIGHT » concurrent callers asking for the same site share one request
+
+_inflight: dict[Hashable, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _single_flight(key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _inflight[key] = future
+
+    # followers block on the leader's result (or re-raise its exception)
+    if not leader:
+        return future.result()
+
+    try:
+        result = fn(*args, **kwargs)
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+# -- NEGATIVE CACHE » known-missing sites cost one failed lookup per run, not one per row
+
+# in-process only » a miss remembered across runs would hide a site created since
+_missing_site_ids: dict[str, str] = {}  # siteId → SiteIdNotFoundError message
+_missing_site_names: set[str] = set()
+
+
 def cache_set(
     site_id: str,
     name: str,
@@ -61,14 +101,26 @@ def cache_set(
         )
 
     site_name_to_id[name] = site_id
+    # both exist now, whatever an earlier lookup said
+    _missing_site_ids.pop(site_id, None)
+    _missing_site_names.discard(name)
 
 
 def fetch_site_name_by_id(csv_site_id: str) -> str:
     """use the provided .csv site id to query site name"""
-    response = requests.post(
-        auth.GRAPHQL_URL,
-        json={"query": QUERY_SITE_ID, "variables": {"id": csv_site_id}},
-        headers=auth.get_headers(),
+    known_missing = _missing_site_ids.get(csv_site_id)
+    if known_missing is not None:
+        raise SiteIdNotFoundError(known_missing)
+    try:
+        return _single_flight(("site-id", csv_site_id), _query_site_name, csv_site_id)
+    except SiteIdNotFoundError as err:
+        _missing_site_ids[csv_site_id] = str(err)
+        raise
+
+
+def _query_site_name(csv_site_id: str) -> str:
+    response, data = auth.post_gql(
+        {"query": QUERY_SITE_ID, "variables": {"id": csv_site_id}}
     )
     try:
         response.raise_for_status()
@@ -98,8 +150,7 @@ def fetch_site_name_by_id(csv_site_id: str) -> str:
                         )
         # fallback re-raise
         raise
-    # got a 200 so parse json and check for GQL errors
-    data = response.json()
+    # got a 200 so check for GQL errors
     if data.get("errors"):
         for err in data["errors"]:
             message = err.get("message", "").lower()
@@ -125,7 +176,22 @@ def fetch_site_name_by_id(csv_site_id: str) -> str:
     return name
 
 
-def fetch_site_id_by_name(csv_site_name: str) -> str | None:
+def fetch_site_id_by_name(csv_site_name: str, *, recheck: bool = False) -> str | None:
+    """
+    None when the site doesn't exist. a name already looked up and found missing
+    this run answers None without another query » recheck=True always asks the API
+    """
+    if not recheck and csv_site_name in _missing_site_names:
+        return None
+    site_id = _single_flight(
+        ("site-name", csv_site_name), _query_site_id, csv_site_name
+    )
+    if site_id is None:
+        _missing_site_names.add(csv_site_name)
+    return site_id
+
+
+def _query_site_id(csv_site_name: str) -> str | None:
     lookup_payload = {
         "query": QUERY_SITE_NAME,
         "variables": {
@@ -142,11 +208,8 @@ def fetch_site_id_by_name(csv_site_name: str) -> str | None:
             },
         },
     }
-    response = requests.post(
-        auth.GRAPHQL_URL, json=lookup_payload, headers=auth.get_headers()
-    )
+    response, data = auth.post_gql(lookup_payload)
     response.raise_for_status()
-    data = response.json()
     if data.get("errors"):
         raise RuntimeError(f"GraphQL error getting Site by Name: {data['errors']}")
 
@@ -158,8 +221,11 @@ def fetch_site_id_by_name(csv_site_name: str) -> str | None:
     return None
 
 
-def rename_site(csv_site_id: str, csv_site_name: str) -> str:
+def rename_site(csv_site_id: str, csv_site_name: str, journal=None) -> str:
     """rename an existing site to name provided in .csv"""
+    journal_key = f"site-rename:{csv_site_id}:{csv_site_name}"
+    if journal is not None and journal.is_done(journal_key):
+        return csv_site_name
     rename_site_payload = {
         "query": CREATE_OR_UPDATE_SITE,
         "variables": {
@@ -170,25 +236,63 @@ def rename_site(csv_site_id: str, csv_site_name: str) -> str:
             }
         },
     }
-    rename_response = requests.post(
-        auth.GRAPHQL_URL, json=rename_site_payload, headers=auth.get_headers()
-    )
+    if journal is not None:
+        journal.begin(journal_key, rename_site_payload["variables"]["fields"])
     try:
-        rename_response.raise_for_status()
-    except requests.HTTPError as http_err:
-        logger.error(f"rename_site HTTP {rename_response.status_code}: {http_err}")
-        logger.debug(f"payload:\n{json.dumps(rename_site_payload, indent=2)}")
-        logger.debug(f"response body: \n{rename_response.text}")
+        rename_response, data = auth.post_gql(rename_site_payload)
+        try:
+            rename_response.raise_for_status()
+        except requests.HTTPError as http_err:
+            logger.error(f"rename_site HTTP {rename_response.status_code}: {http_err}")
+            logger.debug(f"payload:\n{json.dumps(rename_site_payload, indent=2)}")
+            logger.debug(f"response body: \n{rename_response.text}")
+            raise
+        if data.get("errors"):
+            raise RuntimeError(
+                f"GraphQL error while renaming the site: {data['errors']}"
+            )
+    except Exception as err:
+        # failed, not in-doubt » renaming again is harmless, the rerun retries it
+        if journal is not None:
+            journal.fail(journal_key, str(err))
         raise
-    data = rename_response.json()
-    if data.get("errors"):
-        raise RuntimeError(f"GraphQL error while renaming the site: {data['errors']}")
+    if journal is not None:
+        journal.complete(journal_key, csv_site_id)
+    _missing_site_ids.pop(csv_site_id, None)
+    _missing_site_names.discard(csv_site_name)
     return data["data"]["upsertSite"]["name"]
 
 
-def create_site_if_not_exists(csv_site_name: str) -> str:
-    existing = fetch_site_id_by_name(csv_site_name)
+def create_site_if_not_exists(csv_site_name: str, journal=None) -> str:
+    # one lookup-or-create per name, no matter how many rows race for it
+    site_id = _single_flight(
+        ("site-create", csv_site_name),
+        _lookup_or_create_site,
+        csv_site_name,
+        journal=journal,
+    )
+    # a follower got the leader's result » the leader only wrote to its own journal
+    journal_key = _site_create_key(csv_site_name)
+    if journal is not None and not journal.is_done(journal_key):
+        journal.complete(journal_key, site_id)
+    return site_id
+
+
+def _site_create_key(csv_site_name: str) -> str:
+    return f"site-create:{csv_site_name}"
+
+
+def _lookup_or_create_site(csv_site_name: str, journal=None) -> str:
+    journal_key = _site_create_key(csv_site_name)
+    if journal is not None and journal.is_done(journal_key):
+        return journal.response_id(journal_key)
+
+    # the name lookup doubles as reconciliation for an in-doubt create » always
+    # a real query, a remembered miss must never skip the check before creating
+    existing = fetch_site_id_by_name(csv_site_name, recheck=True)
     if existing:
+        if journal is not None and journal.is_in_doubt(journal_key):
+            journal.complete(journal_key, existing)
         return existing
 
     create_site_payload = {
@@ -196,16 +300,23 @@ def create_site_if_not_exists(csv_site_name: str) -> str:
         "variables": {"fields": {"tenantId": auth.TENANT_ID, "name": csv_site_name}},
     }
 
-    create_response = requests.post(
-        auth.GRAPHQL_URL,
-        json=create_site_payload,
-        headers=auth.get_headers(),
-    )
-    create_response.raise_for_status()
-    data = create_response.json()
-    if data.get("errors"):
-        raise RuntimeError(f"Error creating site: {data['errors']}")
-    return data["data"]["upsertSite"]["id"]
+    if journal is not None:
+        journal.begin(journal_key, create_site_payload["variables"]["fields"])
+    try:
+        create_response, data = auth.post_gql(create_site_payload)
+        create_response.raise_for_status()
+        if data.get("errors"):
+            raise RuntimeError(f"Error creating site: {data['errors']}")
+        new_site_id = data["data"]["upsertSite"]["id"]
+    except Exception as err:
+        # the rerun retries it, and the name lookup above still runs first
+        if journal is not None:
+            journal.fail(journal_key, str(err))
+        raise
+    _missing_site_names.discard(csv_site_name)
+    if journal is not None:
+        journal.complete(journal_key, new_site_id)
+    return new_site_id
 
 
 def resolve_site(
@@ -213,8 +324,12 @@ def resolve_site(
     csv_site_name: str | None,
     site_name_to_id: dict[str, str],
     site_id_to_name: dict[str, str],
+    *,
+    journal=None,
 ):
 
+    import pandas as pd  # already loaded by update_rooms » just a sys.modules hit
+
     csv_site_id = (
         auth.SITE_ID
         if auth.SITE_ID
@@ -257,7 +372,7 @@ def resolve_site(
                 return target_id
 
             # if .csv site name differs from queried or cached, rename the site
-            new_name = rename_site(csv_site_id, csv_site_name)
+            new_name = rename_site(csv_site_id, csv_site_name, journal=journal)
 
             # update cache with new site name
             cache_set(csv_site_id, new_name, site_id_to_name, site_name_to_id)
@@ -271,7 +386,7 @@ def resolve_site(
         if cached_id is not None:
             return cached_id
 
-        new_site_id = create_site_if_not_exists(name)
+        new_site_id = create_site_if_not_exists(name, journal=journal)
         # update cache with new site name
         cache_set(new_site_id, name, site_id_to_name, site_name_to_id)
 
@@ -0,0 +1,383 @@
+"""Fleet runs » one compliance check or room export per tenant in a manifest, each in
+its own headless cli.py process and folder, plus a fleet rollup."""
+
+import os
+import re
+import sys
+import csv
+import json
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from glob import glob
+from typing import Any, Dict, List, NamedTuple
+
+from dotenv import dotenv_values
+from rich.table import Table
+
+from utils import compliance_history
+from utils.env_helper import console, console_log, logger
+
+# -- GLOBALS
+
+CLI_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cli.py"
+)
+TENANT_MANIFEST = os.getenv("LENSCTL_TENANT_MANIFEST", "tenants.json")
+FLEET_DIR = os.getenv("LENSCTL_FLEET_DIR", "fleet")
+DEFAULT_PARALLEL = 4
+TASKS = ("compliance", "export-rooms")
+
+REQUIRED_VARS = ("TENANT_ID", "CLIENT_ID", "CLIENT_SECRET")
+IDENTITY_VARS = (*REQUIRED_VARS, "SITE_ID")
+ENDPOINT_VARS = ("LENS_EP", "AUTH_URL")
+# these point at one tenant's files » children fall back to their folder's defaults
+TENANT_LOCAL_VARS = (
+    "LENSCTL_SNAPSHOT_DIR",
+    "LENSCTL_HISTORY_DB",
+    "LENSCTL_WATCH_STATE",
+    "LENSCTL_GQL_TRACE_DIR",
+)
+NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+ENV_KEY_RE = re.compile(r"^[A-Z][A-Z0-9_]*$")
+
+LOG_FILE = "run.log"
+LOG_COLUMNS = "160"  # rich wraps at 80 columns when writing to a file
+ROOMS_CSV = "room_data.csv"
+
+ROLLUP_CSV = {
+    "compliance": "fleet-compliance-rollup.csv",
+    "export-rooms": "fleet-rooms-rollup.csv",
+}
+ROLLUP_COLUMNS = {
+    "compliance": (
+        "Tenant",
+        "Status",
+        "Baseline",
+        "Devices",
+        "Compliant",
+        "% Compliant",
+        "GraphQL Calls",
+        "Query Cost",
+        "Duration (s)",
+    ),
+    "export-rooms": (
+        "Tenant",
+        "Status",
+        "Rooms",
+        "GraphQL Calls",
+        "Query Cost",
+        "Duration (s)",
+    ),
+}
+
+
+class ManifestError(Exception):
+    pass
+
+
+class Tenant(NamedTuple):
+    name: str
+    env: Dict[str, str]
+
+
+class TenantResult(NamedTuple):
+    tenant: str
+    folder: str
+    exit_code: int
+    started: float
+    duration_s: float
+
+
+# -- PRIVATE HELPERS » NO TOUCHY!
+
+
+def _parse_tenant(entry: Any, index: int, base_dir: str) -> Tenant:
+    if not isinstance(entry, dict):
+        raise ManifestError(f"tenant #{index} should be an object")
+    name = str(entry.get("name") or "").strip()
+    if not NAME_RE.match(name):
+        raise ManifestError(
+            f"tenant #{index} needs a name of letters, digits, '.', '_' or '-' "
+            "(it's also the tenant's folder)"
+        )
+
+    env: Dict[str, str] = {}
+    if entry.get("env_file"):
+        env_path = os.path.join(base_dir, entry["env_file"])
+        if not os.path.isfile(env_path):
+            raise ManifestError(f"{name}: env_file not found » {env_path}")
+        env.update(
+            {key: value for key, value in dotenv_values(env_path).items() if value}
+        )
+    for key, value in entry.items():
+        if key in ("name", "env_file"):
+            continue
+        if not ENV_KEY_RE.match(key):
+            raise ManifestError(
+                f"{name}: unknown key '{key}' » use env var names, i.e. TENANT_ID"
+            )
+        env[key] = str(value)
+
+    missing = [var for var in REQUIRED_VARS if not env.get(var, "").strip()]
+    missing += [var for var in ENDPOINT_VARS if not (env.get(var) or os.getenv(var))]
+    if missing:
+        raise ManifestError(f"{name}: missing {', '.join(missing)}")
+    return Tenant(name, env)
+
+
+def _child_env(tenant: Tenant) -> Dict[str, str]:
+    env = dict(os.environ)
+    # the parent's .env is already loaded » never let its identity leak into a tenant
+    for var in (*IDENTITY_VARS, *TENANT_LOCAL_VARS):
+        env.pop(var, None)
+    env.update(tenant.env)
+    # set (even blank) so the child's load_dotenv doesn't fill it from .env
+    env.setdefault("SITE_ID", "")
+    env["LENSCTL_GQL_TRACE_DIR"] = "."  # trace lands in the tenant folder
+    env["COLUMNS"] = LOG_COLUMNS
+    env["PYTHONIOENCODING"] = "utf-8"
+    return env
+
+
+def _run_tenant(tenant: Tenant, task_args: List[str], fleet_dir: str) -> TenantResult:
+    folder = os.path.join(fleet_dir, tenant.name)
+    os.makedirs(folder, exist_ok=True)
+    started = time.time()
+    # a process per tenant » auth, the token cache, the session and the query-cost
+    # budget are module globals, so tenants can't share an interpreter
+    with open(os.path.join(folder, LOG_FILE), "w", encoding="utf-8") as log:
+        process = subprocess.run(
+            [sys.executable, CLI_PATH, *task_args],
+            cwd=folder,
+            env=_child_env(tenant),
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+    return TenantResult(
+        tenant.name, folder, process.returncode, started, time.time() - started
+    )
+
+
+def _fresh(path: str, started: float) -> bool:
+    # written by this run » not left over from an earlier one
+    return os.path.exists(path) and os.path.getmtime(path) >= started
+
+
+def _gql_totals(result: TenantResult) -> tuple[int | None, int | None]:
+    traces = [
+        path
+        for path in glob(os.path.join(result.folder, "gql-trace-*.json"))
+        if _fresh(path, result.started)
+    ]
+    if not traces:
+        return None, None
+    try:
+        with open(max(traces, key=os.path.getmtime), "r", encoding="utf-8") as f:
+            operations = json.load(f).get("operations", {})
+    except (OSError, ValueError) as err:
+        logger.warning(f"Couldn't read the GraphQL trace for {result.tenant}: {err}")
+        return None, None
+    calls = sum(stats.get("calls", 0) for stats in operations.values())
+    cost = sum(stats.get("query_cost", 0) for stats in operations.values())
+    return calls, cost
+
+
+def _compliance_columns(result: TenantResult) -> Dict[str, Any]:
+    path = os.path.join(result.folder, compliance_history.DEFAULT_HISTORY_DB)
+    run = compliance_history.latest_run(path) if result.exit_code == 0 else None
+    if run and datetime.fromisoformat(run["run_ts"]).timestamp() >= int(result.started):
+        return {
+            "Baseline": run["baseline"],
+            "Devices": run["total_devices"],
+            "Compliant": run["compliant"],
+            "% Compliant": round(run["pct"], 1),
+        }
+    return {"Baseline": None, "Devices": None, "Compliant": None, "% Compliant": None}
+
+
+def _rooms_columns(result: TenantResult) -> Dict[str, Any]:
+    path = os.path.join(result.folder, ROOMS_CSV)
+    if result.exit_code != 0 or not _fresh(path, result.started):
+        return {"Rooms": None}
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        return {"Rooms": max(sum(1 for _ in csv.reader(f)) - 1, 0)}
+
+
+def _fleet_total(task: str, rows: List[Dict[str, Any]], wall_s: float) -> Dict:
+    def total(column: str) -> int | None:
+        values = [row[column] for row in rows if row[column] is not None]
+        return sum(values) if values else None
+
+    ok = sum(1 for row in rows if row["Status"] == "OK")
+    fleet = {
+        "Tenant": "All tenants",
+        "Status": f"{ok}/{len(rows)} OK",
+        "GraphQL Calls": total("GraphQL Calls"),
+        "Query Cost": total("Query Cost"),
+        "Duration (s)": round(wall_s, 1),  # wall clock » tenants overlap
+    }
+    if task == "compliance":
+        devices, compliant = total("Devices"), total("Compliant")
+        baselines = {row["Baseline"] for row in rows if row["Baseline"]}
+        fleet |= {
+            "Baseline": baselines.pop() if len(baselines) == 1 else None,
+            "Devices": devices,
+            "Compliant": compliant,
+            "% Compliant": (round(compliant / devices * 100, 1) if devices else None),
+        }
+    else:
+        fleet["Rooms"] = total("Rooms")
+    return fleet
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:,.1f}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
+
+
+# -- PUBLIC FUNCTIONS
+
+
+def load_manifest(path: str = TENANT_MANIFEST) -> List[Tenant]:
+    """parse + validate the tenant manifest. raises ManifestError"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise ManifestError(f"Tenant manifest not found » {path}") from None
+    except ValueError as err:
+        raise ManifestError(f"{path} isn't valid JSON: {err}") from None
+
+    entries = manifest.get("tenants") if isinstance(manifest, dict) else manifest
+    if not isinstance(entries, list) or not entries:
+        raise ManifestError(f'{path} lists no tenants » expected {{"tenants": [...]}}')
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    tenants = [
+        _parse_tenant(entry, index, base_dir) for index, entry in enumerate(entries, 1)
+    ]
+    names = [tenant.name for tenant in tenants]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ManifestError(f"duplicate tenant names: {', '.join(duplicates)}")
+    return tenants
+
+
+def rollup_rows(task: str, results: List[TenantResult]) -> List[Dict[str, Any]]:
+    """one row per tenant (manifest order), read from each tenant's own output"""
+    rows = []
+    for result in results:
+        calls, cost = _gql_totals(result)
+        row = {
+            "Tenant": result.tenant,
+            "Status": "OK" if result.exit_code == 0 else f"exit {result.exit_code}",
+            "GraphQL Calls": calls,
+            "Query Cost": cost,
+            "Duration (s)": round(result.duration_s, 1),
+        }
+        if task == "compliance":
+            row |= _compliance_columns(result)
+        else:
+            row |= _rooms_columns(result)
+        rows.append(row)
+    return rows
+
+
+def display_rollup(task: str, rows: List[Dict[str, Any]]) -> None:
+    # last row is the fleet total
+    *tenant_rows, fleet = rows
+    title = f"Fleet rollup » {task}"
+    columns = list(ROLLUP_COLUMNS[task])
+    if "Baseline" in columns and fleet["Baseline"]:
+        # one baseline across the fleet » title, not a column
+        title += f" » {fleet['Baseline']}"
+        columns.remove("Baseline")
+
+    table = Table(title=title, title_justify="left", header_style="bold")
+    for column in columns:
+        table.add_column(
+            column,
+            justify="left" if column in ("Tenant", "Status", "Baseline") else "right",
+            style="cyan" if column == "Tenant" else None,
+            no_wrap=column == "Tenant",
+        )
+    for row in tenant_rows:
+        table.add_row(
+            *[_cell(row[column]) for column in columns],
+            style=None if row["Status"] == "OK" else "red",
+        )
+    table.add_section()
+    table.add_row(*[_cell(fleet[column]) for column in columns], style="bold")
+    console.print()
+    console.print(table)
+    console.print()
+
+
+def export_rollup_csv(task: str, rows: List[Dict[str, Any]], filename: str) -> None:
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=ROLLUP_COLUMNS[task])
+        writer.writeheader()
+        writer.writerows(rows)
+    console_log(f"[dim]Fleet rollup saved » {filename}[/dim]")
+
+
+def run_fleet(
+    task: str,
+    task_args: List[str],
+    *,
+    manifest: str = TENANT_MANIFEST,
+    fleet_dir: str = FLEET_DIR,
+    parallel: int = DEFAULT_PARALLEL,
+) -> List[TenantResult]:
+    """
+    run `cli.py <task_args>` once per manifest tenant, `parallel` at a time, then
+    print + save the cross-tenant rollup. raises ManifestError before anything runs
+    """
+    if task not in TASKS:
+        raise ValueError(f"unknown fleet task: {task} (use {', '.join(TASKS)})")
+    tenants = load_manifest(manifest)
+    os.makedirs(fleet_dir, exist_ok=True)
+    workers = max(1, min(parallel, len(tenants)))
+    console_log(
+        f"[bold]Running {task} across {len(tenants)} tenants[/bold] "
+        f"[dim]({workers} at a time » {fleet_dir}/<tenant>/)[/dim]"
+    )
+
+    started = time.time()
+    results: Dict[str, TenantResult] = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_run_tenant, tenant, task_args, fleet_dir): tenant
+            for tenant in tenants
+        }
+        for future in as_completed(futures):
+            tenant = futures[future]
+            try:
+                result = future.result()
+            except OSError as err:
+                logger.error(f"Couldn't start {task} for {tenant.name}: {err}")
+                result = TenantResult(
+                    tenant.name, os.path.join(fleet_dir, tenant.name), -1, started, 0.0
+                )
+            style = "green" if result.exit_code == 0 else "red"
+            status = "done" if result.exit_code == 0 else f"exit {result.exit_code}"
+            console_log(
+                f"[{style}]{result.tenant}[/{style}] » {status} in "
+                f"{result.duration_s:.1f}s [dim]{os.path.join(result.folder, LOG_FILE)}[/dim]"
+            )
+            results[tenant.name] = result
+
+    ordered = [results[tenant.name] for tenant in tenants]
+    rows = rollup_rows(task, ordered)
+    rows.append(_fleet_total(task, rows, time.time() - started))
+    display_rollup(task, rows)
+    export_rollup_csv(task, rows, os.path.join(fleet_dir, ROLLUP_CSV[task]))
+    return ordered